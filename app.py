@@ -1,20 +1,31 @@
+import json
+import time
+from contextlib import closing
 
 import streamlit as st
-import pandas as pd
-import requests
 import geocoder
-from streamlit_folium import st_folium
-import folium
 from openai import Client
 
+from facilities import concat_facilities, empty_facilities, sidebar_markdown
+from map_render import map_cache_key, render_map_html
+from provider_partitions import get_providers
+from ranking import RANK_BY_DISTANCE, RANK_BY_RATING, RANK_BY_SCORE, rank_facilities
+from result_store import get_result_store
+from search_pipeline import CARE_TYPES, apply_display_filters, build_issue_classifier, build_search_pipeline
+from tracing import TRACER, configure_exporters, count, finish_trace, hit_ratios, start_trace
+
 #sys.stderr = open(os.devnull, 'w')
 
-# Initialize session state for map, facilities, and search flag
-if "map" not in st.session_state:
-    st.session_state["map"] = None
+# Every script run is one trace; spans are exported if HEALTHCARE_APP_TRACE_DIR is set
+configure_exporters()
+run_trace = start_trace("rerun")
 
-if "facilities" not in st.session_state:
-    st.session_state["facilities"] = pd.DataFrame()
+# Initialize session state for the last submitted search and a handle to its
+# results; the results themselves live in the process-wide result store
+if "search" not in st.session_state:
+    st.session_state["search"] = None
+if "results" not in st.session_state:
+    st.session_state["results"] = None
 
 # Initialize session state with default location (Davis, CA coordinates)
 if "latitude" not in st.session_state:
@@ -22,26 +33,22 @@ if "latitude" not in st.session_state:
 if "longitude" not in st.session_state:
     st.session_state["longitude"] = -121.7405  # Longitude for Davis, CA
 
-csv_url = "https://raw.githubusercontent.com/FitzDS/Healthcare-app/main/providers_data_with_coordinates_threading.csv"
-
-# Read the CSV file from GitHub
-medicaid_data = pd.read_csv(csv_url)
-
-# Set up OpenAI client
-client = Client(api_key=st.secrets["api_keys"]["openai"])
+# Open the provider store once per process; reruns reuse it. A partitioned
+# store only loads the partitions around each search.
+provider_store = get_providers()
 
 # Load API keys from Streamlit secrets
 GOOGLE_API_KEY = st.secrets["api_keys"]["google"]
 
-CARE_TYPES = {
-    "All Healthcare": ["hospital", "pharmacy", "doctor", "dentist", "veterinary_care", "physiotherapist"],
-    "Pharmacy": "pharmacy",
-    "Hospital": "hospital",
-    "Doctor": "doctor",
-    "Dentist": "dentist",
-    "Veterinary": "veterinary_care",
-    "Physiotherapist": "physiotherapist",
+SORT_OPTIONS = {
+    "Rating": RANK_BY_RATING,
+    "Distance": RANK_BY_DISTANCE,
+    "Best Match (rating and distance)": RANK_BY_SCORE,
 }
+SIDEBAR_MAX_RESULTS = 100  # Only the top-ranked facilities are listed in the sidebar
+MAP_CACHE_ENTRIES = 64  # Serialized maps kept in memory across reruns and sessions
+STREAM_MAP_REFRESH_S = 1.0  # Minimum time between map redraws while results stream in
+LOCATION_CACHE_TTL_S = 24 * 60 * 60
 
 # Ensure the current location marker is persistent
 if "current_location_marker" in st.session_state:
@@ -52,10 +59,23 @@ else:
     st.session_state["current_location_marker"] = None
     current_location_marker = None
 
+@st.cache_resource
+def get_openai_client():
+    """OpenAI client shared by all sessions instead of being rebuilt on every rerun."""
+    return Client(api_key=st.secrets["api_keys"]["openai"])
+
+@st.cache_resource
+def get_issue_classifier():
+    """Issue classifier with a persistent cache and a local keyword fast path."""
+    return build_issue_classifier(get_openai_client())
+
 @st.cache_data
 def classify_issue_with_openai_cached(issue_description):
     """
-    Classifies a healthcare issue description using OpenAI's API and caches the result.
+    Classifies a healthcare issue description and caches the result.
+
+    Confident keyword matches and previously seen descriptions are answered
+    locally; everything else goes to OpenAI.
 
     Args:
         issue_description (str): The description of the issue.
@@ -63,156 +83,63 @@ def classify_issue_with_openai_cached(issue_description):
     Returns:
         str: Predicted healthcare category.
     """
-    prompt = f"""
-    You are an expert in healthcare classification. Classify the following issue description into one of these categories:
-    {', '.join(CARE_TYPES.keys())}.
+    return get_issue_classifier().classify(issue_description)
 
-    Examples:
-    - "I need medication for my cold" -> Pharmacy
-    - "I broke my arm and need treatment" -> Hospital
-    - "My dog needs a checkup" -> Veterinary
-    - "I need help recovering from a sports injury" -> Physiotherapist
-    - "I need dental work" -> Dentist
+@st.cache_resource
+def get_search_pipeline(provider_checksum):
+    """
+    Search pipeline shared by all sessions, rebuilt only when the provider dataset changes.
 
-    Issue: {issue_description}
-    Category:"""
+    Args:
+        provider_checksum (str): Checksum of the loaded provider dataset.
+    """
+    return build_search_pipeline(GOOGLE_API_KEY, providers=provider_store, classify=classify_issue_with_openai_cached)
 
-    primary_model = "gpt-4o-mini"
-    fallback_model = "gpt-3.5-turbo"
+# Each stage below is memoized on its own inputs, so a rerun only recomputes
+# the stages whose inputs changed.
 
-    try:
-        # Attempt classification with the primary model
-        response = client.chat.completions.create(
-            model=primary_model,
-            messages=[
-                {"role": "system", "content": "You are a healthcare classification assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=200,
-            temperature=0
-        )
-        category = response.choices[0].message.content.strip()
-        return category
-    except Exception as e:
-        print(f"Error with {primary_model}: {e}. Trying fallback model {fallback_model}.")
-        try:
-            # Attempt classification with the fallback model
-            response = client.chat.completions.create(
-                model=fallback_model,
-                messages=[
-                    {"role": "system", "content": "You are a healthcare classification assistant."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=50,
-                temperature=0
-            )
-            category = response.choices[0].message.content.strip()
-            return category
-        except Exception as fallback_error:
-            print(f"Error with fallback model {fallback_model}: {fallback_error}.")
-            return "Error"
+@st.cache_data(ttl=LOCATION_CACHE_TTL_S, show_spinner=False)
+def resolve_location_cached(query, provider_checksum):
+    """
+    Resolve a location query to (latitude, longitude).
 
-def fetch_healthcare_data_google(latitude, longitude, radius, care_type, open_only=False, medicaid_data=None):
+    Raises LookupError when the query is not found; Streamlit does not cache
+    exceptions, so a failed lookup (e.g. a geocoder outage) is retried on the
+    next search instead of being remembered for a day.
     """
-    Fetch healthcare data using Google Places API with support for multiple healthcare categories.
-    Now also checks for Medicaid support.
+    lat, lon = get_search_pipeline(provider_checksum).resolve_location(query)
+    if lat is None:
+        raise LookupError(query)
+    return lat, lon
+
+def stream_healthcare_data_google(latitude, longitude, radius, care_type, open_only, provider_checksum):
     """
-    url = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
-    facilities = []
+    Fetch healthcare data using Google Places API with support for multiple healthcare categories,
+    one result page at a time. Also checks for Medicaid support by matching against the provider dataset.
 
-    # Ensure Medicaid data is provided
-    if medicaid_data is None:
-        raise ValueError("Medicaid data must be provided")
+    Yields:
+        tuple: (facilities, error) per page, before any display-only filters.
+    """
+    return get_search_pipeline(provider_checksum).stream_facilities(
+        latitude, longitude, radius, care_type, open_only=open_only
+    )
 
-    # Round Medicaid data coordinates for consistent comparison
-    medicaid_data["latitude"] = medicaid_data["latitude"].astype(float).round(5)
-    medicaid_data["longitude"] = medicaid_data["longitude"].astype(float).round(5)
+@st.cache_data(max_entries=MAP_CACHE_ENTRIES)
+def get_map_html(map_key, _facilities, _latitude, _longitude, _radius):
+    """
+    Build and serialize the results map once per distinct `map_key`.
 
-    if isinstance(care_type, list):
-        types_to_query = care_type
-    else:
-        types_to_query = [care_type]
-
-    for care_type_query in types_to_query:
-        params = {
-            "location": f"{latitude},{longitude}",
-            "radius": radius,
-            "type": care_type_query,
-            "key": GOOGLE_API_KEY,
-        }
-
-        while True:
-            response = requests.get(url, params=params)
-            if response.status_code == 200:
-                data = response.json()
-                for result in data.get("results", []):
-                    if open_only and not result.get("opening_hours", {}).get("open_now", False):
-                        continue
-
-                    VALID_MEDICAID_CATEGORIES = ["hospital", "pharmacy", "doctor", "dentist", "physiotherapist"]
-                    # Facility coordinates
-                    lat = round(result["geometry"]["location"]["lat"], 5)
-                    lon = round(result["geometry"]["location"]["lng"], 5)
-
-                    facility_category = result.get("types", [])
-                    is_medicaid_supported_category = any(
-                    category in VALID_MEDICAID_CATEGORIES for category in facility_category
-                    )
-
-                    
-                    if is_medicaid_supported_category:
-                    # Filter Medicaid data for the bounding box (e.g., 0.0001 degrees margin for proximity)
-                        medicaid_data_filtered = medicaid_data[
-                            (medicaid_data["latitude"] > lat - 0.0001) &
-                            (medicaid_data["latitude"] < lat + 0.0001) &
-                            (medicaid_data["longitude"] > lon - 0.0001) &
-                            (medicaid_data["longitude"] < lon + 0.0001)
-                        ]
-    
-                    
-                        # Determine if the facility is Medicaid-supported using filtered data
-                        medicaid_supported = not medicaid_data_filtered.empty
-                    else:
-                        medicaid_supported = False  # Not a valid category, so it's not Medicaid-supported
-
-
-                    facilities.append({
-                        "name": result.get("name", "Unknown"),
-                        "address": result.get("vicinity", "N/A"),
-                        "latitude": lat,
-                        "longitude": lon,
-                        "rating": result.get("rating", "No rating"),
-                        "user_ratings_total": result.get("user_ratings_total", 0),
-                        "open_now": result.get("opening_hours", {}).get("open_now", "Unknown"),
-                        "wheelchair_accessible_entrance": result.get("wheelchair_accessible_entrance", False),
-                        "medicaid_supported": medicaid_supported,  # Correct value
-                    })
-
-                # Check for the next page token
-                next_page_token = data.get("next_page_token")
-                if next_page_token:
-                    import time
-                    time.sleep(2)
-                    params = {"pagetoken": next_page_token, "key": GOOGLE_API_KEY}
-                else:
-                    break
-            else:
-                st.error(f"Error fetching data from Google Places API: {response.status_code}")
-                break
-
-    return pd.DataFrame(facilities)
+    Only the key is hashed; it already covers the facilities and view parameters.
+    """
+    count("st_cache.map.miss")
+    return render_map_html(_facilities, _latitude, _longitude, _radius)
 
 def get_lat_lon_from_query(query):
-    url = f"https://maps.googleapis.com/maps/api/geocode/json"
-    params = {"address": query, "key": GOOGLE_API_KEY}
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        if data["results"]:
-            location = data["results"][0]["geometry"]["location"]
-            return location["lat"], location["lng"]
-    st.error("Location not found. Please try again.")
-    return None, None
+    try:
+        return resolve_location_cached(query, provider_store.checksum)
+    except LookupError:
+        st.error("Location not found. Please try again.")
+        return None, None
 
 def get_current_location():
     g = geocoder.ip('me')
@@ -370,9 +297,9 @@ miles_to_meters = 1609.34      # Conversion factor from miles to meters
 
 # Adjust the radius input based on the selected unit
 if unit_option == "Meters":
-    radius = st.slider("Search Radius:", min_value=500, max_value=100000, step=1000, value=20000, help="Radius in meters. Note: Only the 60 nearest facilities will be shown, as per API limitations.")
+    radius = st.slider("Search Radius:", min_value=500, max_value=100000, step=1000, value=20000, help="Radius in meters. Note: Regions not yet in the local facility catalog show at most 60 facilities per type, as per API limitations.")
 else:
-    radius_in_miles = st.slider("Search Radius:", min_value=0.3, max_value=62.1, step=0.5, value=12.4, help="Radius in miles. Note: Only the 60 nearest facilities will be shown, as per API limitations.")
+    radius_in_miles = st.slider("Search Radius:", min_value=0.3, max_value=62.1, step=0.5, value=12.4, help="Radius in miles. Note: Regions not yet in the local facility catalog show at most 60 facilities per type, as per API limitations.")
     radius = radius_in_miles * miles_to_meters  # Convert miles to meters
 
 # Display the selected radius
@@ -389,6 +316,7 @@ show_medicaid_only = st.checkbox("Show Medicaid-Supported Providers Only")
 st.caption("Note: Search by medicaid-supported providers will only take into account California currently.")
 
 filter_wheelchair_accessible = st.checkbox("Show only locations with wheelchair accessible entrances", value=False)
+sort_by = st.selectbox("Sort Results By:", options=list(SORT_OPTIONS.keys()))
 
 use_current_location = st.button("Use Current Location", key="current_location_button")
 st.caption("Note: Search by location will take precedence over the 'Use Current Location' button.")
@@ -419,159 +347,126 @@ elif location_query:
         longitude = lon
         st.write(f"Using location: {location_query} (Latitude: {latitude}, Longitude: {longitude})")
 
-
-# After the search has been performed, retrieve the facilities and display them
-facilities = st.session_state.get("facilities", pd.DataFrame())
-
-def update_sidebar(facilities):
-    st.sidebar.title("Nearby Locations")
+def update_sidebar(facilities, container, search_radius):
+    container.title("Nearby Locations")
     if not facilities.empty:
-        facilities['rating'] = pd.to_numeric(facilities['rating'], errors='coerce').fillna(0)
-        sorted_facilities = facilities.sort_values(by="rating", ascending=False)
-        for _, row in sorted_facilities.iterrows():
-            st.sidebar.markdown(f"""
-            **{row['name']}**
-            - Address: {row['address']}
-            - Rating: {row['rating']} ⭐
-            - Wheelchair Accessible Entrance: {"Yes" if row['wheelchair_accessible_entrance'] else "No"}
-            - Distance: {row.get('distance', 'N/A')} km
-            [Get Directions](https://www.google.com/maps/dir/?api=1&destination={row['latitude']},{row['longitude']})
-            """)
+        # Rank against the radius the results were searched with, not the slider's current value
+        ranked = rank_facilities(facilities, by=SORT_OPTIONS[sort_by], k=SIDEBAR_MAX_RESULTS, radius_m=search_radius)
+        if len(ranked) < len(facilities):
+            container.caption(f"Showing the top {len(ranked)} of {len(facilities)} facilities.")
+        # Build every entry at once and render them in a single call
+        container.markdown("\n".join(sidebar_markdown(ranked)))
     else:
-        st.sidebar.warning("No facilities found nearby.")
-
-# Ensure facilities are stored in session state only after the search button is clicked
-if st.button("Search", key="search_button"):
+        container.warning("No facilities found nearby.")
 
-    # Initialize session state for map and facilities only when Search button is clicked
-    if "map" not in st.session_state:
-        st.session_state["map"] = None
-    if "facilities" not in st.session_state:
-        st.session_state["facilities"] = pd.DataFrame()  # Empty DataFrame initially
-    
-    st.write("Fetching data...")
-
-    # Fetch facilities using Google API
-    facilities = fetch_healthcare_data_google(
-        latitude=latitude,
-        longitude=longitude,
-        radius=radius,
-        care_type=CARE_TYPES.get(care_type, "hospital"),
-        open_only=open_only,
-        medicaid_data=medicaid_data
-    )
-   
-
-    # Only apply the "Show Medicaid-Supported Providers Only" filter if enabled
-    if show_medicaid_only and "medicaid_supported" in facilities.columns:
-        facilities = facilities[facilities["medicaid_supported"]]
-    # Apply wheelchair filter if needed
-    if filter_wheelchair_accessible:
-        facilities = facilities[facilities['wheelchair_accessible_entrance'] == True]
+# Results are drawn into placeholders, so a streaming search can redraw them as pages arrive
+error_slot = st.container()
+sidebar_slot = st.sidebar.empty()
+status_slot = st.empty()
+map_slot = st.empty()
 
-    # Store the fetched facilities in session state
-    st.session_state["facilities"] = facilities
+def show_facilities(facilities, map_latitude, map_longitude, map_radius, pending=False, draw_map=True):
+    """
+    Draw the sidebar list, the result count and the map for the given facilities.
 
-# Retrieve facilities from session state
-facilities = st.session_state.get("facilities", pd.DataFrame())  # Safely retrieve facilities from session state
+    While a search is still `pending`, maps are rendered directly instead of
+    through the map cache, and only when `draw_map` is set.
+    """
+    # Display-only filters run against the fetched results, so toggling them never refetches
+    facilities = apply_display_filters(
+        facilities, medicaid_only=show_medicaid_only, wheelchair_only=filter_wheelchair_accessible
+    )
+    update_sidebar(facilities, sidebar_slot.container(), map_radius)
 
+    if pending:
+        status_slot.info(f"{len(facilities)} facilities found so far, still searching...")
+        if draw_map:
+            map_slot.iframe(render_map_html(facilities, map_latitude, map_longitude, map_radius), width=700, height=500)
+        return
 
-    # Only apply the "Show Medicaid-Supported Providers Only" filter if facilities are populated
-try:
-    # Your code that may raise a KeyError
-    facilities = facilities[facilities["medicaid_supported"]]
-except KeyError as e:
-    # Handle the exception gracefully, without showing it to the user
-    print(f"KeyError: {e} - This column doesn't exist, but it's being ignored.")  # Log for debugging
-    # You can choose not to do anything here to continue execution
-    pass
+    # Check if facilities are empty to display map or error message
+    if facilities.empty:
+        status_slot.error("No facilities found. Check your location or radius.")
+    else:
+        status_slot.write(f"Inferred Type of Care: {len(facilities)} facilities found.")
 
+    # Reruns with the same results and view reuse the cached map HTML
+    map_key = map_cache_key(facilities, map_latitude, map_longitude, map_radius)
+    count("st_cache.map.lookup")
+    map_slot.iframe(get_map_html(map_key, facilities, map_latitude, map_longitude, map_radius), width=700, height=500)
 
-update_sidebar(st.session_state.facilities)
+def stream_search(search):
+    """
+    Fetch a search page by page, redrawing the results as each page arrives.
 
-# Ensure facilities are stored in session state
-# Ensure facilities are stored in session state
-if "facilities" not in st.session_state:
-    st.session_state["facilities"] = pd.DataFrame()
+    Changing an input reruns the script, which stops this run at its next
+    redraw; closing the stream then cancels the requests still pending.
 
-# Retrieve facilities from session state
-facilities = st.session_state["facilities"]
+    Returns:
+        tuple: (facilities, errors) of the whole search.
+    """
+    batches = []
+    errors = []
+    last_map_draw = 0.0
+    stream = stream_healthcare_data_google(**search, provider_checksum=provider_store.checksum)
+    with closing(stream):
+        for batch, error in stream:
+            if error:
+                errors.append(error)
+                error_slot.error(error)
+            batches.append(batch)
+            now = time.monotonic()
+            draw_map = now - last_map_draw >= STREAM_MAP_REFRESH_S
+            if draw_map:
+                last_map_draw = now
+            show_facilities(
+                concat_facilities(batches), search["latitude"], search["longitude"], search["radius"],
+                pending=True, draw_map=draw_map,
+            )
+    return concat_facilities(batches), errors
 
+# Only the search inputs are stored when the Search button is clicked; its
+# results are kept in the session, so reruns redraw them without refetching
+if st.button("Search", key="search_button"):
+    st.session_state["search"] = {
+        "latitude": latitude,
+        "longitude": longitude,
+        "radius": radius,
+        "care_type": CARE_TYPES.get(care_type, "hospital"),
+        "open_only": open_only,
+    }
+
+def result_key(search):
+    """Result store key of a search: its parameters and the provider dataset."""
+    return json.dumps(search, sort_keys=True) + "|" + provider_store.checksum
+
+result_store = get_result_store()
+search = st.session_state["search"]
+if search is not None:
+    key = result_key(search)
+    handle = st.session_state["results"]
+    result = result_store.get(handle) if handle is not None and handle.key == key else None
+    if result is not None:
+        count("session.search.hit")
+    else:
+        count("session.search.miss")
+        # Another session may already hold the same search
+        handle = result_store.acquire(key)
+        result = result_store.get(handle) if handle is not None else None
+
+    if result is not None:
+        for error in result[1]:
+            error_slot.error(error)
+    else:
+        facilities, errors = stream_search(search)
+        handle = result_store.put(key, facilities, errors)
+        result = result_store.get(handle)
+    st.session_state["results"] = handle
 
-# Check if facilities are empty to display map or error message
-if facilities.empty:
-    st.error("No facilities found. Check your location or radius.")
-    st.session_state["map"] = folium.Map(location=[latitude, longitude], zoom_start=12)
+    # Draw the map around the searched location, not the current widget values
+    show_facilities(result[0], search["latitude"], search["longitude"], search["radius"])
 else:
-    st.write(f"Inferred Type of Care: {len(facilities)} facilities found.")
-    m = folium.Map(location=[latitude, longitude], zoom_start=12)
-    folium.Circle(
-        location=[latitude, longitude],
-        radius=radius,
-        color="blue",
-        fill=True,
-        fill_opacity=0.4
-    ).add_to(m)
-
-    for _, row in facilities.iterrows():
-        wheelchair_accessible = row.get('wheelchair_accessible_entrance', False)
-        # Assign a color based on ratings
-        color = "gray"  # Default color for unrated
-        if row["rating"] != "No rating" and row["rating"]:
-            if float(row["rating"]) >= 4:
-                color = "green"
-            elif float(row["rating"]) >= 3:
-                color = "blue"
-            elif float(row["rating"]) >= 2:
-                color = "orange"
-            elif float(row["rating"]) >= 1:
-                color = "yellow"
-
-        # Generate the directions link
-        directions_link = f"https://www.google.com/maps/dir/?api=1&destination={row['latitude']},{row['longitude']}"
-
-        # Add marker with "Get Directions" link
-        popup_content = f"""
-        <b>{row['name']}</b><br>
-        Address: {row['address']}<br>
-        Open Now: {"Open" if row['open_now'] else "Closed"}<br>
-        Medicaid Supported: {"Yes" if row["medicaid_supported"] else "No"}<br>
-        Rating: {row['rating']} ({row['user_ratings_total']} reviews)<br>
-        Wheelchair Accessible Entrance: {"Yes" if row['wheelchair_accessible_entrance'] else "No"}<br>
-        <a href="{directions_link}" target="_blank">Get Directions</a>
-        """
-        folium.Marker(
-            location=[row["latitude"], row["longitude"]],
-            popup=folium.Popup(popup_content, max_width=300),
-            icon=folium.Icon(color=color)
-        ).add_to(m)
-
-    # Add current location marker
-    folium.Marker(
-        location=[latitude, longitude],
-        popup="Current Location",
-        icon=folium.Icon(icon="info-sign", color="red")
-    ).add_to(m)
-
-    st.session_state["map"] = m
-
-if "map" in st.session_state and st.session_state["map"] is not None:
-    st_folium(st.session_state["map"], width=700, height=500)
-else:
-    default_map = folium.Map(location=[latitude, longitude], zoom_start=12)
-    folium.Marker(
-        location=[latitude, longitude],
-        popup="Current Location",
-        icon=folium.Icon(icon="info-sign", color="red")
-    ).add_to(default_map)
-    folium.Circle(
-        location=[latitude, longitude],
-        radius=radius,
-        color="blue",
-        fill=True,
-        fill_opacity=0.4
-    ).add_to(default_map)
-    st_folium(default_map, width=700, height=500)
+    show_facilities(empty_facilities(), latitude, longitude, radius)
 
 st.markdown("""
 <div style="text-align: center;">
@@ -580,3 +475,50 @@ st.markdown("""
     </a>
 </div>
 """, unsafe_allow_html=True)
+
+def show_performance_panel(trace):
+    """Debug panel with this run's spans and the process-wide latency, cache and call figures."""
+    with st.sidebar.expander("Performance", expanded=True):
+        st.caption(f"This run: {len(trace.spans)} spans")
+        st.dataframe(
+            [{"span": s.name, "ms": round(s.duration_ms, 1), "attributes": str(s.attrs or "")} for s in trace.spans],
+            hide_index=True,
+        )
+        st.caption("Latency since startup (ms)")
+        st.dataframe(
+            [
+                {"span": name, "count": summary["count"], "p50": round(summary["p50"], 1), "p95": round(summary["p95"], 1)}
+                for name, summary in sorted(TRACER.latency_summary().items())
+            ],
+            hide_index=True,
+        )
+        stats = result_store.stats()
+        st.caption(
+            f"Result store: {stats['entries']} searches ({stats['referenced']} held by sessions), "
+            f"{stats['bytes'] / (1 << 20):.1f} MiB"
+        )
+        catalog = get_search_pipeline(provider_store.checksum).catalog.stats()
+        st.caption(
+            f"Facility catalog: {catalog['tiles']} tiles ({catalog['fresh']} fresh), {catalog['places']} places"
+        )
+        counters = TRACER.counters()
+        st.caption("Cache hit ratios")
+        st.dataframe(
+            [
+                {"cache": name, "hits": hits, "lookups": lookups, "hit ratio": f"{ratio:.0%}"}
+                for name, (hits, lookups, ratio) in hit_ratios(counters).items()
+            ],
+            hide_index=True,
+        )
+        st.caption("External calls")
+        st.dataframe(
+            [{"service": name.split(".", 1)[1], "calls": value}
+             for name, value in sorted(counters.items()) if name.startswith("external.")],
+            hide_index=True,
+        )
+
+# Add ?debug=1 to the URL to show the performance panel
+if st.query_params.get("debug") == "1":
+    show_performance_panel(run_trace)
+
+finish_trace(run_trace)
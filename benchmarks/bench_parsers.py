@@ -0,0 +1,64 @@
+"""
+Compare provider page parsers on the saved Healthgrades fixture pages.
+
+Usage:
+    python benchmarks/bench_parsers.py [--repeat 50]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from provider_parsers import PARSERS  # noqa: E402
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def load_fixtures():
+    """Return [(zip_code, html)] for every healthgrades_<zip>.html fixture."""
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, "healthgrades_*.html"))):
+        zip_code = os.path.basename(path)[len("healthgrades_"):-len(".html")]
+        with open(path, encoding="utf-8") as f:
+            fixtures.append((zip_code, f.read()))
+    return fixtures
+
+
+def bench(parser, fixtures, repeat):
+    """Return the mean time per page in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for zip_code, html in fixtures:
+            parser.parse(html, zip_code)
+    return (time.perf_counter() - start) * 1000 / (repeat * len(fixtures))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    fixtures = load_fixtures()
+    parsers = {name: cls() for name, cls in PARSERS.items()}
+
+    # Every parser must extract exactly the same providers
+    reference = {zip_code: parsers["soup"].parse(html, zip_code) for zip_code, html in fixtures}
+    for name, page_parser in parsers.items():
+        for zip_code, html in fixtures:
+            if page_parser.parse(html, zip_code) != reference[zip_code]:
+                sys.exit(f"{name} disagrees with the soup parser on {zip_code}")
+
+    providers = sum(len(rows) for rows in reference.values())
+    print(f"{len(fixtures)} pages, {providers} providers, {args.repeat} repeats")
+    baseline = None
+    for name, page_parser in parsers.items():
+        ms = bench(page_parser, fixtures, args.repeat)
+        baseline = baseline or ms
+        print(f"{name:>6}: {ms:8.3f} ms/page  ({baseline / ms:5.1f}x vs {next(iter(parsers))})")
+
+
+if __name__ == "__main__":
+    main()
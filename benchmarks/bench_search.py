@@ -0,0 +1,289 @@
+"""
+Offline benchmarks for the search path, replaying recorded API responses.
+
+Google Places, Geocoding and OpenAI are served by a local stub server
+(benchmarks/stub_api.py) from the fixtures in benchmarks/fixtures, so the
+real request, parsing, matching and rendering code runs without network
+access. Scenarios cover the stages behind the app's get_lat_lon_from_query,
+classify_issue_with_openai_cached and stream_healthcare_data_google, plus map
+and sidebar rendering, across result-set sizes and provider-table sizes, and
+a search answered from the local facility catalog. The headless search API (search_api.py) is driven in-process through its ASGI
+interface, for single and batched queries in JSON and Arrow.
+
+Usage:
+    python benchmarks/bench_search.py [--quick] [--check | --update-baseline]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from openai import Client
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import geocoding  # noqa: E402
+import places  # noqa: E402
+from classifier import IssueClassifier, KeywordClassifier, openai_completion  # noqa: E402
+from facilities import sidebar_markdown  # noqa: E402
+from facility_catalog import FacilityCatalog, TilePrefetcher  # noqa: E402
+from geocoding import Gazetteer, LocationResolver, geocode_google, load_gazetteer  # noqa: E402
+from http_client import HttpClient  # noqa: E402
+from map_render import render_map_html  # noqa: E402
+from provider_store import PROVIDERS_CSV, ProviderStore, get_provider_store  # noqa: E402
+from ranking import RANK_BY_SCORE, rank_facilities  # noqa: E402
+from search_api import ARROW_CONTENT_TYPE, SearchApi  # noqa: E402
+from search_pipeline import SearchPipeline  # noqa: E402
+from stub_api import StubApi  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+RESULT_SIZES = (20, 60, 200, 1000)
+PROVIDER_SIZES = (3_000, 30_000, 300_000, 1_000_000)
+QUICK_RESULT_SIZES = (20, 60)
+QUICK_PROVIDER_SIZES = (3_000, 30_000)
+
+DAVIS = (38.5449, -121.7405)
+LOS_ANGELES = (33.9884, -118.2734)  # Densest part of the bundled provider table
+SEARCH_RADIUS_M = 10000
+
+# A scenario regresses when its median exceeds the baseline by this factor plus this many ms
+REGRESSION_TOLERANCE = 0.5
+REGRESSION_SLACK_MS = 1.0
+
+
+def measure(fn, repeat, warmup=1):
+    """
+    Time `fn` and measure its peak traced memory in a separate run.
+
+    Returns:
+        dict: median_ms, p95_ms, ops_per_s and peak_mib.
+    """
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    median = statistics.median(times)
+    return {
+        "median_ms": median,
+        "p95_ms": times[min(len(times) - 1, int(0.95 * len(times)))],
+        "ops_per_s": 1000 / median if median else float("inf"),
+        "peak_mib": peak / (1 << 20),
+    }
+
+
+def synthetic_providers(rows, seed=0):
+    """
+    Provider table of `rows` rows, tiled from the bundled dataset with jittered
+    coordinates so density grows with the row count.
+    """
+    base = pd.read_csv(PROVIDERS_CSV, dtype={"ZIP": str})
+    base = base.dropna(subset=["latitude", "longitude"]).reset_index(drop=True)
+    rng = np.random.default_rng(seed)
+    take = np.resize(np.arange(len(base)), rows)
+    data = base.iloc[take].reset_index(drop=True)
+    copy = np.arange(rows) // len(base)
+    jitter = np.where(copy == 0, 0.0, 1.0)
+    data["latitude"] = (data["latitude"] + jitter * rng.uniform(-0.05, 0.05, rows)).round(5)
+    data["longitude"] = (data["longitude"] + jitter * rng.uniform(-0.05, 0.05, rows)).round(5)
+    data["Name"] = data["Name"].where(copy == 0, data["Name"] + " " + copy.astype(str))
+    return data
+
+
+def first_batch(pipeline, place_types):
+    """Time-to-first-result of a streamed search: fetch and assemble its first page, then cancel the rest."""
+    stream = pipeline.stream_facilities(*DAVIS, SEARCH_RADIUS_M, place_types)
+    try:
+        return next(stream)
+    finally:
+        stream.close()
+
+
+def asgi_request(app, method, path, body=None, headers=()):
+    """
+    Send one HTTP request straight to an ASGI app, without a server.
+
+    Returns:
+        tuple: (status, headers, body) of the response.
+    """
+    request = {"type": "http.request", "body": json.dumps(body).encode() if body is not None else b""}
+    response = {}
+
+    async def receive():
+        return request
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = dict(message["headers"])
+        else:
+            response["body"] = message["body"]
+
+    scope = {"type": "http", "method": method, "path": path, "headers": list(headers)}
+    asyncio.run(app(scope, receive, send))
+    return response["status"], response["headers"], response["body"]
+
+
+def api_search(app, body, arrow=False):
+    headers = [(b"accept", ARROW_CONTENT_TYPE.encode())] if arrow else []
+    status, _, payload = asgi_request(app, "POST", "/search", body, headers)
+    if status != 200:
+        raise RuntimeError(f"Search API returned {status}: {payload[:200]}")
+    return payload
+
+
+def run_benchmarks(stub, result_sizes, provider_sizes, repeat):
+    """Run every scenario against the stub server; returns {scenario: measurements}."""
+    results = {}
+
+    def record(name, fn, repeat=repeat):
+        results[name] = measure(fn, repeat)
+        r = results[name]
+        print(f"{name:<28} {r['median_ms']:10.2f} ms  p95 {r['p95_ms']:10.2f} ms  "
+              f"{r['ops_per_s']:10.1f}/s  peak {r['peak_mib']:8.2f} MiB", flush=True)
+
+    provider_store = get_provider_store()
+
+    # Location: offline gazetteer and the remote geocoder (no cache, so every call is replayed)
+    gazetteer = load_gazetteer(provider_store.data)
+    record("geocode.gazetteer", lambda: LocationResolver(gazetteer).resolve("95616"))
+    remote = LocationResolver(Gazetteer(), geocode=lambda query: geocode_google(query, "bench"))
+    record("geocode.remote", lambda: remote.resolve("Sacramento, CA"))
+
+    # Classification through the OpenAI client; an empty keyword table forces the remote path
+    classifier = IssueClassifier(
+        ["Pharmacy", "Hospital", "Doctor", "Dentist", "Veterinary", "Physiotherapist"],
+        complete=openai_completion(Client(api_key="bench", base_url=stub.openai_base_url)),
+        keyword_classifier=KeywordClassifier(keywords={}),
+    )
+    record("classify.remote", lambda: classifier.classify("I have had a strange feeling for days"))
+
+    # Search, Medicaid match and rendering across result-set sizes
+    pipeline = SearchPipeline("bench", provider_store)
+    for size in result_sizes:
+        stub.results_per_search = size
+        search = lambda: pipeline.fetch_facilities(*DAVIS, SEARCH_RADIUS_M, ["pharmacy"])
+        record(f"search[{size}]", search)
+        record(f"search.first_batch[{size}]", lambda: first_batch(pipeline, ["pharmacy"]))
+        facilities, _ = search()
+        record(f"render.map[{size}]", lambda: render_map_html(facilities, *DAVIS, SEARCH_RADIUS_M))
+        record(f"render.sidebar[{size}]", lambda: sidebar_markdown(
+            rank_facilities(facilities, by=RANK_BY_SCORE, k=100, radius_m=SEARCH_RADIUS_M)
+        ))
+
+    # Local catalog: fill every tile of the search circle, then answer the search from them
+    stub.results_per_search = 20
+    catalog = FacilityCatalog(":memory:")
+    prefetcher = TilePrefetcher(catalog, "bench", client=HttpClient(), daily_calls=10_000)  # Unthrottled
+    for place_type, tile in catalog.missing_tiles(*DAVIS, SEARCH_RADIUS_M, ["pharmacy"]):
+        prefetcher.fill(place_type, tile)
+    pipeline = SearchPipeline("bench", provider_store, catalog=catalog)
+    record("search.catalog", lambda: pipeline.fetch_facilities(*DAVIS, SEARCH_RADIUS_M, ["pharmacy"]))
+
+    # Headless API: one query, and a batch of queries around different centers
+    stub.results_per_search = 60
+    api = SearchApi(SearchPipeline(
+        "bench", provider_store, location_resolver=LocationResolver(gazetteer), classify=classifier.classify
+    ))
+    query = {"location": "95616", "radius": SEARCH_RADIUS_M, "care_type": "Pharmacy"}
+    batch = {"queries": [
+        {"latitude": DAVIS[0] + i * 0.01, "longitude": DAVIS[1], "radius": SEARCH_RADIUS_M, "care_type": "Doctor"}
+        for i in range(10)
+    ]}
+    record("api.search", lambda: api_search(api, query))
+    record("api.search.arrow", lambda: api_search(api, query, arrow=True))
+    record("api.batch[10]", lambda: api_search(api, batch))
+    record("api.batch[10].arrow", lambda: api_search(api, batch, arrow=True))
+
+    # Provider load and Medicaid matching across provider-table sizes
+    stub.results_per_search = 60
+    facilities, _ = SearchPipeline("bench", provider_store).fetch_facilities(
+        *LOS_ANGELES, SEARCH_RADIUS_M, ["doctor"]
+    )
+    for rows in provider_sizes:
+        data = synthetic_providers(rows)
+        store = ProviderStore(data, f"synthetic-{rows}")
+        record(f"providers.load[{rows}]", lambda: ProviderStore(data, f"synthetic-{rows}"),
+               repeat=max(1, min(repeat, 3_000_000 // rows)))
+        pipeline = SearchPipeline("bench", store)
+        record(f"match[{rows}]", lambda: pipeline.match_medicaid(facilities, *LOS_ANGELES, SEARCH_RADIUS_M))
+        del data, store, pipeline
+    return results
+
+
+def check_regressions(results, baseline):
+    """Return a message for every scenario slower than the baseline allows."""
+    failures = []
+    for name, measured in results.items():
+        if name not in baseline:
+            continue
+        allowed = baseline[name]["median_ms"] * (1 + REGRESSION_TOLERANCE) + REGRESSION_SLACK_MS
+        if measured["median_ms"] > allowed:
+            failures.append(
+                f"{name}: {measured['median_ms']:.2f} ms > {allowed:.2f} ms "
+                f"(baseline {baseline[name]['median_ms']:.2f} ms)"
+            )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="Only the smaller sizes")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--check", action="store_true", help="Fail if a scenario regressed against the baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    result_sizes = QUICK_RESULT_SIZES if args.quick else RESULT_SIZES
+    provider_sizes = QUICK_PROVIDER_SIZES if args.quick else PROVIDER_SIZES
+
+    with StubApi() as stub:
+        # Point the API clients at the stub; its page tokens are ready at once, so skip the first wait
+        places.PLACES_NEARBY_URL = stub.places_url
+        places.PAGE_TOKEN_FIRST_POLL_S = 0
+        geocoding.GEOCODE_URL = stub.geocode_url
+        results = run_benchmarks(stub, result_sizes, provider_sizes, args.repeat)
+        print(f"stub requests: {stub.requests}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+
+    if args.check:
+        with open(args.baseline) as f:
+            failures = check_regressions(results, json.load(f))
+        if failures:
+            sys.exit("Regressions:\n  " + "\n  ".join(failures))
+        print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Local stand-in for the Google Places, Geocoding and OpenAI HTTP APIs.
+
+Responses are replayed from the recorded fixtures in benchmarks/fixtures.
+Nearby searches are scaled to any result count by repeating the recorded
+page around the requested location, 20 results per page, linked by page
+tokens like the real API.
+"""
+import copy
+import json
+import os
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+PAGE_SIZE = 20  # Results per Places page, as in the real API
+
+
+class _Server(ThreadingHTTPServer):
+    # The default backlog of 5 drops connections under concurrent searches,
+    # and each drop costs a one-second SYN retransmit
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+class StubApi:
+    """
+    Threaded HTTP server replaying the recorded API responses.
+
+    Attributes:
+        results_per_search (int): Places results returned for each place type.
+        spread_m (float): Results are scattered up to this far from the search center.
+        requests (dict): Request count per endpoint.
+    """
+
+    def __init__(self, results_per_search=60, spread_m=5000.0):
+        self.results_per_search = results_per_search
+        self.spread_m = spread_m
+        self.requests = {}
+        self._places_page = load_fixture("places_nearby_95616.json")
+        self._geocode = load_fixture("geocode_davis.json")
+        self._chat_completion = load_fixture("openai_chat_completion.json")
+        self._lock = threading.Lock()
+        self._server = _Server(("127.0.0.1", 0), self._handler())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def places_url(self):
+        return f"{self.base_url}/maps/api/place/nearbysearch/json"
+
+    @property
+    def geocode_url(self):
+        return f"{self.base_url}/maps/api/geocode/json"
+
+    @property
+    def openai_base_url(self):
+        return f"{self.base_url}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, endpoint):
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    def places_page(self, query):
+        """Build one nearby-search page; page tokens encode the search and the page number."""
+        if "pagetoken" in query:
+            latitude, longitude, place_type, page = query["pagetoken"].split(":")
+            latitude, longitude, page = float(latitude), float(longitude), int(page)
+        else:
+            latitude, longitude = map(float, query["location"].split(","))
+            place_type, page = query.get("type", ""), 0
+
+        start = page * PAGE_SIZE
+        stop = min(start + PAGE_SIZE, self.results_per_search)
+        rnd = random.Random(f"{latitude:.4f},{longitude:.4f},{place_type},{page}")
+        spread_deg = self.spread_m / 111320.0
+        results = []
+        for i in range(start, stop):
+            result = copy.deepcopy(self._places_page["results"][i % len(self._places_page["results"])])
+            result["place_id"] = f"{result['place_id']}-{place_type}-{i}"
+            result["geometry"]["location"] = {
+                "lat": latitude + rnd.uniform(-spread_deg, spread_deg) * 0.7,
+                "lng": longitude + rnd.uniform(-spread_deg, spread_deg) * 0.7,
+            }
+            results.append(result)
+
+        page_data = {"html_attributions": [], "results": results, "status": "OK"}
+        if stop < self.results_per_search:
+            page_data["next_page_token"] = f"{latitude}:{longitude}:{place_type}:{page + 1}"
+        return page_data
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, so pooled clients reuse connections
+            disable_nagle_algorithm = True  # Headers and body are separate writes
+
+            def _send(self, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                if url.path.endswith("/place/nearbysearch/json"):
+                    stub._count("places")
+                    self._send(stub.places_page(query))
+                elif url.path.endswith("/geocode/json"):
+                    stub._count("geocode")
+                    self._send(stub._geocode)
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.path.endswith("/chat/completions"):
+                    stub._count("openai")
+                    self._send(stub._chat_completion)
+                else:
+                    self.send_error(404)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
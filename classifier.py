@@ -0,0 +1,334 @@
+import math
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from tracing import count, span
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CLASSIFICATION_CACHE_PATH = os.path.join(BASE_DIR, ".cache", "classifications.sqlite")
+
+PRIMARY_MODEL = "gpt-4o-mini"
+FALLBACK_MODEL = "gpt-3.5-turbo"
+REQUEST_TIMEOUT_S = 10.0  # Overall budget for one classification request
+HEDGE_DELAY_S = 2.0  # Start the fallback model if the primary has not answered by then
+MAX_TOKENS_PER_ISSUE = 20
+
+# Keyword classifier: answers are only trusted above this share of the total
+# score, and when at least this many keywords of the category matched; a single
+# keyword ("dog" in "bitten by a dog") is not enough evidence
+CONFIDENCE_THRESHOLD = 0.75
+MIN_KEYWORD_HITS = 2
+
+ERROR_LABEL = "Error"
+
+# Cache keys; v2 drops the keyword answers earlier versions cached without enough evidence
+CACHE_KEY_PREFIX = "classify:v2:"
+
+SYSTEM_PROMPT = "You are a healthcare classification assistant."
+
+PROMPT_EXAMPLES = """    Examples:
+    - "I need medication for my cold" -> Pharmacy
+    - "I broke my arm and need treatment" -> Hospital
+    - "My dog needs a checkup" -> Veterinary
+    - "I need help recovering from a sports injury" -> Physiotherapist
+    - "I need dental work" -> Dentist"""
+
+# Keyword -> weight per care type. Animal words outweigh everything else so
+# "my dog broke its leg" goes to a vet, not a hospital.
+CATEGORY_KEYWORDS = {
+    "Pharmacy": {
+        "medication": 1, "medicine": 1, "prescription": 1, "refill": 1, "pharmacy": 2, "pills": 1,
+        "flu": 1, "cough": 1, "allergy": 1, "allergies": 1, "antibiotics": 1, "ointment": 1,
+        "inhaler": 1, "vaccine": 1,
+    },
+    "Hospital": {
+        "broke": 1, "broken": 1, "fracture": 1, "emergency": 2, "bleeding": 1, "chest pain": 2,
+        "heart attack": 2, "stroke": 2, "surgery": 1, "accident": 1, "unconscious": 2, "burn": 1,
+        "trauma": 1, "head injury": 2, "overdose": 2, "seizure": 2, "hospital": 2,
+    },
+    "Doctor": {
+        "checkup": 1, "physical exam": 1, "fever": 1, "rash": 1, "doctor": 2, "appointment": 1,
+        "infection": 1, "sore throat": 1, "headache": 1, "blood pressure": 1, "diabetes": 1,
+        "referral": 1, "ear infection": 1,
+    },
+    "Dentist": {
+        "tooth": 2, "teeth": 2, "dental": 2, "cavity": 2, "toothache": 2, "gum": 1, "gums": 1,
+        "braces": 1, "filling": 1, "crown": 1, "wisdom": 1, "root canal": 2, "dentist": 2,
+    },
+    "Veterinary": {
+        "dog": 3, "cat": 3, "puppy": 3, "kitten": 3, "pet": 3, "vet": 3, "horse": 3, "bird": 3,
+        "rabbit": 3, "hamster": 3, "parrot": 3, "animal": 3,
+    },
+    "Physiotherapist": {
+        "sports injury": 2, "recovering": 1, "recovery": 1, "rehab": 2, "rehabilitation": 2,
+        "physiotherapy": 2, "physical therapy": 2, "sprain": 1, "sprained": 1, "strain": 1,
+        "back pain": 1, "mobility": 1, "stretching": 1, "physio": 2,
+    },
+}
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+_BATCH_LINE = re.compile(r"^\s*(\d+)\s*[:.)-]\s*(.+?)\s*$")
+
+
+def normalize_description(text):
+    """Lowercase an issue description and strip punctuation and extra whitespace."""
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", text.lower())).strip()
+
+
+class KeywordClassifier:
+    """
+    Local keyword classifier for issue descriptions.
+
+    Keyword weights are scaled by an inverse category frequency, so words
+    shared by several care types count for less. Matching is done on unigrams
+    and bigrams of the normalized text. Ambiguous words ("shot", "cold") are
+    left out; descriptions without enough evidence go to the remote model.
+    """
+
+    def __init__(self, keywords=CATEGORY_KEYWORDS, threshold=CONFIDENCE_THRESHOLD, min_hits=MIN_KEYWORD_HITS):
+        """
+        Args:
+            keywords (dict): Care type -> {keyword: weight}.
+            threshold (float): Minimum share of the total score to trust an answer.
+            min_hits (int): Minimum number of distinct keywords of the answer's care type.
+        """
+        self.threshold = threshold
+        self.min_hits = min_hits
+        document_frequency = {}
+        for terms in keywords.values():
+            for term in terms:
+                document_frequency[term] = document_frequency.get(term, 0) + 1
+
+        self._term_weights = {}
+        for category, terms in keywords.items():
+            for term, weight in terms.items():
+                idf = math.log(1 + len(keywords) / document_frequency[term])
+                self._term_weights.setdefault(term, []).append((category, weight * idf))
+
+    def scores(self, description):
+        """Return {care type: score} for a normalized description."""
+        return self._match(description)[0]
+
+    def _match(self, description):
+        tokens = description.split()
+        terms = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        scores = {}
+        hits = {}
+        for term in set(terms):
+            for category, weight in self._term_weights.get(term, ()):
+                scores[category] = scores.get(category, 0.0) + weight
+                hits[category] = hits.get(category, 0) + 1
+        return scores, hits
+
+    def predict(self, description):
+        """
+        Returns:
+            tuple: (care type, confidence) for a normalized description;
+            (None, 0.0) when no keyword matched.
+        """
+        scores = self.scores(description)
+        if not scores:
+            return None, 0.0
+        category = max(scores, key=scores.get)
+        return category, scores[category] / sum(scores.values())
+
+    def classify(self, description):
+        """Return the care type if the prediction is confident and has enough keywords, otherwise None."""
+        scores, hits = self._match(description)
+        if not scores:
+            return None
+        category = max(scores, key=scores.get)
+        if hits[category] < self.min_hits or scores[category] / sum(scores.values()) < self.threshold:
+            return None
+        return category
+
+
+def openai_completion(client):
+    """
+    Adapt an OpenAI client to the completion callable used by IssueClassifier.
+
+    Returns:
+        callable: complete(model, messages, max_tokens, timeout) -> str
+    """
+    def complete(model, messages, max_tokens, timeout):
+        response = client.with_options(timeout=timeout, max_retries=0).chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=0
+        )
+        return response.choices[0].message.content.strip()
+    return complete
+
+
+class IssueClassifier:
+    """
+    Classifies issue descriptions into care types.
+
+    Lookups go through a persistent cache of normalized descriptions, then
+    the local keyword classifier, and only then the remote model. Only remote
+    answers are cached; keyword answers are cheap to recompute and follow
+    changes to the keyword table. Remote
+    requests are hedged: the fallback model is started if the primary is slow
+    or fails, and whichever answers first wins. Any `complete` callable with
+    the `openai_completion` signature can stand in for the remote model.
+    """
+
+    def __init__(self, categories, cache=None, complete=None, keyword_classifier=None,
+                 primary_model=PRIMARY_MODEL, fallback_model=FALLBACK_MODEL,
+                 timeout_s=REQUEST_TIMEOUT_S, hedge_delay_s=HEDGE_DELAY_S):
+        """
+        Args:
+            categories (list): Care type labels the classifier may return.
+            cache (TTLCache): Persistent cache of past classifications.
+            complete (callable): Remote completion, or None to stay offline.
+            keyword_classifier (KeywordClassifier): Local fast-path classifier.
+            primary_model (str): Model asked first.
+            fallback_model (str): Hedge model; None disables hedging.
+            timeout_s (float): Overall time budget per remote request.
+            hedge_delay_s (float): Delay before the fallback model is started.
+        """
+        self.categories = list(categories)
+        self.cache = cache
+        self.complete = complete
+        self.keyword_classifier = keyword_classifier or KeywordClassifier()
+        self.primary_model = primary_model
+        self.fallback_model = fallback_model
+        self.timeout_s = timeout_s
+        self.hedge_delay_s = hedge_delay_s
+
+        self._labels = {normalize_description(category): category for category in self.categories}
+        self._executor = ThreadPoolExecutor(max_workers=4)
+
+    def _prompt(self, issues):
+        if len(issues) == 1:
+            return f"""
+    You are an expert in healthcare classification. Classify the following issue description into one of these categories:
+    {', '.join(self.categories)}.
+
+{PROMPT_EXAMPLES}
+
+    Issue: {issues[0]}
+    Category:"""
+        numbered = "\n".join(f"    {i}. {issue}" for i, issue in enumerate(issues, 1))
+        return f"""
+    You are an expert in healthcare classification. Classify each of the following issue descriptions into one of these categories:
+    {', '.join(self.categories)}.
+
+{PROMPT_EXAMPLES}
+
+    Answer with one line per issue in the form "<number>: <category>".
+
+    Issues:
+{numbered}
+    Categories:"""
+
+    def _parse_label(self, text):
+        return self._labels.get(normalize_description(text))
+
+    def _complete_hedged(self, prompt, max_tokens):
+        """Ask the primary model, hedging with the fallback; returns the text or None."""
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+        start = time.monotonic()
+        count("external.openai")
+        primary = self._executor.submit(self.complete, self.primary_model, messages, max_tokens, self.timeout_s)
+        models = {primary: self.primary_model}
+        pending = {primary}
+        hedged = self.fallback_model is None
+
+        while pending:
+            elapsed = time.monotonic() - start
+            remaining = self.timeout_s - elapsed
+            if remaining <= 0:
+                print(f"Classification timed out after {self.timeout_s}s.")
+                return None
+            timeout = remaining if hedged else min(remaining, max(self.hedge_delay_s - elapsed, 0))
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                try:
+                    return future.result()
+                except Exception as e:
+                    print(f"Error with {models[future]}: {e}.")
+
+            # Hedge when the primary failed or is taking too long
+            if not hedged and (done or time.monotonic() - start >= self.hedge_delay_s):
+                count("external.openai")
+                count("classify.hedged")
+                fallback = self._executor.submit(
+                    self.complete, self.fallback_model, messages, max_tokens, self.timeout_s - elapsed
+                )
+                models[fallback] = self.fallback_model
+                pending.add(fallback)
+                hedged = True
+        return None
+
+    def _classify_remote(self, issues):
+        """Classify normalized issues in a single remote request."""
+        if self.complete is None or not issues:
+            return [None] * len(issues)
+        text = self._complete_hedged(self._prompt(issues), MAX_TOKENS_PER_ISSUE * len(issues) + 10)
+        if text is None:
+            return [None] * len(issues)
+        if len(issues) == 1:
+            return [self._parse_label(text)]
+
+        labels = [None] * len(issues)
+        for line in text.splitlines():
+            match = _BATCH_LINE.match(line)
+            if match and 1 <= int(match.group(1)) <= len(issues):
+                labels[int(match.group(1)) - 1] = self._parse_label(match.group(2))
+        return labels
+
+    def _local_fallback(self, issue):
+        # Offline or failed remote call: take the best keyword guess if there is one
+        category, _ = self.keyword_classifier.predict(issue)
+        return category or ERROR_LABEL
+
+    def classify_batch(self, descriptions):
+        """
+        Classify many descriptions, sending every unresolved one in one remote request.
+
+        Args:
+            descriptions (list): Issue descriptions.
+
+        Returns:
+            list: One care type label (or ERROR_LABEL) per description.
+        """
+        with span("classify", issues=len(descriptions)):
+            return self._classify_batch(descriptions)
+
+    def _classify_batch(self, descriptions):
+        issues = [normalize_description(description) for description in descriptions]
+        resolved = {}
+        unresolved = []
+        for issue in dict.fromkeys(issue for issue in issues if issue):
+            label = self.cache.get(f"{CACHE_KEY_PREFIX}{issue}") if self.cache is not None else None
+            if label is None:
+                label = self.keyword_classifier.classify(issue)
+                if label is not None:
+                    count("classify.keyword")
+            if label is None:
+                unresolved.append(issue)
+            else:
+                resolved[issue] = label
+
+        for issue, label in zip(unresolved, self._classify_remote(unresolved)):
+            if label is None:
+                label = self._local_fallback(issue)
+            elif self.cache is not None:
+                self.cache.set(f"{CACHE_KEY_PREFIX}{issue}", label)
+            resolved[issue] = label
+
+        return [resolved.get(issue, ERROR_LABEL) if issue else ERROR_LABEL for issue in issues]
+
+    def classify(self, description):
+        """Classify a single issue description."""
+        return self.classify_batch([description])[0]
@@ -0,0 +1,312 @@
+"""
+Bulk Medicaid coverage analysis: run many locations through the search engine.
+
+For every location (by default every standard ZIP code of the given states
+in zip_code_database.csv) the facilities of each care type within the
+radius are fetched and matched against the Medicaid providers, and
+summarized into one row: facilities per care type, how many of them are
+Medicaid-supported, and the distance to the nearest Medicaid-supported one.
+
+Locations are spread over a thread pool sharing one search pipeline, so the
+Places, geocoding and provider caches and the facility catalog are shared,
+and Google requests are throttled per host through the shared HTTP client.
+Every finished row is appended to a checkpoint file, so an interrupted run
+picks up where it stopped; the summary table is written as Parquet or CSV at
+the end.
+
+With --stub the Google APIs are replaced by the recorded responses in
+benchmarks/fixtures (served by benchmarks/stub_api.py) and the caches go to
+a temporary directory, so a run needs neither network access nor an API key.
+
+Example:
+    python coverage_batch.py --zip-database zip_code_database.csv --states CA \\
+        --radius-miles 10 --output ca_coverage.parquet
+    python coverage_batch.py --locations 95616 "Sacramento, CA" --stub --output coverage.csv
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+import geocoding
+import places
+from facilities import VALID_MEDICAID_CATEGORIES
+from http_client import HostLimiter, get_http_client
+from search_pipeline import CARE_TYPES, build_search_pipeline, place_types_for
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_WORKERS = 8
+DEFAULT_RADIUS_MILES = 10.0
+METERS_PER_MILE = 1609.34
+MAX_REQUESTS_PER_HOST = 8  # Concurrent Google requests
+MIN_REQUEST_INTERVAL_S = 0.05  # Spacing between Google request starts (20 per second)
+PROGRESS_EVERY = 100  # Locations between progress lines
+
+# Care types whose facilities can be Medicaid-supported
+COVERAGE_CARE_TYPES = [
+    label for label, place_type in CARE_TYPES.items()
+    if isinstance(place_type, str) and place_type in VALID_MEDICAID_CATEGORIES
+]
+
+
+def load_zip_locations(path, states):
+    """
+    Read the standard ZIP codes of the given states, with their coordinates.
+
+    Args:
+        path (str): zip_code_database.csv with zip, type, primary_city, state,
+            latitude and longitude columns.
+        states (list): Two-letter state codes, e.g. ["CA", "OR"].
+
+    Returns:
+        pd.DataFrame: location (the ZIP code), city, state, latitude and longitude.
+    """
+    zips = pd.read_csv(
+        path, dtype={"zip": str}, usecols=["zip", "type", "primary_city", "state", "latitude", "longitude"]
+    )
+    # only consider standard zip codes
+    zips = zips[(zips["type"] == "STANDARD") & zips["state"].isin(states)]
+    return pd.DataFrame({
+        "location": zips["zip"].str.zfill(5),
+        "city": zips["primary_city"],
+        "state": zips["state"],
+        "latitude": zips["latitude"],
+        "longitude": zips["longitude"],
+    }).reset_index(drop=True)
+
+
+def care_type_column(label):
+    """Column prefix of a care type, e.g. "pharmacy" for "Pharmacy"."""
+    return label.lower().replace(" ", "_")
+
+
+def summarize_location(pipeline, location, latitude, longitude, radius_m, care_types=COVERAGE_CARE_TYPES):
+    """
+    Medicaid coverage around one location.
+
+    Args:
+        pipeline (SearchPipeline): Search engine to query.
+        location (str): Location label, resolved to coordinates if they are missing.
+        latitude (float): Location latitude, or NaN.
+        longitude (float): Location longitude, or NaN.
+        radius_m (float): Search radius in meters.
+        care_types (list): CARE_TYPES labels to summarize.
+
+    Returns:
+        tuple: (row, errors) with the summary row and the messages of any failed Places requests.
+
+    Raises:
+        ValueError: The location cannot be resolved.
+    """
+    if latitude is None or longitude is None or math.isnan(latitude) or math.isnan(longitude):
+        latitude, longitude = pipeline.resolve_location(location)
+        if latitude is None:
+            raise ValueError(f"Location not found: {location}")
+
+    row = {"location": location, "latitude": latitude, "longitude": longitude, "radius_m": radius_m}
+    errors = []
+    for label in care_types:
+        facilities, type_errors = pipeline.fetch_facilities(latitude, longitude, radius_m, place_types_for(label))
+        errors.extend(type_errors)
+        medicaid = facilities["medicaid_supported"].to_numpy(dtype=bool)
+        prefix = care_type_column(label)
+        row[f"{prefix}_facilities"] = len(facilities)
+        row[f"{prefix}_medicaid"] = int(medicaid.sum())
+        row[f"{prefix}_nearest_medicaid_km"] = (
+            float(facilities["distance"].to_numpy()[medicaid].min()) if medicaid.any() else None
+        )
+    return row, errors
+
+
+class SummaryCheckpoint:
+    """
+    Append-only JSON Lines file of finished summary rows, keyed by location.
+
+    The first line records the run parameters (radius and care types), so a
+    run never resumes from rows that were summarized with different ones.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.params = None
+        self.rows = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        row = json.loads(line)
+                        if "params" in row:
+                            self.params = row["params"]
+                        else:
+                            self.rows[row["location"]] = row
+
+    def start(self, params):
+        """
+        Resume a run with `params`, recording them first in a new checkpoint.
+
+        Raises:
+            ValueError: The checkpoint was written with other parameters.
+        """
+        with self._lock:
+            if self.params is None and not self.rows:
+                self._append({"params": params})
+                self.params = params
+            elif self.params != params:
+                raise ValueError(
+                    f"Checkpoint {self.path} was written with parameters {self.params}, not {params}; "
+                    "pass another --checkpoint to start over"
+                )
+
+    def add(self, row):
+        with self._lock:
+            self._append(row)
+            self.rows[row["location"]] = row
+
+    def _append(self, record):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def run_coverage(locations, pipeline, checkpoint, radius_m, care_types=COVERAGE_CARE_TYPES,
+                 workers=DEFAULT_WORKERS):
+    """
+    Summarize every location not yet in the checkpoint.
+
+    Args:
+        locations (pd.DataFrame): location, latitude and longitude columns
+            (coordinates may be NaN), plus any columns to carry into the output.
+        pipeline (SearchPipeline): Search engine shared by all workers.
+        checkpoint (SummaryCheckpoint): Finished rows, of a run with the same
+            radius and care types.
+        radius_m (float): Search radius in meters.
+        care_types (list): CARE_TYPES labels to summarize.
+        workers (int): Locations processed at once.
+
+    Returns:
+        tuple: (summary, stats) with one row per finished location, in input
+        order, and counts of summarized, skipped and failed locations.
+
+    Raises:
+        ValueError: The checkpoint belongs to a run with other parameters.
+    """
+    checkpoint.start({"radius_m": radius_m, "care_types": sorted(care_types)})
+    locations = locations.drop_duplicates("location").reset_index(drop=True)
+    pending = locations[~locations["location"].isin(checkpoint.rows.keys())]
+    stats = {"summarized": 0, "skipped": len(locations) - len(pending), "failed": 0}
+
+    def summarize(record):
+        row, errors = summarize_location(
+            pipeline, record["location"], record["latitude"], record["longitude"], radius_m, care_types
+        )
+        if errors:
+            # An incomplete row is not checkpointed, so the next run retries the location
+            raise RuntimeError("; ".join(errors))
+        checkpoint.add(row)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(summarize, record): record["location"] for record in pending.to_dict("records")}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                future.result()
+                stats["summarized"] += 1
+            except Exception as e:
+                stats["failed"] += 1
+                print(f"Error summarizing {futures[future]}: {e}")
+            if done % PROGRESS_EVERY == 0:
+                print(f"{done}/{len(pending)} locations done")
+
+    rows = pd.DataFrame([checkpoint.rows[location] for location in locations["location"] if location in checkpoint.rows])
+    if rows.empty:
+        return rows, stats
+    # Carry the input's extra columns (city, state) next to the location
+    extra = locations.drop(columns=["latitude", "longitude"])
+    return extra.merge(rows, on="location", how="inner"), stats
+
+
+def write_summary(summary, path):
+    """Write the summary as Parquet if `path` ends in .parquet, otherwise as CSV."""
+    if path.endswith(".parquet"):
+        summary.to_parquet(path, index=False)
+    else:
+        summary.to_csv(path, index=False)
+
+
+def start_stub():
+    """Serve the recorded Google responses locally and point the API modules at them."""
+    sys.path.insert(0, os.path.join(BASE_DIR, "benchmarks"))
+    from stub_api import StubApi
+
+    stub = StubApi().start()
+    places.PLACES_NEARBY_URL = stub.places_url
+    places.PAGE_TOKEN_FIRST_POLL_S = 0  # Stub page tokens are ready at once
+    geocoding.GEOCODE_URL = stub.geocode_url
+    return stub
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize Medicaid coverage around many locations.")
+    parser.add_argument("--zip-database", help="Path to zip_code_database.csv")
+    parser.add_argument("--states", nargs="+", default=["CA"], help="Two-letter state codes to cover")
+    parser.add_argument("--locations", nargs="+", help="Free-text locations instead of a ZIP code database")
+    parser.add_argument("--radius-miles", type=float, default=DEFAULT_RADIUS_MILES)
+    parser.add_argument("--care-types", nargs="+", default=COVERAGE_CARE_TYPES, choices=list(CARE_TYPES))
+    parser.add_argument("--output", default="coverage.parquet", help=".parquet or .csv summary table")
+    parser.add_argument("--checkpoint", help="File of finished rows (default: <output>.jsonl)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--max-per-host", type=int, default=MAX_REQUESTS_PER_HOST)
+    parser.add_argument("--min-interval", type=float, default=MIN_REQUEST_INTERVAL_S,
+                        help="Seconds between Google request starts")
+    parser.add_argument("--cache-dir", help="Directory of the Places and geocoding caches (default: the app's)")
+    parser.add_argument("--stub", action="store_true", help="Replay recorded API responses instead of calling Google")
+    parser.add_argument("--api-key", default=os.environ.get("GOOGLE_API_KEY"), help="Google API key")
+    args = parser.parse_args()
+
+    if args.locations:
+        locations = pd.DataFrame({"location": args.locations, "latitude": math.nan, "longitude": math.nan})
+    elif args.zip_database:
+        locations = load_zip_locations(args.zip_database, args.states)
+    else:
+        parser.error("Give --zip-database or --locations")
+
+    stub = None
+    cache_dir = args.cache_dir
+    if args.stub:
+        stub = start_stub()
+        cache_dir = cache_dir or tempfile.mkdtemp(prefix="coverage-cache-")
+    elif not args.api_key:
+        parser.error("Set GOOGLE_API_KEY or pass --api-key (or use --stub)")
+
+    get_http_client().limiter = HostLimiter(max_per_host=args.max_per_host, min_interval_s=args.min_interval)
+    # The batch itself covers the neighboring locations, so the catalog is not prefetched around each one
+    pipeline = build_search_pipeline(args.api_key or "stub", cache_dir=cache_dir, prefetch=False)
+    try:
+        summary, stats = run_coverage(
+            locations,
+            pipeline,
+            SummaryCheckpoint(args.checkpoint or f"{args.output}.jsonl"),
+            args.radius_miles * METERS_PER_MILE,
+            care_types=args.care_types,
+            workers=args.workers,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    finally:
+        if stub is not None:
+            stub.stop()
+    print(stats)
+    write_summary(summary, args.output)
+    print(f"{len(summary)} locations written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+
+VALID_MEDICAID_CATEGORIES = frozenset(["hospital", "pharmacy", "doctor", "dentist", "physiotherapist"])
+
+FACILITY_COLUMNS = [
+    "place_id",
+    "name",
+    "address",
+    "latitude",
+    "longitude",
+    "rating",
+    "user_ratings_total",
+    "open_now",
+    "wheelchair_accessible_entrance",
+    "medicaid_supported",
+]
+
+DIRECTIONS_URL = "https://www.google.com/maps/dir/?api=1&destination="
+
+# Marker colors by rating; anything below 1 star or unrated is gray
+RATING_THRESHOLDS = [4, 3, 2, 1]
+RATING_COLORS = ["green", "blue", "orange", "yellow"]
+UNRATED_COLOR = "gray"
+
+
+def empty_facilities():
+    """Return an empty facility frame with the standard columns."""
+    return normalize_places_results([])
+
+
+def concat_facilities(batches):
+    """Concatenate facility frames, e.g. the batches of a streamed search."""
+    batches = [batch for batch in batches if not batch.empty]
+    if not batches:
+        return empty_facilities()
+    if len(batches) == 1:
+        return batches[0]
+    return pd.concat(batches, ignore_index=True)
+
+
+def normalize_places_results(results, open_only=False):
+    """
+    Normalize raw Google Places results into a typed facility DataFrame.
+
+    The JSON is walked once to pull out every field; everything after that is
+    columnar. `medicaid_supported` only marks facilities in a category that
+    can be Medicaid-supported; the provider match refines it afterwards.
+
+    Args:
+        results (list): Raw Places nearby-search results.
+        open_only (bool): Drop facilities that are not currently open.
+
+    Returns:
+        pd.DataFrame: One row per facility with FACILITY_COLUMNS.
+    """
+    records = [
+        (
+            result.get("place_id"),
+            result.get("name", "Unknown"),
+            result.get("vicinity", "N/A"),
+            result["geometry"]["location"]["lat"],
+            result["geometry"]["location"]["lng"],
+            result.get("rating"),
+            result.get("user_ratings_total", 0),
+            result.get("opening_hours", {}).get("open_now"),
+            bool(result.get("wheelchair_accessible_entrance", False)),
+            not VALID_MEDICAID_CATEGORIES.isdisjoint(result.get("types", ())),
+        )
+        for result in results
+    ]
+    facilities = pd.DataFrame.from_records(records, columns=FACILITY_COLUMNS)
+
+    facilities = facilities.astype({
+        "place_id": "string",
+        "name": "string",
+        "address": "string",
+        "latitude": "float64",
+        "longitude": "float64",
+        "rating": "float64",
+        "user_ratings_total": "int64",
+        "open_now": "boolean",
+        "wheelchair_accessible_entrance": "bool",
+        "medicaid_supported": "bool",
+    })
+    facilities["latitude"] = facilities["latitude"].round(5)
+    facilities["longitude"] = facilities["longitude"].round(5)
+
+    if open_only:
+        facilities = facilities[facilities["open_now"].fillna(False).to_numpy(dtype=bool)].reset_index(drop=True)
+    return facilities
+
+
+def rating_colors(ratings):
+    """
+    Map ratings to marker colors.
+
+    Args:
+        ratings (pd.Series): Ratings, NaN when unrated.
+
+    Returns:
+        numpy.ndarray: One color name per rating.
+    """
+    values = ratings.to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.select([values >= threshold for threshold in RATING_THRESHOLDS], RATING_COLORS, UNRATED_COLOR)
+
+
+def _text(values):
+    # Object arrays concatenate element-wise in C, much faster than string Series
+    return np.asarray(values.astype(str), dtype=object)
+
+
+def _yes_no(flags):
+    return np.where(flags.to_numpy(dtype=bool), "Yes", "No").astype(object)
+
+
+def _rating_text(ratings):
+    return _text(ratings.round(1).astype(str).where(ratings.notna(), "No rating"))
+
+
+def directions_links(facilities):
+    """Return the Google Maps directions link for every facility."""
+    return DIRECTIONS_URL + _text(facilities["latitude"]) + "," + _text(facilities["longitude"])
+
+
+def sidebar_markdown(facilities):
+    """
+    Build the sidebar entry for every facility, in the order given.
+
+    Unrated facilities display as 0 stars.
+
+    Args:
+        facilities (pd.DataFrame): Facility rows, already ranked.
+
+    Returns:
+        numpy.ndarray: Markdown for each facility.
+    """
+    ordered = facilities.assign(rating=facilities["rating"].fillna(0))
+    distance = _text(ordered["distance"].round(2)) if "distance" in ordered else "N/A"
+    return (
+        "**" + _text(ordered["name"]) + "**\n"
+        + "- Address: " + _text(ordered["address"]) + "\n"
+        + "- Rating: " + _text(ordered["rating"]) + " ⭐\n"
+        + "- Wheelchair Accessible Entrance: " + _yes_no(ordered["wheelchair_accessible_entrance"]) + "\n"
+        + "- Distance: " + distance + " km\n"
+        + "[Get Directions](" + directions_links(ordered) + ")\n"
+    )
+
+
+def popup_html(facilities):
+    """
+    Build the map popup HTML for every facility.
+
+    Returns:
+        numpy.ndarray: Popup HTML aligned with `facilities`.
+    """
+    open_now = facilities["open_now"]
+    open_text = np.select(
+        [open_now.eq(True).fillna(False).to_numpy(dtype=bool), open_now.eq(False).fillna(False).to_numpy(dtype=bool)],
+        ["Open", "Closed"],
+        "Unknown",
+    ).astype(object)
+    return (
+        "<b>" + _text(facilities["name"]) + "</b><br>"
+        + "Address: " + _text(facilities["address"]) + "<br>"
+        + "Open Now: " + open_text + "<br>"
+        + "Medicaid Supported: " + _yes_no(facilities["medicaid_supported"]) + "<br>"
+        + "Rating: " + _rating_text(facilities["rating"])
+        + " (" + _text(facilities["user_ratings_total"]) + " reviews)<br>"
+        + "Wheelchair Accessible Entrance: " + _yes_no(facilities["wheelchair_accessible_entrance"]) + "<br>"
+        + '<a href="' + directions_links(facilities) + '" target="_blank">Get Directions</a>'
+    )
@@ -0,0 +1,478 @@
+"""
+Local catalog of Places results indexed by geohash tile.
+
+A nearby search returns at most PLACES_MAX_RESULTS results per place type,
+so one search cannot list every facility of a dense area, and every search
+goes to the network. The catalog keeps the raw Places results of each place
+type together with, per tile, whether the tile is completely known and when
+it was fetched. A tile becomes known when a Places search that covers it
+returns fewer results than the cap: either a live search, for the tiles
+entirely inside its circle, or a tile fill, which searches the tile itself
+and splits it into its 32 sub-tiles while the cap is still hit.
+
+Searches whose tiles are all known and fresh are answered from the catalog,
+without the result cap. The tiles on the edge of each search, which its
+live results cannot complete, and the ring of tiles around it are filled in
+the background by a TilePrefetcher, so the next search of the region stays
+local. Prefetching is throttled and spends at most a fixed number of Places
+requests per search and per day. Medicaid flags are not stored; they are
+matched against the provider dataset when results are assembled, as for
+live results.
+"""
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from geo import geohash_bounds, geohash_children, geohash_encode, geohashes_in_circle, haversine_m
+from http_client import HostLimiter, HttpClient
+from places import (
+    OPEN_NOW_TTL_S, PLACES_MAX_PAGES, PLACES_MAX_RESULTS, PLACES_PAGE_SIZE, PLACES_TTL_S, fetch_place_type,
+    strip_open_now,
+)
+from tracing import count, span
+
+FACILITY_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "facilities.sqlite")
+TILE_PRECISION = 5  # Geohash characters of the base tiles, about 4.9 x 4.9 km
+MAX_TILE_PRECISION = 6  # Full tiles are split once at most, into cells of about 1.2 x 0.6 km
+PREFETCH_WORKERS = 2  # Background tile fills at once
+PREFETCH_RING_M = 5000  # Tiles this far beyond a search are prefetched too, about one base tile
+PREFETCH_MAX_TILES = 16  # Tile fills scheduled per search, nearest first
+PREFETCH_SEARCH_CALLS = 48  # Places requests the prefetch of one search may make, splits included
+PREFETCH_DAILY_CALLS = 1000  # Places requests all prefetching in this process may make per day
+PREFETCH_MAX_PER_HOST = 1  # Prefetch requests run one at a time,
+PREFETCH_MIN_INTERVAL_S = 0.5  # at most two per second
+
+_RANGE_END = "{"  # Sorts after every geohash character, so [tile, tile + "{") holds the tile's sub-cells
+
+
+def tile_center(tile):
+    """
+    Returns:
+        tuple: (latitude, longitude) of the tile's center.
+    """
+    south, west, north, east = geohash_bounds(tile)
+    return (south + north) / 2, (west + east) / 2
+
+
+def tile_search_radius(tile):
+    """Radius in meters of the smallest circle around the tile's center that contains the tile."""
+    south, west, north, east = geohash_bounds(tile)
+    latitude, longitude = tile_center(tile)
+    return float(haversine_m(latitude, longitude, [south, north], [west, east]).max())
+
+
+def tile_inside_circle(tile, latitude, longitude, radius_m):
+    """Whether the whole tile lies within `radius_m` of the given point."""
+    south, west, north, east = geohash_bounds(tile)
+    corners_lat = [south, south, north, north]
+    corners_lon = [west, east, west, east]
+    return bool((haversine_m(latitude, longitude, corners_lat, corners_lon) <= radius_m).all())
+
+
+class FacilityCatalog:
+    """
+    Persistent, SQLite-backed catalog of raw Places results per place type and tile.
+
+    A tile row is either a leaf, fetched at `fetched_at`, or split, in which
+    case its sub-tiles carry the data. A leaf is fresh while it is younger
+    than the age a lookup accepts; a split tile is covered when all of its
+    sub-tiles are.
+    """
+
+    def __init__(self, path, precision=TILE_PRECISION, max_precision=MAX_TILE_PRECISION):
+        """
+        Args:
+            path (str): SQLite file to use; ":memory:" keeps the catalog in memory.
+            precision (int): Geohash characters of the base tiles.
+            max_precision (int): Geohash characters of the smallest tiles.
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.precision = precision
+        self.max_precision = max_precision
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tiles (
+                place_type TEXT NOT NULL,
+                tile TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                split INTEGER NOT NULL,
+                PRIMARY KEY (place_type, tile)
+            )
+            """
+        )
+        # Places are keyed by the geohash of their location at max_precision,
+        # so the places of a tile are one range scan of the primary key
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS places (
+                place_type TEXT NOT NULL,
+                geohash TEXT NOT NULL,
+                place_id TEXT NOT NULL,
+                result TEXT NOT NULL,
+                PRIMARY KEY (place_type, geohash, place_id)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def tiles_for(self, latitude, longitude, radius_m):
+        """Base tiles that may overlap the circle."""
+        return geohashes_in_circle(latitude, longitude, radius_m, self.precision)
+
+    def missing_tiles(self, latitude, longitude, radius_m, place_types, max_age_s=PLACES_TTL_S):
+        """
+        Tiles that keep the circle from being answered locally.
+
+        Args:
+            latitude (float): Circle center latitude.
+            longitude (float): Circle center longitude.
+            radius_m (float): Circle radius in meters.
+            place_types (list): Google Places types.
+            max_age_s (float): Leaves fetched longer ago than this are stale.
+
+        Returns:
+            list: (place_type, tile) of every missing or stale tile, at the
+            depth it has to be fetched.
+        """
+        oldest = time.time() - max_age_s
+        tiles = self.tiles_for(latitude, longitude, radius_m)
+        missing = []
+        with self._lock:
+            for place_type in place_types:
+                for tile in tiles:
+                    rows = {
+                        row[0]: (row[1], row[2])
+                        for row in self._conn.execute(
+                            "SELECT tile, fetched_at, split FROM tiles WHERE place_type = ? AND tile >= ? AND tile < ?",
+                            (place_type, tile, tile + _RANGE_END),
+                        )
+                    }
+                    missing.extend((place_type, uncovered) for uncovered in _uncovered(rows, tile, oldest))
+        return missing
+
+    def load(self, latitude, longitude, radius_m, place_types):
+        """
+        Raw Places results stored for the tiles overlapping the circle.
+
+        Results are listed once per place type, as a live search returns them;
+        places in the tiles but outside the circle are included. Places of
+        leaves fetched more than OPEN_NOW_TTL_S ago lose their `open_now` flags.
+        """
+        tiles = self.tiles_for(latitude, longitude, radius_m)
+        open_now_since = time.time() - OPEN_NOW_TTL_S
+        payloads = []
+        stale = []
+        with self._lock:
+            for place_type in place_types:
+                for tile in tiles:
+                    end = tile + _RANGE_END
+                    stale_leaves = tuple(
+                        row[0]
+                        for row in self._conn.execute(
+                            "SELECT tile FROM tiles WHERE place_type = ? AND tile >= ? AND tile < ? "
+                            "AND split = 0 AND fetched_at < ?",
+                            (place_type, tile, end, open_now_since),
+                        )
+                    )
+                    for geohash, payload in self._conn.execute(
+                        "SELECT geohash, result FROM places WHERE place_type = ? AND geohash >= ? AND geohash < ?",
+                        (place_type, tile, end),
+                    ):
+                        if stale_leaves and geohash.startswith(stale_leaves):
+                            stale.append(len(payloads))
+                        payloads.append(payload)
+        # One parse for the whole answer instead of one per place
+        results = json.loads("[" + ",".join(payloads) + "]")
+        for i, result in zip(stale, strip_open_now([results[i] for i in stale])):
+            results[i] = result
+        return results
+
+    def lookup(self, latitude, longitude, radius_m, place_types, max_age_s=PLACES_TTL_S):
+        """
+        Answer a search locally if every tile it touches is known and fresh.
+
+        Returns:
+            list: Raw Places results as in `load`, or None if a tile is missing or stale.
+        """
+        with span("catalog.lookup", place_types=len(place_types)):
+            if self.missing_tiles(latitude, longitude, radius_m, place_types, max_age_s):
+                count("catalog.miss")
+                return None
+            count("catalog.hit")
+            return self.load(latitude, longitude, radius_m, place_types)
+
+    def store_tile(self, place_type, tile, results):
+        """
+        Record `results` as every `place_type` place in `tile`, replacing what was stored.
+
+        Args:
+            place_type (str): Google Places type the results were searched for.
+            tile (str): Geohash of the tile.
+            results (list): Raw Places results of a search covering the whole
+                tile; those outside the tile are ignored.
+        """
+        self._store(place_type, [tile], results)
+
+    def store_search(self, latitude, longitude, radius_m, place_type, results):
+        """
+        Record a complete live search: every tile entirely inside its circle becomes known.
+
+        Searches that hit PLACES_MAX_RESULTS may have missed places and are not recorded.
+
+        Returns:
+            int: Tiles recorded.
+        """
+        if len(results) >= PLACES_MAX_RESULTS:
+            return 0
+        tiles = [tile for tile in self.tiles_for(latitude, longitude, radius_m)
+                 if tile_inside_circle(tile, latitude, longitude, radius_m)]
+        if tiles:
+            self._store(place_type, tiles, results)
+        return len(tiles)
+
+    def split_tile(self, place_type, tile):
+        """Mark `tile` as held by its sub-tiles, e.g. because a search of it hit the result cap."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tiles (place_type, tile, fetched_at, split) VALUES (?, ?, ?, 1)",
+                (place_type, tile, time.time()),
+            )
+            self._conn.commit()
+
+    def _store(self, place_type, tiles, results):
+        geohashes = geohash_encode(
+            np.array([result["geometry"]["location"]["lat"] for result in results], dtype=np.float64),
+            np.array([result["geometry"]["location"]["lng"] for result in results], dtype=np.float64),
+            self.max_precision,
+        )
+        now = time.time()
+        with self._lock:
+            for tile in tiles:
+                end = tile + _RANGE_END
+                # A leaf replaces whatever was stored for the tile and its sub-tiles
+                self._conn.execute(
+                    "DELETE FROM places WHERE place_type = ? AND geohash >= ? AND geohash < ?", (place_type, tile, end)
+                )
+                self._conn.execute(
+                    "DELETE FROM tiles WHERE place_type = ? AND tile >= ? AND tile < ?", (place_type, tile, end)
+                )
+                self._conn.execute(
+                    "INSERT INTO tiles (place_type, tile, fetched_at, split) VALUES (?, ?, ?, 0)",
+                    (place_type, tile, now),
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO places (place_type, geohash, place_id, result) VALUES (?, ?, ?, ?)",
+                    [
+                        (place_type, geohash, result.get("place_id") or result.get("name", ""), json.dumps(result))
+                        for result, geohash in zip(results, geohashes)
+                        if geohash.startswith(tile)
+                    ],
+                )
+            self._conn.commit()
+
+    def stats(self, max_age_s=PLACES_TTL_S):
+        """
+        Returns:
+            dict: Leaf tiles, those still fresh, split tiles and stored places.
+        """
+        oldest = time.time() - max_age_s
+        with self._lock:
+            leaves, fresh, split = self._conn.execute(
+                "SELECT SUM(split = 0), SUM(split = 0 AND fetched_at >= ?), SUM(split) FROM tiles", (oldest,)
+            ).fetchone()
+            places = self._conn.execute("SELECT COUNT(*) FROM places").fetchone()[0]
+        return {"tiles": leaves or 0, "fresh": fresh or 0, "split": split or 0, "places": places}
+
+
+def _uncovered(rows, tile, oldest):
+    row = rows.get(tile)
+    if row is None:
+        return [tile]
+    fetched_at, split = row
+    if not split:
+        return [] if fetched_at >= oldest else [tile]
+    return [missing for child in geohash_children(tile) for missing in _uncovered(rows, child, oldest)]
+
+
+class CallBudget:
+    """
+    Number of requests that may still be made, optionally renewed every `period_s`
+    and drawn from a `parent` budget as well.
+    """
+
+    def __init__(self, calls, period_s=None, parent=None):
+        self.calls = calls
+        self.period_s = period_s
+        self.parent = parent
+        self.remaining = calls
+        self._period = self._current_period()
+        self._lock = threading.Lock()
+
+    def _current_period(self):
+        return None if self.period_s is None else int(time.time() // self.period_s)
+
+    def take(self, calls):
+        """Reserve `calls` requests; returns False, reserving nothing, if they are not all available."""
+        with self._lock:
+            period = self._current_period()
+            if period != self._period:
+                self._period = period
+                self.remaining = self.calls
+            if self.remaining < calls:
+                return False
+            if self.parent is not None and not self.parent.take(calls):
+                return False
+            self.remaining -= calls
+            return True
+
+    def refund(self, calls):
+        """Give back reserved requests that were not made."""
+        with self._lock:
+            self.remaining = min(self.calls, self.remaining + calls)
+        if self.parent is not None:
+            self.parent.refund(calls)
+
+
+class TilePrefetcher:
+    """
+    Fills catalog tiles from Places in the background.
+
+    Fills run on daemon threads, so a pending prefetch never holds up
+    shutdown; each tile is queued at most once at a time. Requests go through
+    a client of their own, throttled by a HostLimiter, and every fill draws
+    on its search's call budget and on the daily one.
+    """
+
+    def __init__(self, catalog, api_key, workers=PREFETCH_WORKERS, client=None, daily_calls=PREFETCH_DAILY_CALLS):
+        """
+        Args:
+            catalog (FacilityCatalog): Catalog to fill.
+            api_key (str): Google API key.
+            workers (int): Tiles filled at once.
+            client (HttpClient): HTTP client; a throttled one of its own if None.
+            daily_calls (int): Places requests allowed per day.
+        """
+        self.catalog = catalog
+        self.api_key = api_key
+        self.workers = workers
+        self.client = client or HttpClient(
+            limiter=HostLimiter(max_per_host=PREFETCH_MAX_PER_HOST, min_interval_s=PREFETCH_MIN_INTERVAL_S)
+        )
+        self.daily_budget = CallBudget(daily_calls, period_s=24 * 60 * 60)
+        self._queue = queue.Queue()
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def schedule(self, latitude, longitude, radius_m, place_types, ring_m=PREFETCH_RING_M, limit=PREFETCH_MAX_TILES,
+                 calls=PREFETCH_SEARCH_CALLS):
+        """
+        Queue the missing and stale tiles next to a search, nearest first.
+
+        Those are the tiles on the edge of the search circle and in the ring
+        `ring_m` beyond it; tiles entirely inside the circle are left to the
+        live search itself.
+
+        Args:
+            latitude (float): Search center latitude.
+            longitude (float): Search center longitude.
+            radius_m (float): Search radius in meters.
+            place_types (list): Google Places types searched.
+            ring_m (float): Width of the ring around the search.
+            limit (int): Maximum number of tiles queued.
+            calls (int): Places requests the queued fills may make together.
+
+        Returns:
+            int: Tiles newly queued.
+        """
+        missing = [
+            (place_type, tile)
+            for place_type, tile in self.catalog.missing_tiles(latitude, longitude, radius_m + ring_m, place_types)
+            if not tile_inside_circle(tile, latitude, longitude, radius_m)
+        ]
+        if not missing:
+            return 0
+        centers = np.array([tile_center(tile) for _, tile in missing])
+        distances = haversine_m(latitude, longitude, centers[:, 0], centers[:, 1])
+        budget = CallBudget(calls, parent=self.daily_budget)
+        queued = 0
+        with self._lock:
+            for i in np.argsort(distances, kind="stable"):
+                if queued >= limit:
+                    break
+                if missing[i] in self._queued:
+                    continue
+                self._queued.add(missing[i])
+                self._queue.put((*missing[i], budget))
+                queued += 1
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name="catalog-prefetch", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        count("catalog.prefetch", queued)
+        return queued
+
+    def wait(self):
+        """Block until every queued tile has been filled or has failed."""
+        self._queue.join()
+
+    def fill(self, place_type, tile, budget=None):
+        """
+        Fetch one tile, splitting it into its sub-tiles while Places returns a full
+        result set, down to the catalog's max_precision.
+
+        Args:
+            place_type (str): Google Places type.
+            tile (str): Geohash of the tile.
+            budget (CallBudget): Requests the fill may make; the daily budget if None.
+
+        Returns:
+            bool: Whether the whole tile was stored; False if it failed or ran out of budget.
+        """
+        budget = budget or self.daily_budget
+        # Reserve the most pages a search can take, and give back what is left
+        if not budget.take(PLACES_MAX_PAGES):
+            count("catalog.prefetch_over_budget")
+            return False
+        latitude, longitude = tile_center(tile)
+        with span("catalog.fill", place_type=place_type, tile=tile):
+            results, error = fetch_place_type(
+                latitude, longitude, tile_search_radius(tile), place_type, self.api_key, self.client
+            )
+        pages = max(1, -(-len(results) // PLACES_PAGE_SIZE))
+        budget.refund(max(0, PLACES_MAX_PAGES - pages))
+        if error:
+            print(f"Error filling catalog tile {tile} ({place_type}): {error}")
+            return False
+        if len(results) >= PLACES_MAX_RESULTS and len(tile) < self.catalog.max_precision:
+            self.catalog.split_tile(place_type, tile)
+            # Fill every sub-tile even after a failure; the failed ones stay missing
+            return all([self.fill(place_type, child, budget) for child in geohash_children(tile)])
+        if len(results) >= PLACES_MAX_RESULTS:
+            count("catalog.truncated")
+        self.catalog.store_tile(place_type, tile, results)
+        return True
+
+    def _work(self):
+        while True:
+            place_type, tile, budget = self._queue.get()
+            try:
+                self.fill(place_type, tile, budget)
+            except Exception as e:
+                print(f"Error filling catalog tile {tile} ({place_type}): {e}")
+            finally:
+                with self._lock:
+                    self._queued.discard((place_type, tile))
+                self._queue.task_done()
@@ -0,0 +1,126 @@
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8  # Mean Earth radius in meters
+METERS_PER_DEGREE_LAT = 111320.0  # Approximate length of one degree of latitude
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance between coordinate arrays, in meters.
+
+    Args:
+        lat1, lon1: Latitude/longitude (degrees) of the first points. Scalars or arrays.
+        lat2, lon2: Latitude/longitude (degrees) of the second points. Broadcast against the first.
+
+    Returns:
+        numpy.ndarray: Distances in meters.
+    """
+    lat1 = np.radians(lat1)
+    lat2 = np.radians(lat2)
+    dlat = lat2 - lat1
+    dlon = np.radians(np.asarray(lon2) - np.asarray(lon1))
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def meters_to_lat_degrees(meters):
+    """Convert a north-south distance in meters to degrees of latitude."""
+    return meters / METERS_PER_DEGREE_LAT
+
+
+GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_GEOHASH_CHARS = np.array(list(GEOHASH_BASE32), dtype=object)
+
+
+def geohash_cell_size(precision):
+    """
+    Returns:
+        tuple: (height, width) in degrees of a geohash cell with `precision` characters.
+    """
+    bits = 5 * precision
+    return 180.0 / (1 << (bits // 2)), 360.0 / (1 << ((bits + 1) // 2))
+
+
+def geohash_encode(latitude, longitude, precision=5):
+    """
+    Geohash of coordinate arrays.
+
+    Args:
+        latitude, longitude: Coordinates in degrees. Scalars or arrays.
+        precision (int): Number of geohash characters.
+
+    Returns:
+        numpy.ndarray or str: Geohashes (an empty string for missing
+        coordinates); a single string for scalar input.
+    """
+    lat = np.asarray(latitude, dtype=np.float64)
+    lon = np.asarray(longitude, dtype=np.float64)
+    valid = np.isfinite(lat) & np.isfinite(lon)
+
+    bits = 5 * precision
+    lat_bits, lon_bits = bits // 2, (bits + 1) // 2
+    lat_cells = np.where(valid, (lat + 90.0) / 180.0 * (1 << lat_bits), 0)
+    lon_cells = np.where(valid, (lon + 180.0) / 360.0 * (1 << lon_bits), 0)
+    lat_cells = np.clip(lat_cells.astype(np.int64), 0, (1 << lat_bits) - 1)
+    lon_cells = np.clip(lon_cells.astype(np.int64), 0, (1 << lon_bits) - 1)
+
+    # Interleave the bits, longitude first
+    code = np.zeros(lat.shape, dtype=np.int64)
+    for k in range(bits):
+        if k % 2 == 0:
+            bit = (lon_cells >> (lon_bits - 1 - k // 2)) & 1
+        else:
+            bit = (lat_cells >> (lat_bits - 1 - k // 2)) & 1
+        code = (code << 1) | bit
+
+    hashes = np.full(lat.shape, "", dtype=object)
+    for i in range(precision):
+        hashes = hashes + _GEOHASH_CHARS[(code >> (5 * (precision - 1 - i))) & 31]
+    hashes = np.where(valid, hashes, "")
+    return hashes.item() if hashes.ndim == 0 else hashes
+
+
+def geohashes_in_circle(latitude, longitude, radius_m, precision=5):
+    """
+    Geohash cells that may overlap a circle, from its bounding box.
+
+    Returns:
+        list: Sorted geohashes of every cell touching the circle's bounding box.
+    """
+    cell_lat, cell_lon = geohash_cell_size(precision)
+    dlat = meters_to_lat_degrees(radius_m)
+    dlon = dlat / max(np.cos(np.radians(min(abs(latitude) + dlat, 89.9))), 1e-6)
+
+    # Snap the box to cell boundaries and sample each cell at its center
+    lat_start = np.floor((max(latitude - dlat, -90.0) + 90.0) / cell_lat) * cell_lat - 90.0
+    lon_start = np.floor((max(longitude - dlon, -180.0) + 180.0) / cell_lon) * cell_lon - 180.0
+    lats = np.arange(lat_start + cell_lat / 2, min(latitude + dlat, 90.0) + cell_lat / 2, cell_lat)
+    lons = np.arange(lon_start + cell_lon / 2, min(longitude + dlon, 180.0) + cell_lon / 2, cell_lon)
+    grid_lat, grid_lon = np.meshgrid(lats, lons, indexing="ij")
+    return sorted(set(geohash_encode(grid_lat.ravel(), grid_lon.ravel(), precision)))
+
+
+def geohash_bounds(geohash):
+    """
+    Returns:
+        tuple: (south, west, north, east) edges in degrees of a geohash cell.
+    """
+    south, west, north, east = -90.0, -180.0, 90.0, 180.0
+    even = True  # Bits alternate, longitude first
+    for char in geohash:
+        value = GEOHASH_BASE32.index(char)
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (west + east) / 2
+                west, east = (mid, east) if bit else (west, mid)
+            else:
+                mid = (south + north) / 2
+                south, north = (mid, north) if bit else (south, mid)
+            even = not even
+    return south, west, north, east
+
+
+def geohash_children(geohash):
+    """The 32 cells one character longer that make up `geohash`."""
+    return [geohash + char for char in GEOHASH_BASE32]
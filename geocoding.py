@@ -0,0 +1,264 @@
+import os
+import re
+
+import pandas as pd
+import requests
+
+from http_client import get_http_client
+from tracing import count, span
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+GEOCODE_URL = "https://maps.googleapis.com/maps/api/geocode/json"
+
+# Optional ZIP code database (the same file the provider ingest uses). When it is
+# not present, an approximate gazetteer is derived from the provider dataset,
+# which only backs up the remote geocoder.
+ZIP_DATABASE_CSV = os.path.join(BASE_DIR, "zip_code_database.csv")
+GEOCODE_CACHE_PATH = os.path.join(BASE_DIR, ".cache", "geocode.sqlite")
+GEOCODE_TTL_S = 30 * 24 * 60 * 60  # Place coordinates rarely move
+
+# Locations the app refers to directly (the default search location)
+SEED_LOCATIONS = {
+    "davis ca": (38.5449, -121.7405),
+    "95616": (38.5449, -121.7405),
+}
+
+US_STATES = {
+    "alabama": "al", "alaska": "ak", "arizona": "az", "arkansas": "ar", "california": "ca",
+    "colorado": "co", "connecticut": "ct", "delaware": "de", "district of columbia": "dc",
+    "florida": "fl", "georgia": "ga", "hawaii": "hi", "idaho": "id", "illinois": "il",
+    "indiana": "in", "iowa": "ia", "kansas": "ks", "kentucky": "ky", "louisiana": "la",
+    "maine": "me", "maryland": "md", "massachusetts": "ma", "michigan": "mi", "minnesota": "mn",
+    "mississippi": "ms", "missouri": "mo", "montana": "mt", "nebraska": "ne", "nevada": "nv",
+    "new hampshire": "nh", "new jersey": "nj", "new mexico": "nm", "new york": "ny",
+    "north carolina": "nc", "north dakota": "nd", "ohio": "oh", "oklahoma": "ok", "oregon": "or",
+    "pennsylvania": "pa", "rhode island": "ri", "south carolina": "sc", "south dakota": "sd",
+    "tennessee": "tn", "texas": "tx", "utah": "ut", "vermont": "vt", "virginia": "va",
+    "washington": "wa", "west virginia": "wv", "wisconsin": "wi", "wyoming": "wy",
+}
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+_ZIP = re.compile(r"^(\d{5})(?:\s?\d{4})?$")
+_STATE_SUFFIX = re.compile(r"\s(" + "|".join(sorted(US_STATES, key=len, reverse=True)) + r")$")
+_CITY_STATE_ZIP = re.compile(r",\s*([^,]+?),\s*([A-Z]{2})\s+\d{5}")
+
+
+def normalize_query(query):
+    """
+    Normalize a location query so equivalent spellings share one key.
+
+    "Davis, CA", " davis ca " and "Davis, California" all become "davis ca";
+    ZIP+4 codes collapse to their five-digit ZIP.
+
+    Args:
+        query (str): Raw text from the location box.
+
+    Returns:
+        str: Normalized query.
+    """
+    text = _SPACES.sub(" ", _NON_WORD.sub(" ", query.lower())).strip()
+    text = _STATE_SUFFIX.sub(lambda m: " " + US_STATES[m.group(1)], text)
+    text = re.sub(r"\s(usa|us|united states)$", "", text)
+    zip_match = _ZIP.match(text)
+    if zip_match:
+        return zip_match.group(1)
+    return text
+
+
+class Gazetteer:
+    """
+    Offline lookup table of ZIP codes and "city state" names to coordinates.
+
+    An approximate gazetteer, derived from a few provider addresses per ZIP
+    code, can be kilometers off; a LocationResolver prefers the remote
+    geocoder over it. The seed locations are always exact.
+    """
+
+    def __init__(self, entries=None, approximate=False):
+        """
+        Args:
+            entries (dict): Normalized query -> (latitude, longitude).
+            approximate (bool): Whether the entries are rough centroids.
+        """
+        self.entries = dict(SEED_LOCATIONS)
+        self.entries.update(entries or {})
+        self.approximate = approximate
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, query):
+        """Return (latitude, longitude) for a normalized query, or None."""
+        return self.entries.get(query)
+
+    def is_exact(self, query):
+        """Whether the entry for a normalized query can be trusted over a remote geocoder."""
+        return not self.approximate or query in SEED_LOCATIONS
+
+    @classmethod
+    def from_zip_database(cls, path=ZIP_DATABASE_CSV):
+        """
+        Build a gazetteer from a ZIP code database with zip, primary_city,
+        state, latitude and longitude columns.
+        """
+        zips = pd.read_csv(path, dtype={"zip": str}, usecols=["zip", "primary_city", "state", "latitude", "longitude"])
+        zips = zips.dropna(subset=["latitude", "longitude"])
+        zips["zip"] = zips["zip"].str.zfill(5)
+        zips["city_key"] = (zips["primary_city"] + " " + zips["state"]).map(normalize_query)
+
+        entries = dict(zip(zips["zip"], zip(zips["latitude"], zips["longitude"])))
+        cities = zips.groupby("city_key")[["latitude", "longitude"]].mean()
+        entries.update(zip(cities.index, zip(cities["latitude"], cities["longitude"])))
+        return cls(entries)
+
+    @classmethod
+    def from_totals(cls, totals):
+        """
+        Build a gazetteer from coordinate sums as returned by `gazetteer_totals`,
+        using the mean provider location of each key as its centroid. Totals
+        may hold several rows per key, e.g. one per provider partition.
+        """
+        sums = totals.groupby("query")[["latitude", "longitude", "rows"]].sum()
+        entries = dict(zip(sums.index, zip(sums["latitude"] / sums["rows"], sums["longitude"] / sums["rows"])))
+        return cls(entries, approximate=True)
+
+    @classmethod
+    def from_providers(cls, providers):
+        """
+        Build an approximate gazetteer from provider rows, using the mean
+        provider location of each ZIP code and each city as its centroid.
+        """
+        return cls.from_totals(gazetteer_totals(providers))
+
+
+def gazetteer_totals(providers):
+    """
+    Coordinate sums and provider counts per ZIP code and per "city state" key.
+
+    Sums, unlike centroids, can be combined across batches of providers, so a
+    store can keep them per partition and update only the partitions it writes.
+
+    Args:
+        providers (pd.DataFrame): Rows with ZIP, Address, latitude and longitude.
+
+    Returns:
+        pd.DataFrame: query, latitude and longitude sums, and rows.
+    """
+    providers = providers.dropna(subset=["latitude", "longitude"]).reset_index(drop=True)
+    zip_codes = providers["ZIP"].astype(str).str.zfill(5)
+    city_state = providers["Address"].str.extract(_CITY_STATE_ZIP)
+    city_key = (city_state[0] + " " + city_state[1]).dropna().map(normalize_query)
+
+    keys = pd.concat([city_key, zip_codes])
+    coords = providers.loc[keys.index, ["latitude", "longitude"]]
+    totals = pd.DataFrame({
+        "query": keys.to_numpy(),
+        "latitude": coords["latitude"].to_numpy(dtype=float),
+        "longitude": coords["longitude"].to_numpy(dtype=float),
+    })
+    return totals.groupby("query").agg(
+        latitude=("latitude", "sum"), longitude=("longitude", "sum"), rows=("latitude", "size")
+    ).reset_index()
+
+
+def load_gazetteer(providers=None, path=ZIP_DATABASE_CSV):
+    """
+    Load the ZIP code database if it is available, otherwise derive the
+    gazetteer from the providers.
+
+    Args:
+        providers: Provider rows (pd.DataFrame), or a provider store exposing
+            `gazetteer_totals()`, which is only called when it is needed.
+        path (str): ZIP code database CSV.
+    """
+    if os.path.exists(path):
+        return Gazetteer.from_zip_database(path)
+    if hasattr(providers, "gazetteer_totals"):
+        return Gazetteer.from_totals(providers.gazetteer_totals())
+    if providers is not None:
+        return Gazetteer.from_providers(providers)
+    return Gazetteer()
+
+
+def geocode_google(query, api_key):
+    """
+    Geocode a free-text query with the Google Geocoding API.
+
+    Returns:
+        tuple: (latitude, longitude), or None if nothing was found.
+    """
+    params = {"address": query, "key": api_key}
+    count("external.google_geocode")
+    try:
+        response = get_http_client().get(GEOCODE_URL, params=params)
+    except requests.RequestException as e:
+        print(f"Error geocoding {query!r}: {e}")
+        return None
+    if response.status_code == 200:
+        data = response.json()
+        if data["results"]:
+            location = data["results"][0]["geometry"]["location"]
+            return location["lat"], location["lng"]
+    return None
+
+
+class LocationResolver:
+    """
+    Two-tier location resolver: the offline gazetteer first, then a persistent
+    cache in front of the remote geocoder. Entries of an approximate gazetteer
+    are only used when the remote geocoder is missing or finds nothing.
+    """
+
+    def __init__(self, gazetteer, cache=None, geocode=None):
+        """
+        Args:
+            gazetteer (Gazetteer): Offline ZIP/city lookup.
+            cache (TTLCache): Persistent cache of remote geocoding results.
+            geocode (callable): Remote geocoder taking the raw query and
+                returning (latitude, longitude) or None.
+        """
+        self.gazetteer = gazetteer
+        self.cache = cache
+        self.geocode = geocode
+
+    def resolve(self, query):
+        """
+        Resolve a location query to coordinates.
+
+        Returns:
+            tuple: (latitude, longitude, source) where source is "gazetteer",
+            "cache" or "remote"; (None, None, None) if the query could not be resolved.
+        """
+        with span("geocode") as current:
+            lat, lon, source = self._resolve(query)
+            current.attrs["source"] = source
+        return lat, lon, source
+
+    def _resolve(self, query):
+        key = normalize_query(query)
+        if not key:
+            return None, None, None
+
+        fallback = self.gazetteer.lookup(key)
+        if fallback is not None and (self.geocode is None or self.gazetteer.is_exact(key)):
+            return fallback[0], fallback[1], "gazetteer"
+
+        cache_key = f"geocode:{key}"
+        if self.cache is not None:
+            location = self.cache.get(cache_key)
+            if location is not None:
+                return location[0], location[1], "cache"
+
+        if self.geocode is None:
+            return None, None, None
+        location = self.geocode(query)
+        if location is None:
+            # Remote failure or no result: an approximate entry beats nothing, but is not cached
+            if fallback is not None:
+                return fallback[0], fallback[1], "gazetteer"
+            return None, None, None
+        if self.cache is not None:
+            self.cache.set(cache_key, list(location), GEOCODE_TTL_S)
+        return location[0], location[1], "remote"
@@ -0,0 +1,331 @@
+"""
+Parallel, restartable ingest of Medicaid providers from Healthgrades.
+
+Replaces the one-ZIP-at-a-time loop in sta141b_yside_code.txt: ZIP codes are
+spread over a pool of workers that each reuse one browser (or HTTP session),
+requests are throttled per host, results are appended to the output CSV as
+each ZIP finishes, and completed ZIPs are checkpointed so an interrupted run
+picks up where it stopped. With --geocoded-output or --store the providers
+are then run through the geocoding stage in provider_geocoding.py, and with
+--store they are upserted into the partitioned provider store the app reads.
+
+Example:
+    python healthgrades_ingest.py --zip-database zip_code_database.csv --states CA OR WA \\
+        --output providers_data.csv --checkpoint providers_data.done --store provider_partitions
+"""
+import argparse
+import csv
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+import requests
+
+from http_client import MAX_REQUESTS_PER_HOST, HostLimiter, get_http_client
+from provider_geocoding import ADDRESS_CACHE_ENTRIES, ADDRESS_CACHE_PATH, add_coordinates, get_backend
+from provider_partitions import PartitionedProviderStore
+from provider_parsers import CARD_CLASS, get_parser, has_provider_markup
+from ttl_cache import TTLCache
+
+SEARCH_URL = "https://www.healthgrades.com/usearch?what=medicaid&where={zip_code}"
+
+PROVIDER_FIELDS = ["ZIP", "Name", "Specialty", "Address"]
+
+DEFAULT_WORKERS = 4
+PAGE_LOAD_TIMEOUT_S = 15
+
+
+def load_zip_codes(path, states):
+    """
+    Read standard ZIP codes for the given states from a ZIP code database.
+
+    Args:
+        path (str): zip_code_database.csv with zip, type and state columns.
+        states (list): Two-letter state codes, e.g. ["CA", "OR"].
+
+    Returns:
+        list: ZIP codes as five-character strings, in file order.
+    """
+    zipcodes_df = pd.read_csv(path, dtype={"zip": str})
+    # only consider standard zip codes
+    zipcodes_df = zipcodes_df[(zipcodes_df["type"] == "STANDARD") & zipcodes_df["state"].isin(states)]
+    return zipcodes_df["zip"].str.zfill(5).tolist()
+
+
+class HttpFetcher:
+    """
+    Fetches pages through the shared HTTP client.
+
+    All workers share its keep-alive pool, retries and per-host circuit
+    breaker, so a struggling host is backed off from by every worker at once.
+    """
+
+    headers = {"User-Agent": "Mozilla/5.0 (compatible; provider-ingest)"}
+
+    def __init__(self, timeout_s=PAGE_LOAD_TIMEOUT_S, client=None):
+        self.timeout_s = timeout_s
+        self.client = client or get_http_client()
+
+    def fetch(self, url):
+        response = self.client.get(url, headers=self.headers, timeout=(5.0, self.timeout_s))
+        response.raise_for_status()
+        return response.text
+
+    def close(self):
+        pass  # The client is shared
+
+
+class SeleniumFetcher:
+    """
+    Renders pages in one long-lived headless Chrome instead of a new browser per page.
+    """
+
+    def __init__(self, chromedriver_path=None, timeout_s=PAGE_LOAD_TIMEOUT_S):
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+        from selenium.webdriver.chrome.service import Service
+
+        chrome_options = Options()
+        chrome_options.add_argument("--headless")
+        service = Service(chromedriver_path) if chromedriver_path else Service()
+        self.driver = webdriver.Chrome(service=service, options=chrome_options)
+        self.driver.set_page_load_timeout(timeout_s)
+        self.timeout_s = timeout_s
+
+    def fetch(self, url):
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        self.driver.get(url)
+        try:
+            # Wait for the first provider card rather than sleeping a fixed time
+            WebDriverWait(self.driver, self.timeout_s).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, "div." + CARD_CLASS.replace(" ", ".")))
+            )
+        except TimeoutException:
+            pass  # No providers for this ZIP, or the page changed; parse whatever rendered
+        return self.driver.page_source
+
+    def close(self):
+        self.driver.quit()
+
+
+class HybridFetcher:
+    """
+    Fetches over plain HTTP and falls back to a browser only when the page
+    has no server-rendered provider cards.
+
+    The browser is started lazily, so workers that never need JavaScript
+    never launch Chrome. ZIPs with no providers at all also end up on the
+    browser path, since an empty page looks the same as a client-rendered one.
+    """
+
+    def __init__(self, browser_factory, http_fetcher=None):
+        self.browser_factory = browser_factory
+        self.http = http_fetcher or HttpFetcher()
+        self.browser = None
+        self.browser_fetches = 0
+
+    def fetch(self, url):
+        try:
+            html = self.http.fetch(url)
+            if has_provider_markup(html):
+                return html
+        except requests.RequestException as e:
+            print(f"HTTP fetch failed for {url}: {e}; retrying in the browser.")
+        if self.browser is None:
+            self.browser = self.browser_factory()
+        self.browser_fetches += 1
+        return self.browser.fetch(url)
+
+    def close(self):
+        self.http.close()
+        if self.browser is not None:
+            self.browser.close()
+
+
+class FetcherPool:
+    """
+    Hands every worker thread its own fetcher, created on first use and reused after.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._fetchers = []
+
+    def get(self):
+        fetcher = getattr(self._local, "fetcher", None)
+        if fetcher is None:
+            fetcher = self._local.fetcher = self.factory()
+            with self._lock:
+                self._fetchers.append(fetcher)
+        return fetcher
+
+    def close(self):
+        with self._lock:
+            for fetcher in self._fetchers:
+                try:
+                    fetcher.close()
+                except Exception as e:
+                    print(f"Error closing fetcher: {e}")
+            self._fetchers = []
+
+
+class Checkpoint:
+    """
+    Append-only record of completed ZIP codes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.completed = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                self.completed = {line.strip() for line in f if line.strip()}
+
+    def mark_done(self, zip_code):
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(f"{zip_code}\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.completed.add(zip_code)
+
+
+class CsvProviderWriter:
+    """
+    Appends provider rows to a CSV as they arrive, writing the header once.
+    """
+
+    def __init__(self, path, fieldnames=PROVIDER_FIELDS):
+        self.path = path
+        self.fieldnames = fieldnames
+        self._lock = threading.Lock()
+
+    def write(self, providers):
+        if not providers:
+            return
+        with self._lock:
+            write_header = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            with open(self.path, "a", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=self.fieldnames)
+                if write_header:
+                    writer.writeheader()
+                writer.writerows(providers)
+
+
+def run_ingest(zip_codes, writer, checkpoint, fetcher_factory, workers=DEFAULT_WORKERS,
+               limiter=None, search_url=SEARCH_URL, parser=None):
+    """
+    Scrape every ZIP code not yet in the checkpoint.
+
+    A ZIP is only marked done after its providers have been written, so a
+    crash can at worst repeat the ZIP that was in flight.
+
+    Args:
+        zip_codes (list): ZIP codes to scrape.
+        writer: Output store with a `write(providers)` method.
+        checkpoint (Checkpoint): Record of completed ZIPs.
+        fetcher_factory (callable): Builds one fetcher (with `fetch(url)` and `close()`) per worker.
+        workers (int): Number of worker threads.
+        limiter (HostLimiter): Per-host throttle; a default one is used if None.
+        search_url (str): URL template with a `{zip_code}` placeholder.
+        parser: Page parser from provider_parsers; the lxml parser is used if None.
+
+    Returns:
+        dict: Counts of scraped, skipped and failed ZIPs and of providers written.
+    """
+    limiter = limiter or HostLimiter()
+    parser = parser or get_parser()
+    pool = FetcherPool(fetcher_factory)
+    pending = [zip_code for zip_code in dict.fromkeys(zip_codes) if zip_code not in checkpoint.completed]
+    stats = {"scraped": 0, "skipped": len(set(zip_codes)) - len(pending), "failed": 0, "providers": 0}
+
+    def scrape(zip_code):
+        url = search_url.format(zip_code=zip_code)
+        host = limiter.acquire(url)
+        try:
+            html = pool.get().fetch(url)
+        finally:
+            limiter.release(host)
+        providers = parser.parse(html, zip_code)
+        writer.write(providers)
+        checkpoint.mark_done(zip_code)
+        return len(providers)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(scrape, zip_code): zip_code for zip_code in pending}
+            for future in as_completed(futures):
+                try:
+                    stats["providers"] += future.result()
+                    stats["scraped"] += 1
+                except Exception as e:
+                    stats["failed"] += 1
+                    print(f"Error scraping ZIP {futures[future]}: {e}")
+    finally:
+        pool.close()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape Medicaid providers from Healthgrades by ZIP code.")
+    parser.add_argument("--zip-database", required=True, help="Path to zip_code_database.csv")
+    parser.add_argument("--states", nargs="+", default=["CA"], help="Two-letter state codes to scrape")
+    parser.add_argument("--output", default="providers_data.csv", help="CSV file providers are appended to")
+    parser.add_argument("--checkpoint", help="File of completed ZIPs (default: <output>.done)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--max-per-host", type=int, default=MAX_REQUESTS_PER_HOST)
+    parser.add_argument("--search-url", default=SEARCH_URL, help="URL template with a {zip_code} placeholder")
+    parser.add_argument("--fetcher", choices=["hybrid", "http", "selenium"], default="hybrid",
+                        help="hybrid fetches over HTTP and only uses Chrome for pages that need JavaScript")
+    parser.add_argument("--parser", choices=["lxml", "soup"], default="lxml")
+    parser.add_argument("--chromedriver", help="Path to chromedriver (default: found on PATH)")
+    parser.add_argument("--geocoded-output", help="Also geocode the scraped providers into this CSV")
+    parser.add_argument("--store", help="Upsert the geocoded providers into this partitioned provider store")
+    parser.add_argument("--geocode-backend", choices=["google", "nominatim", "offline"], default="google")
+    parser.add_argument("--api-key", default=os.environ.get("GOOGLE_API_KEY"), help="Google API key for geocoding")
+    args = parser.parse_args()
+
+    if args.fetcher == "http":
+        fetcher_factory = HttpFetcher
+    elif args.fetcher == "selenium":
+        fetcher_factory = lambda: SeleniumFetcher(args.chromedriver)
+    else:
+        fetcher_factory = lambda: HybridFetcher(lambda: SeleniumFetcher(args.chromedriver))
+
+    stats = run_ingest(
+        load_zip_codes(args.zip_database, args.states),
+        CsvProviderWriter(args.output),
+        Checkpoint(args.checkpoint or f"{args.output}.done"),
+        fetcher_factory,
+        workers=args.workers,
+        limiter=HostLimiter(max_per_host=args.max_per_host),
+        search_url=args.search_url,
+        parser=get_parser(args.parser),
+    )
+    print(stats)
+
+    if args.geocoded_output or args.store:
+        # Only addresses missing from the address cache cost a lookup
+        providers, geocode_stats = add_coordinates(
+            pd.read_csv(args.output, dtype={"ZIP": str}),
+            get_backend(args.geocode_backend, args.api_key),
+            TTLCache(ADDRESS_CACHE_PATH, max_entries=ADDRESS_CACHE_ENTRIES),
+        )
+        print(geocode_stats)
+        if args.geocoded_output:
+            providers.to_csv(args.geocoded_output, index=False)
+        if args.store:
+            # Re-running a state replaces its providers instead of appending duplicates
+            print(PartitionedProviderStore(args.store).upsert(providers))
+
+
+if __name__ == "__main__":
+    main()
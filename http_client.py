@@ -0,0 +1,265 @@
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from tracing import count
+
+DEFAULT_TIMEOUT_S = (3.05, 10.0)  # (connect, read)
+# Per-host (connect, read) timeouts; hosts not listed use DEFAULT_TIMEOUT_S
+ENDPOINT_TIMEOUTS_S = {
+    "maps.googleapis.com": (3.05, 10.0),
+    "www.healthgrades.com": (5.0, 20.0),
+}
+
+MAX_RETRIES = 3
+BACKOFF_BASE_S = 0.5  # First retry waits up to this long, doubling each attempt
+BACKOFF_MAX_S = 8.0
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+POOL_SIZE = 16  # Keep-alive connections per host
+
+BREAKER_FAILURE_THRESHOLD = 5  # Consecutive failures that open a host's circuit
+BREAKER_RESET_S = 30.0  # Time an open circuit waits before letting a trial request through
+
+MAX_REQUESTS_PER_HOST = 2  # HostLimiter defaults: concurrent requests against one host
+MIN_REQUEST_INTERVAL_S = 1.0  # and minimum spacing between request starts
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised instead of calling a host whose circuit breaker is open."""
+
+
+def backoff_delay(attempt, base_s=BACKOFF_BASE_S, max_s=BACKOFF_MAX_S):
+    """Full-jitter exponential backoff: a random delay up to base * 2**attempt, capped."""
+    return random.uniform(0, min(max_s, base_s * (2 ** attempt)))
+
+
+class HostLimiter:
+    """
+    Bounds concurrent requests per host and spaces out request starts.
+    """
+
+    def __init__(self, max_per_host=MAX_REQUESTS_PER_HOST, min_interval_s=MIN_REQUEST_INTERVAL_S):
+        self.max_per_host = max_per_host
+        self.min_interval_s = min_interval_s
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._next_start = {}
+
+    def _semaphore(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._semaphores[host]
+
+    def acquire(self, url):
+        """Block until a request to `url`'s host may start; returns the host."""
+        host = urlsplit(url).netloc
+        self._semaphore(host).acquire()
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + self.min_interval_s
+        if start > now:
+            time.sleep(start - now)
+        return host
+
+    def release(self, host):
+        self._semaphore(host).release()
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one host.
+
+    After `failure_threshold` failures in a row the circuit opens and calls
+    fail fast. Once `reset_s` has passed, one trial call is let through; its
+    success closes the circuit and its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_s=BREAKER_RESET_S):
+        self.failure_threshold = failure_threshold
+        self.reset_s = reset_s
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def allow(self):
+        """Whether a call may be made now."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial_in_flight or time.monotonic() - self._opened_at < self.reset_s:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class HttpClient:
+    """
+    Shared HTTP client: pooled keep-alive session, per-endpoint timeouts,
+    retries with jittered exponential backoff and a circuit breaker per host.
+
+    Connection errors, timeouts and RETRY_STATUSES are retried; other
+    responses are returned to the caller as they are.
+    """
+
+    def __init__(self, timeouts=None, default_timeout=DEFAULT_TIMEOUT_S, max_retries=MAX_RETRIES,
+                 backoff_base_s=BACKOFF_BASE_S, backoff_max_s=BACKOFF_MAX_S, pool_size=POOL_SIZE,
+                 failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_s=BREAKER_RESET_S, headers=None, limiter=None):
+        """
+        Args:
+            timeouts (dict): Host -> (connect, read) timeout in seconds.
+            default_timeout (tuple): Timeout for hosts not in `timeouts`.
+            max_retries (int): Retries after the first attempt.
+            backoff_base_s (float): Upper bound of the first backoff delay.
+            backoff_max_s (float): Cap on any backoff delay.
+            pool_size (int): Keep-alive connections kept per host.
+            failure_threshold (int): Consecutive failures that open a circuit.
+            reset_s (float): Seconds before an open circuit allows a trial call.
+            headers (dict): Headers sent with every request.
+            limiter (HostLimiter): Optional per-host throttle applied to every attempt.
+        """
+        self.timeouts = dict(ENDPOINT_TIMEOUTS_S if timeouts is None else timeouts)
+        self.default_timeout = default_timeout
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.failure_threshold = failure_threshold
+        self.reset_s = reset_s
+        self.limiter = limiter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if headers:
+            self.session.headers.update(headers)
+
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, host):
+        """Return the circuit breaker of `host`."""
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_s)
+            return self._breakers[host]
+
+    def request(self, method, url, timeout=None, max_retries=None, **kwargs):
+        """
+        Send a request, retrying transient failures.
+
+        Args:
+            method (str): HTTP method.
+            url (str): Request URL.
+            timeout (tuple): (connect, read) timeout; defaults to the host's.
+            max_retries (int): Overrides the client's retry count.
+            **kwargs: Passed on to requests (params, json, data, headers...).
+
+        Returns:
+            requests.Response: The last response, which may still be an error status.
+
+        Raises:
+            CircuitOpenError: The host's circuit is open.
+            requests.RequestException: The last attempt failed to connect or timed out.
+        """
+        host = urlsplit(url).netloc
+        breaker = self.breaker(host)
+        timeout = timeout or self.timeouts.get(host, self.default_timeout)
+        max_retries = self.max_retries if max_retries is None else max_retries
+
+        if not breaker.allow():
+            count("http.circuit_open")
+            raise CircuitOpenError(f"Circuit open for {host}; not calling it for now")
+
+        attempt = 0
+        while True:
+            # Stop retrying once the failures so far have opened the circuit
+            try:
+                response = self._send(method, url, timeout, kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                breaker.record_failure()
+                if attempt >= max_retries or breaker.is_open:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    breaker.record_success()
+                    return response
+                breaker.record_failure()
+                if attempt >= max_retries or breaker.is_open:
+                    return response
+            count("http.retry")
+            time.sleep(backoff_delay(attempt, self.backoff_base_s, self.backoff_max_s))
+            attempt += 1
+
+    def _send(self, method, url, timeout, kwargs):
+        if self.limiter is None:
+            return self.session.request(method, url, timeout=timeout, **kwargs)
+        host = self.limiter.acquire(url)
+        try:
+            return self.session.request(method, url, timeout=timeout, **kwargs)
+        finally:
+            self.limiter.release(host)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def poll_json(self, url, params, is_ready, polls, first_delay_s=0.0, poll_base_s=BACKOFF_BASE_S,
+                  poll_max_s=BACKOFF_MAX_S, **kwargs):
+        """
+        GET a JSON resource until `is_ready(data)`, waiting with jittered backoff between polls.
+
+        Returns:
+            tuple: (response, data) of the last poll; `data` is None for a non-200 response.
+        """
+        if first_delay_s:
+            time.sleep(first_delay_s)
+        for poll in range(polls):
+            response = self.get(url, params=params, **kwargs)
+            if response.status_code != 200:
+                return response, None
+            data = response.json()
+            if is_ready(data) or poll == polls - 1:
+                return response, data
+            count("http.poll")
+            # Unlike retries, polls wait at least half the step, so they cannot hammer the endpoint
+            time.sleep(min(poll_max_s, poll_base_s * (2 ** poll)) * random.uniform(0.5, 1.0))
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """Return the process-wide HTTP client shared by every API module."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
@@ -0,0 +1,101 @@
+import hashlib
+
+import folium
+import numpy as np
+import pandas as pd
+from folium.plugins import FastMarkerCluster
+
+from facilities import popup_html, rating_colors
+from tracing import span
+
+CLUSTER_THRESHOLD = 100  # Facilities above this count are clustered client-side
+MAP_ZOOM = 12
+
+# Builds one marker per [lat, lon, popup, color] row in the browser
+_CLUSTER_CALLBACK = """
+function (row) {
+    var icon = L.AwesomeMarkers.icon({markerColor: row[3]});
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+    marker.bindPopup(row[2], {maxWidth: 300});
+    return marker;
+}
+"""
+
+_HASHED_COLUMNS = ["name", "address", "latitude", "longitude", "rating", "user_ratings_total", "open_now",
+                   "wheelchair_accessible_entrance", "medicaid_supported"]
+
+
+def map_cache_key(facilities, latitude, longitude, radius, cluster_threshold=CLUSTER_THRESHOLD):
+    """
+    Hash a result set together with the view parameters.
+
+    Returns:
+        str: Hex digest identifying the map that `build_map` would produce.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((float(latitude), float(longitude), float(radius), cluster_threshold)).encode())
+    if not facilities.empty:
+        columns = [column for column in _HASHED_COLUMNS if column in facilities]
+        digest.update(pd.util.hash_pandas_object(facilities[columns], index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def build_map(facilities, latitude, longitude, radius, cluster_threshold=CLUSTER_THRESHOLD):
+    """
+    Build the results map: search circle, current location and one marker per facility.
+
+    Large result sets are sent to the browser as a single array and clustered
+    there, instead of serializing one marker object per facility.
+
+    Args:
+        facilities (pd.DataFrame): Facilities to show.
+        latitude (float): Search center latitude.
+        longitude (float): Search center longitude.
+        radius (float): Search radius in meters.
+        cluster_threshold (int): Result count above which markers are clustered.
+
+    Returns:
+        folium.Map: The map.
+    """
+    m = folium.Map(location=[latitude, longitude], zoom_start=MAP_ZOOM)
+    folium.Circle(
+        location=[latitude, longitude],
+        radius=radius,
+        color="blue",
+        fill=True,
+        fill_opacity=0.4
+    ).add_to(m)
+
+    if not facilities.empty:
+        # Colors and popups for all facilities are computed in bulk
+        colors = rating_colors(facilities["rating"])
+        popups = popup_html(facilities)
+        lats = facilities["latitude"].to_numpy(dtype=np.float64)
+        lons = facilities["longitude"].to_numpy(dtype=np.float64)
+
+        if len(facilities) > cluster_threshold:
+            data = [list(row) for row in zip(lats.tolist(), lons.tolist(), popups.tolist(), colors.tolist())]
+            FastMarkerCluster(data, callback=_CLUSTER_CALLBACK).add_to(m)
+        else:
+            for lat, lon, popup_content, color in zip(lats, lons, popups, colors):
+                folium.Marker(
+                    location=[lat, lon],
+                    popup=folium.Popup(popup_content, max_width=300),
+                    icon=folium.Icon(color=color)
+                ).add_to(m)
+
+    # Add current location marker
+    folium.Marker(
+        location=[latitude, longitude],
+        popup="Current Location",
+        icon=folium.Icon(icon="info-sign", color="red")
+    ).add_to(m)
+    return m
+
+
+def render_map_html(facilities, latitude, longitude, radius, cluster_threshold=CLUSTER_THRESHOLD):
+    """Build the map and serialize it to a standalone HTML document."""
+    with span("map.build", facilities=len(facilities)):
+        m = build_map(facilities, latitude, longitude, radius, cluster_threshold)
+    with span("map.serialize"):
+        return m.get_root().render()
@@ -0,0 +1,288 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from geo import haversine_m
+from http_client import get_http_client
+from tracing import count, in_current_context, span
+
+PLACES_NEARBY_URL = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
+
+# A next_page_token only becomes valid a moment after it is issued. Poll for it
+# instead of sleeping a fixed time: first after PAGE_TOKEN_FIRST_POLL_S, then
+# with jittered backoff while Places still answers INVALID_REQUEST.
+PAGE_TOKEN_FIRST_POLL_S = 1.0
+PAGE_TOKEN_POLL_S = 0.25
+PAGE_TOKEN_MAX_POLLS = 6
+MAX_CONCURRENT_TYPES = 6  # Upper bound on place types queried at the same time
+PLACES_PAGE_SIZE = 20
+PLACES_MAX_PAGES = 3  # Nearby search stops after three pages, however many places match
+PLACES_MAX_RESULTS = PLACES_MAX_PAGES * PLACES_PAGE_SIZE
+
+# Nearby-search result cache
+PLACES_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "places.sqlite")
+CACHE_GRID_DEG = 0.005  # Searches are cached per grid cell of their center (about 500 m)
+PLACES_TTL_S = 24 * 60 * 60  # Static facility data
+OPEN_NOW_TTL_S = 5 * 60  # "Open now" goes stale quickly: filtered searches expire, others stop showing it
+
+
+def places_cache_key(latitude, longitude, place_type, open_only, grid_deg=CACHE_GRID_DEG):
+    """Build the cache key of the grid cell a search center falls in."""
+    snapped_lat = round(round(latitude / grid_deg) * grid_deg, 6)
+    snapped_lon = round(round(longitude / grid_deg) * grid_deg, 6)
+    return f"places:v3:{snapped_lat:.6f},{snapped_lon:.6f}:{place_type}:open={int(bool(open_only))}"
+
+
+def cached_results(entry, latitude, longitude, radius):
+    """
+    Results of a cached search that answer the given circle, or None.
+
+    A search below PLACES_MAX_RESULTS holds every place of its circle, so it
+    answers any circle inside it, filtered to that circle. A search that hit
+    the cap may have dropped places of a smaller circle for ones outside it,
+    so it only answers the very same search.
+
+    Args:
+        entry (dict): Cached search with latitude, longitude, radius and results.
+        latitude (float): Requested center latitude.
+        longitude (float): Requested center longitude.
+        radius (float): Requested radius in meters.
+    """
+    results = entry["results"]
+    if (entry["latitude"], entry["longitude"], entry["radius"]) == (latitude, longitude, radius):
+        return results
+    if len(results) >= PLACES_MAX_RESULTS:
+        return None
+    offset = float(haversine_m(entry["latitude"], entry["longitude"], latitude, longitude))
+    if offset + radius > entry["radius"]:
+        return None
+    if not results:
+        return results
+    distances = haversine_m(
+        latitude,
+        longitude,
+        np.array([result["geometry"]["location"]["lat"] for result in results], dtype=np.float64),
+        np.array([result["geometry"]["location"]["lng"] for result in results], dtype=np.float64),
+    )
+    return [result for result, distance in zip(results, distances) if distance <= radius]
+
+
+def strip_open_now(results):
+    """
+    Copies of raw Places results without `opening_hours.open_now`, for results
+    too old to tell whether a place is open; it then shows as unknown.
+    """
+    stripped = []
+    for result in results:
+        hours = result.get("opening_hours")
+        if hours and "open_now" in hours:
+            result = dict(result, opening_hours={k: v for k, v in hours.items() if k != "open_now"})
+        stripped.append(result)
+    return stripped
+
+
+def _page_ready(data):
+    return data.get("status") != "INVALID_REQUEST"
+
+
+def iter_place_type_pages(latitude, longitude, radius, place_type, api_key, client=None, stop=None):
+    """
+    Fetch the result pages of a single place type, yielding each page as soon as it arrives.
+
+    Requests go through the shared HTTP client, so they reuse pooled
+    connections, time out, and retry transient failures with backoff.
+
+    Args:
+        latitude (float): Search center latitude.
+        longitude (float): Search center longitude.
+        radius (float): Search radius in meters.
+        place_type (str): Google Places type, e.g. "pharmacy".
+        api_key (str): Google API key.
+        client (HttpClient): HTTP client; the shared one if None.
+        stop (threading.Event): When set, no further pages are requested.
+
+    Yields:
+        tuple: (results, error) per page, where `results` is the page's raw
+        Places results. A failed page ends the iteration with ([], message).
+    """
+    client = client or get_http_client()
+    params = {
+        "location": f"{latitude},{longitude}",
+        "radius": radius,
+        "type": place_type,
+        "key": api_key,
+    }
+    page = 1
+
+    while stop is None or not stop.is_set():
+        # Later pages are polled until their token is ready; the span covers the wait
+        error = None
+        first_delay_s = 0 if page == 1 else PAGE_TOKEN_FIRST_POLL_S
+        with span("places.page", place_type=place_type, page=page):
+            if stop is not None and first_delay_s:
+                # Wait out the token delay here, where a cancellation can cut it short
+                if stop.wait(first_delay_s):
+                    return
+                first_delay_s = 0
+            count("external.google_places")
+            try:
+                response, data = client.poll_json(
+                    PLACES_NEARBY_URL,
+                    params,
+                    _page_ready,
+                    polls=1 if page == 1 else PAGE_TOKEN_MAX_POLLS,
+                    first_delay_s=first_delay_s,
+                    poll_base_s=PAGE_TOKEN_POLL_S,
+                )
+            except requests.RequestException as e:
+                error = f"Error fetching data from Google Places API: {e}"
+        if error:
+            yield [], error
+            return
+        if data is None:
+            yield [], f"Error fetching data from Google Places API: {response.status_code}"
+            return
+        if data.get("status") not in (None, "OK", "ZERO_RESULTS"):
+            message = data.get("error_message") or data["status"]
+            yield [], f"Error fetching data from Google Places API: {message}"
+            return
+
+        yield data.get("results", []), None
+
+        # Check for the next page token
+        next_page_token = data.get("next_page_token")
+        if not next_page_token:
+            return
+        params = {"pagetoken": next_page_token, "key": api_key}
+        page += 1
+
+
+def fetch_place_type(latitude, longitude, radius, place_type, api_key, client=None):
+    """
+    Fetch every result page for a single place type, following page tokens in order.
+
+    Returns:
+        tuple: (results, error) where `results` is the list of raw Places results
+        and `error` is a message for a failed page, or None.
+    """
+    results = []
+    error = None
+    for page_results, error in iter_place_type_pages(latitude, longitude, radius, place_type, api_key, client):
+        results.extend(page_results)
+    return results, error
+
+
+def stream_places(latitude, longitude, radius, place_types, api_key, open_only=False, cache=None,
+                  max_workers=MAX_CONCURRENT_TYPES, on_fetched=None):
+    """
+    Fetch several place types concurrently, yielding every result page as soon as it arrives.
+
+    Each type's page-token chain runs sequentially inside its own worker, so
+    the first page of every type is available after a single round trip,
+    however many pages are still to come. With a cache, each type first tries
+    the last search cached for the grid cell of the center (see
+    `cached_results`); answered types are yielded immediately and only the
+    others search the requested circle. A type is cached once all its pages
+    arrived. Cached results older than OPEN_NOW_TTL_S lose their `open_now` flags.
+
+    Closing the generator cancels the search: workers stop before requesting
+    their next page, and the partial results are not cached.
+
+    Args:
+        latitude (float): Search center latitude.
+        longitude (float): Search center longitude.
+        radius (float): Search radius in meters.
+        place_types (list): Google Places types to query.
+        api_key (str): Google API key.
+        open_only (bool): Whether results are used for "open now" filtering,
+            which selects the shorter cache TTL.
+        cache (TTLCache): Optional result cache.
+        max_workers (int): Maximum number of types fetched at once.
+        on_fetched (callable): Called as on_fetched(latitude, longitude, radius,
+            place_type, results) once a type's pages have all arrived from
+            Places; not for cached types.
+
+    Yields:
+        tuple: (place_type, results, error, done) per page; `done` marks the
+        last item of a type, which carries the type's error if it failed.
+    """
+    keys = {}
+    pending = list(place_types)
+    if cache is not None:
+        ttl_s = OPEN_NOW_TTL_S if open_only else PLACES_TTL_S
+        pending = []
+        for place_type in place_types:
+            keys[place_type] = places_cache_key(latitude, longitude, place_type, open_only)
+            cached = cache.get(keys[place_type])
+            results = None if cached is None else cached_results(cached, latitude, longitude, radius)
+            if results is not None:
+                if time.time() - cached["fetched_at"] > OPEN_NOW_TTL_S:
+                    results = strip_open_now(results)
+                yield place_type, results, None, True
+            else:
+                pending.append(place_type)
+    if not pending:
+        return
+
+    pages = queue.Queue()
+    stop = threading.Event()
+
+    def fetch(place_type):
+        results = []
+        error = None
+        try:
+            for page_results, error in iter_place_type_pages(
+                latitude, longitude, radius, place_type, api_key, stop=stop
+            ):
+                if page_results:
+                    results.extend(page_results)
+                    pages.put((place_type, page_results, None, False))
+            if error is None and not stop.is_set():
+                if cache is not None:
+                    entry = {"latitude": latitude, "longitude": longitude, "radius": radius, "results": results}
+                    cache.set(keys[place_type], {**entry, "fetched_at": time.time()}, ttl_s)
+                if on_fetched is not None:
+                    on_fetched(latitude, longitude, radius, place_type, results)
+        except Exception as e:
+            # Report any failure as the type's error, so the stream still completes
+            error = f"Error fetching data from Google Places API: {e}"
+        finally:
+            pages.put((place_type, [], error, True))
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(pending)))
+    try:
+        for place_type in pending:
+            executor.submit(in_current_context(fetch), place_type)
+        remaining = len(pending)
+        while remaining:
+            item = pages.get()
+            remaining -= item[3]
+            yield item
+    finally:
+        # Runs on completion and when the consumer closes the generator early
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def fetch_places(latitude, longitude, radius, place_types, api_key, open_only=False, cache=None,
+                 max_workers=MAX_CONCURRENT_TYPES, on_fetched=None):
+    """
+    Fetch several place types concurrently, yielding each type as soon as it finishes.
+
+    Takes the same arguments as `stream_places`.
+
+    Yields:
+        tuple: (place_type, results, error) for each completed type.
+    """
+    collected = {}
+    for place_type, results, error, done in stream_places(
+        latitude, longitude, radius, place_types, api_key, open_only, cache, max_workers, on_fetched
+    ):
+        collected.setdefault(place_type, []).extend(results)
+        if done:
+            yield place_type, collected.pop(place_type), error
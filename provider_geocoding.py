@@ -0,0 +1,247 @@
+"""
+Geocoding stage for the provider ingest.
+
+Addresses are normalized and deduplicated before any lookup, looked up
+through a bounded, rate-limited thread pool, and remembered in a persistent
+address -> coordinate cache, so re-running the stage (or adding states) only
+costs lookups for addresses that have never been seen.
+
+Example:
+    python provider_geocoding.py providers_data.csv providers_data_with_coordinates.csv --backend google
+"""
+import argparse
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from geocoding import GEOCODE_URL, load_gazetteer
+from http_client import get_http_client
+from provider_store import get_provider_store
+from ttl_cache import TTLCache
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ADDRESS_CACHE_PATH = os.path.join(BASE_DIR, ".cache", "address_geocode.sqlite")
+ADDRESS_CACHE_ENTRIES = 1_000_000
+NOT_FOUND_TTL_S = 7 * 24 * 60 * 60  # Retry addresses that failed after a week
+
+DEFAULT_WORKERS = 8
+DEFAULT_RATE_PER_S = 10.0
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+_ZIP = re.compile(r"\b(\d{5})(?:-\d{4})?\b")
+
+
+def normalize_address(address):
+    """Normalize an address for deduplication: lowercase, no punctuation, single spaces."""
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", str(address).lower())).strip()
+
+
+class RateLimiter:
+    """
+    Token bucket shared by all worker threads.
+    """
+
+    def __init__(self, rate_per_s, burst=1):
+        self.rate_per_s = rate_per_s
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Block until one request may be made."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate_per_s)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) / self.rate_per_s
+            time.sleep(delay)
+
+
+class GoogleGeocoder:
+    """Google Geocoding API backend over the shared HTTP client (pooling, timeouts, retries)."""
+
+    name = "google"
+
+    def __init__(self, api_key, client=None):
+        self.api_key = api_key
+        self.client = client or get_http_client()
+
+    def geocode(self, address):
+        """
+        Returns:
+            tuple: (latitude, longitude), or None if Google found nothing (ZERO_RESULTS).
+
+        Raises:
+            RuntimeError: Any other status, e.g. OVER_QUERY_LIMIT or REQUEST_DENIED,
+                which Google returns with HTTP 200 and no results.
+        """
+        response = self.client.get(GEOCODE_URL, params={"address": address, "key": self.api_key})
+        response.raise_for_status()
+        data = response.json()
+        status = data.get("status")
+        if status == "ZERO_RESULTS":
+            return None
+        if status != "OK" or not data.get("results"):
+            raise RuntimeError(f"Geocoding API returned {status}: {data.get('error_message', 'no results')}")
+        location = data["results"][0]["geometry"]["location"]
+        return location["lat"], location["lng"]
+
+
+class NominatimGeocoder:
+    """OpenStreetMap Nominatim backend through geopy (keep the rate at 1 request/s)."""
+
+    name = "nominatim"
+
+    def __init__(self, user_agent="healthcare-app-provider-ingest"):
+        from geopy.geocoders import Nominatim
+
+        self._geolocator = Nominatim(user_agent=user_agent)
+
+    def geocode(self, address):
+        location = self._geolocator.geocode(address)
+        return (location.latitude, location.longitude) if location else None
+
+
+class OfflineGeocoder:
+    """
+    Offline stand-in that places an address at its ZIP code's centroid.
+
+    Useful for tests and dry runs; coordinates are only ZIP-accurate. Without
+    a gazetteer, ZIP centroids come from the ZIP code database if present,
+    otherwise from the bundled provider dataset.
+    """
+
+    name = "offline"
+
+    def __init__(self, gazetteer=None):
+        self.gazetteer = gazetteer or load_gazetteer(get_provider_store().data)
+
+    def geocode(self, address):
+        zip_match = _ZIP.search(str(address))
+        return self.gazetteer.lookup(zip_match.group(1)) if zip_match else None
+
+
+def geocode_addresses(addresses, backend, cache=None, workers=DEFAULT_WORKERS, rate_per_s=DEFAULT_RATE_PER_S):
+    """
+    Geocode a list of addresses, looking up each distinct address at most once.
+
+    Args:
+        addresses (iterable): Raw addresses, duplicates allowed.
+        backend: Geocoder with a `geocode(address)` method returning (lat, lon) or None.
+        cache (TTLCache): Persistent address -> coordinate cache.
+        workers (int): Size of the lookup thread pool.
+        rate_per_s (float): Maximum lookups per second across all workers.
+
+    Returns:
+        tuple: (coordinates, stats) where `coordinates` maps each normalized
+        address to (lat, lon) or None, and `stats` counts unique addresses,
+        cache hits, lookups and failures.
+    """
+    unique = {}
+    for address in addresses:
+        if isinstance(address, str) and address.strip() and address != "N/A":
+            unique.setdefault(normalize_address(address), address)
+
+    coordinates = {}
+    to_lookup = []
+    for key, address in unique.items():
+        cached = cache.get(f"address:{key}") if cache is not None else None
+        if cached is None:
+            to_lookup.append((key, address))
+        else:
+            coordinates[key] = tuple(cached) if cached else None
+
+    stats = {"unique": len(unique), "cache_hits": len(coordinates), "lookups": len(to_lookup), "failed": 0}
+    limiter = RateLimiter(rate_per_s)
+
+    def lookup(address):
+        limiter.wait()
+        return backend.geocode(address)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(lookup, address): key for key, address in to_lookup}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                location = future.result()
+            except Exception as e:
+                # Leave errors (including quota and denied statuses) uncached so the next run retries them
+                print(f"Error geocoding {unique[key]!r}: {e}")
+                stats["failed"] += 1
+                coordinates[key] = None
+                continue
+            coordinates[key] = tuple(location) if location else None
+            if cache is not None:
+                if location:
+                    cache.set(f"address:{key}", list(location))
+                else:
+                    cache.set(f"address:{key}", [], NOT_FOUND_TTL_S)
+    return coordinates, stats
+
+
+def add_coordinates(providers, backend, cache=None, address_column="Address", **kwargs):
+    """
+    Add `latitude` and `longitude` columns to a provider table.
+
+    Returns:
+        tuple: (providers with coordinates, stats from `geocode_addresses`).
+    """
+    coordinates, stats = geocode_addresses(providers[address_column], backend, cache, **kwargs)
+    keys = providers[address_column].map(normalize_address)
+    located = keys.map(lambda key: coordinates.get(key) or (None, None))
+    providers = providers.assign(
+        latitude=pd.to_numeric(located.str[0], errors="coerce"),
+        longitude=pd.to_numeric(located.str[1], errors="coerce"),
+    )
+    return providers, stats
+
+
+def get_backend(name, api_key=None):
+    """Return a geocoding backend by name ("google", "nominatim" or "offline")."""
+    if name == "google":
+        if not api_key:
+            raise ValueError("The google backend needs an API key (--api-key or GOOGLE_API_KEY)")
+        return GoogleGeocoder(api_key)
+    if name == "nominatim":
+        return NominatimGeocoder()
+    if name == "offline":
+        return OfflineGeocoder()
+    raise ValueError(f"Unknown geocoding backend: {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add coordinates to a scraped provider CSV.")
+    parser.add_argument("input", help="Provider CSV with an Address column")
+    parser.add_argument("output", help="CSV to write with latitude/longitude columns")
+    parser.add_argument("--backend", choices=["google", "nominatim", "offline"], default="google")
+    parser.add_argument("--api-key", default=os.environ.get("GOOGLE_API_KEY"))
+    parser.add_argument("--cache", default=ADDRESS_CACHE_PATH, help="Address -> coordinate cache file")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE_PER_S, help="Maximum lookups per second")
+    args = parser.parse_args()
+
+    providers = pd.read_csv(args.input, dtype={"ZIP": str})
+    providers, stats = add_coordinates(
+        providers,
+        get_backend(args.backend, args.api_key),
+        TTLCache(args.cache, max_entries=ADDRESS_CACHE_ENTRIES),
+        workers=args.workers,
+        rate_per_s=args.rate,
+    )
+    providers.to_csv(args.output, index=False)
+    print(stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import numpy as np
+
+from geo import haversine_m, meters_to_lat_degrees
+
+DEFAULT_CELL_SIZE_M = 100.0  # Height of one latitude row in the grid
+
+
+class ProviderIndex:
+    """
+    Sorted grid index over provider coordinates.
+
+    Providers are bucketed into latitude rows of a fixed height and sorted by
+    longitude inside each row, so every radius query becomes a handful of
+    binary searches followed by one vectorized distance check. Build it once
+    when the provider table is loaded and reuse it for every search.
+    """
+
+    def __init__(self, latitude, longitude, cell_size_m=DEFAULT_CELL_SIZE_M):
+        """
+        Args:
+            latitude (array-like): Provider latitudes in degrees.
+            longitude (array-like): Provider longitudes in degrees.
+            cell_size_m (float): Height of one latitude row, in meters.
+        """
+        latitude = np.asarray(latitude, dtype=np.float64)
+        longitude = np.asarray(longitude, dtype=np.float64)
+        valid = np.isfinite(latitude) & np.isfinite(longitude)
+
+        self._cell_deg = meters_to_lat_degrees(cell_size_m)
+        self._row_span = 1000.0  # Longitudes (shifted to 0..360) never reach this
+
+        rows = np.flatnonzero(valid)
+        keys = self._keys(self._cell_row(latitude[rows]), longitude[rows])
+        order = np.argsort(keys, kind="stable")
+
+        # Positions in the original table, in index order
+        self._rows = rows[order]
+        self._keys_sorted = keys[order]
+        self._lat = latitude[self._rows]
+        self._lon = longitude[self._rows]
+
+    @classmethod
+    def from_frame(cls, df, lat_col="latitude", lon_col="longitude", **kwargs):
+        """Build an index from the coordinate columns of a DataFrame."""
+        return cls(
+            df[lat_col].to_numpy(dtype=np.float64),
+            df[lon_col].to_numpy(dtype=np.float64),
+            **kwargs,
+        )
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _cell_row(self, latitude):
+        return np.floor((latitude + 90.0) / self._cell_deg)
+
+    def _keys(self, cell_rows, longitude):
+        return cell_rows * self._row_span + (longitude + 180.0)
+
+    def query_radius(self, latitude, longitude, radius_m):
+        """
+        Find every provider within `radius_m` meters of each query point.
+
+        Args:
+            latitude (array-like): Query latitudes in degrees.
+            longitude (array-like): Query longitudes in degrees.
+            radius_m (float): Search radius in meters.
+
+        Returns:
+            tuple: (query_idx, provider_idx, distance_m) arrays, one entry per
+            matching pair. `provider_idx` is the row position in the table the
+            index was built from.
+        """
+        q_lat = np.atleast_1d(np.asarray(latitude, dtype=np.float64))
+        q_lon = np.atleast_1d(np.asarray(longitude, dtype=np.float64))
+        empty = (np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), np.empty(0))
+        if len(self._rows) == 0 or len(q_lat) == 0:
+            return empty
+
+        dlat = meters_to_lat_degrees(radius_m)
+        # Longitude degrees shrink towards the poles; widen the window accordingly
+        dlon = dlat / np.maximum(np.cos(np.radians(q_lat)), 1e-6)
+
+        # One (query, grid row) pair for every latitude row the circle touches
+        first_row = self._cell_row(q_lat - dlat)
+        n_rows = (self._cell_row(q_lat + dlat) - first_row).astype(np.intp) + 1
+        pair_query = np.repeat(np.arange(len(q_lat)), n_rows)
+        pair_row = np.repeat(first_row, n_rows) + _ramp(n_rows)
+
+        lo = np.searchsorted(
+            self._keys_sorted, self._keys(pair_row, q_lon[pair_query] - dlon[pair_query]), side="left"
+        )
+        hi = np.searchsorted(
+            self._keys_sorted, self._keys(pair_row, q_lon[pair_query] + dlon[pair_query]), side="right"
+        )
+
+        # Expand each [lo, hi) slice into candidate positions
+        counts = hi - lo
+        cand_query = np.repeat(pair_query, counts)
+        cand_pos = np.repeat(lo, counts) + _ramp(counts)
+        if len(cand_pos) == 0:
+            return empty
+
+        distance = haversine_m(q_lat[cand_query], q_lon[cand_query], self._lat[cand_pos], self._lon[cand_pos])
+        keep = distance <= radius_m
+        return cand_query[keep], self._rows[cand_pos[keep]], distance[keep]
+
+    def match(self, latitude, longitude, tolerance_m):
+        """
+        Match each query point to its nearest provider within a tolerance.
+
+        Args:
+            latitude (array-like): Query latitudes in degrees.
+            longitude (array-like): Query longitudes in degrees.
+            tolerance_m (float): Maximum distance in meters for a match.
+
+        Returns:
+            tuple: (matched, nearest) where `matched` is a boolean array and
+            `nearest` holds the provider row position, or -1 when unmatched.
+        """
+        n = len(np.atleast_1d(latitude))
+        matched = np.zeros(n, dtype=bool)
+        nearest = np.full(n, -1, dtype=np.intp)
+
+        query_idx, provider_idx, distance = self.query_radius(latitude, longitude, tolerance_m)
+        if len(query_idx):
+            # Closest candidate first within each query, then keep the first per query
+            order = np.lexsort((distance, query_idx))
+            first_query, first = np.unique(query_idx[order], return_index=True)
+            matched[first_query] = True
+            nearest[first_query] = provider_idx[order][first]
+        return matched, nearest
+
+
+def _ramp(counts):
+    """Return 0..n-1 for every n in `counts`, concatenated."""
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.intp)
+    starts = np.cumsum(counts) - counts
+    return np.arange(total) - np.repeat(starts, counts)
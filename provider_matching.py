@@ -0,0 +1,227 @@
+import re
+
+import numpy as np
+
+# Candidate providers are searched this far from a facility, so geocodes that
+# drifted by a building or two can still match on their address
+MATCH_RADIUS_M = 250.0
+MATCH_THRESHOLD = 0.6  # Minimum confidence to call a facility Medicaid-supported
+
+# Confidence = weighted sum of the three similarities, each in [0, 1]
+MATCH_WEIGHTS = {"distance": 0.35, "address": 0.45, "name": 0.2}
+# Name overlap that counts as name evidence. Providers are individual
+# clinicians, so a facility name rarely overlaps theirs and a facility matches
+# on its building alone; names only decide between facilities competing for
+# the same provider.
+MIN_NAME_SCORE = 0.5
+
+# Address score multiplier when either side has no house number to compare
+MISSING_HOUSE_NUMBER_FACTOR = 0.5
+
+# Spelled-out and abbreviated address words normalize to the same token
+ADDRESS_ABBREVIATIONS = {
+    "street": "st", "avenue": "ave", "av": "ave", "boulevard": "blvd", "road": "rd", "drive": "dr",
+    "lane": "ln", "court": "ct", "place": "pl", "parkway": "pkwy", "highway": "hwy", "suite": "ste",
+    "circle": "cir", "terrace": "ter", "square": "sq", "north": "n", "south": "s", "east": "e",
+    "west": "w", "northeast": "ne", "northwest": "nw", "southeast": "se", "southwest": "sw",
+    "building": "bldg", "floor": "fl", "unit": "ste", "apt": "ste",
+}
+
+# Words that say nothing about which provider a name refers to
+NAME_STOPWORDS = frozenset([
+    "dr", "md", "do", "dds", "dmd", "pa", "np", "rn", "phd", "pharmd", "od", "dpm", "dc", "pt", "dpt",
+    "the", "of", "and", "at", "inc", "llc", "pc", "corp", "co",
+])
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_HOUSE_NUMBER = re.compile(r"^\s*(\d+)\b")
+
+
+def address_tokens(address):
+    """Normalized, deduplicated address tokens, e.g. "5850 South Main Street" -> {"5850", "s", "main", "st"}."""
+    words = _NON_WORD.sub(" ", str(address).lower()).split()
+    return {ADDRESS_ABBREVIATIONS.get(word, word) for word in words}
+
+
+def name_tokens(name):
+    """Normalized name tokens without titles, degrees and legal suffixes."""
+    return set(_NON_WORD.sub(" ", str(name).lower()).split()) - NAME_STOPWORDS
+
+
+def house_number(address):
+    """Leading house number of an address, or -1 if it has none."""
+    match = _HOUSE_NUMBER.match(str(address))
+    return int(match.group(1)) if match else -1
+
+
+class _TokenSets:
+    """Token sets of many rows as one CSR array of token ids."""
+
+    def __init__(self, token_sets, vocabulary, grow):
+        ids = []
+        # Unknown tokens count towards the set size but can never match
+        self.sizes = np.zeros(len(token_sets), dtype=np.int64)
+        known = np.zeros(len(token_sets), dtype=np.int64)
+        for row, tokens in enumerate(token_sets):
+            self.sizes[row] = len(tokens)
+            for token in tokens:
+                token_id = vocabulary.get(token)
+                if token_id is None and grow:
+                    token_id = vocabulary[token] = len(vocabulary)
+                if token_id is not None:
+                    ids.append(token_id)
+                    known[row] += 1
+        self.offsets = np.concatenate([[0], np.cumsum(known)])
+        self.ids = np.asarray(ids, dtype=np.int64)
+
+    def gather(self, rows):
+        """Token ids of the given rows, and the position in `rows` each one came from."""
+        starts = self.offsets[rows]
+        counts = self.offsets[rows + 1] - starts
+        owners = np.repeat(np.arange(len(rows)), counts)
+        # Position of every token inside its row's run
+        within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return self.ids[np.repeat(starts, counts) + within], owners
+
+
+def _overlap(left, right, left_rows, right_rows, vocabulary_size):
+    """
+    Overlap coefficient |A & B| / min(|A|, |B|) of many pairs of token sets at once.
+
+    Each (pair, token) is encoded as one integer, so the intersection of every
+    pair is a single `np.isin` over the concatenated sets.
+    """
+    left_ids, left_pair = left.gather(left_rows)
+    right_ids, right_pair = right.gather(right_rows)
+    shared = np.isin(left_pair * vocabulary_size + left_ids, right_pair * vocabulary_size + right_ids)
+    intersection = np.bincount(left_pair[shared], minlength=len(left_rows))
+    smaller = np.minimum(left.sizes[left_rows], right.sizes[right_rows])
+    return np.divide(intersection, smaller, out=np.zeros(len(left_rows)), where=smaller > 0)
+
+
+class MatchResult:
+    """
+    Scored facility/provider candidate pairs for one batch of facilities.
+
+    Attributes:
+        facility (numpy.ndarray): Facility position of each candidate pair.
+        provider (numpy.ndarray): Provider row position of each candidate pair.
+        score (numpy.ndarray): Confidence of each pair, in [0, 1].
+        confidence (numpy.ndarray): Best pair confidence per facility, 0 without candidates.
+        best (numpy.ndarray): Provider row position of the best pair per facility, or -1.
+        matched (numpy.ndarray): Whether each facility's confidence reaches the threshold.
+    """
+
+    def __init__(self, providers, n_facilities, facility, provider, score, threshold):
+        self.providers = providers
+        self.threshold = threshold
+        # Best pair first within each facility
+        order = np.lexsort((-score, facility))
+        self.facility = facility[order]
+        self.provider = provider[order]
+        self.score = score[order]
+
+        self.confidence = np.zeros(n_facilities)
+        self.best = np.full(n_facilities, -1, dtype=np.int64)
+        first = np.flatnonzero(np.r_[True, self.facility[1:] != self.facility[:-1]]) if len(order) else order
+        self.confidence[self.facility[first]] = self.score[first]
+        self.best[self.facility[first]] = self.provider[first]
+        self.matched = self.confidence >= threshold
+
+    def matched_rows(self, facility):
+        """
+        Provider rows matched to one facility, best first.
+
+        Returns:
+            pd.DataFrame: Matching provider rows with a `match_confidence` column.
+        """
+        pairs = (self.facility == facility) & (self.score >= self.threshold)
+        rows = self.providers.iloc[self.provider[pairs]]
+        return rows.assign(match_confidence=self.score[pairs])
+
+
+class ProviderMatcher:
+    """
+    Fuzzy Medicaid provider matching on location, address and name.
+
+    Provider tokens are normalized once when the provider table is loaded.
+    A search then looks up nearby candidates in the spatial index and scores
+    every facility/candidate pair at once: closeness, overlap of address
+    tokens (zero when the house numbers differ) and overlap of name tokens.
+    Closeness and address together reach the threshold, so a facility
+    matches the clinicians listed at its building, and an address match
+    still holds when the two geocodes drifted apart; a shared name only
+    raises the score. When several facilities of one batch reach the same
+    provider and some of them also share its name (at least
+    `min_name_score`), that provider is theirs alone.
+    """
+
+    def __init__(self, providers, index, radius_m=MATCH_RADIUS_M, threshold=MATCH_THRESHOLD,
+                 weights=MATCH_WEIGHTS, min_name_score=MIN_NAME_SCORE):
+        """
+        Args:
+            providers (pd.DataFrame): Provider rows with Name and Address columns.
+            index (ProviderIndex): Spatial index over the same rows.
+            radius_m (float): Candidate search radius in meters.
+            threshold (float): Minimum confidence of a match.
+            weights (dict): Weights of the distance, address and name similarities.
+            min_name_score (float): Name overlap that claims a provider for a facility.
+        """
+        self.providers = providers
+        self.index = index
+        self.radius_m = radius_m
+        self.threshold = threshold
+        self.weights = weights
+        self.min_name_score = min_name_score
+
+        self._vocabulary = {}
+        addresses = providers["Address"].fillna("").astype(str).tolist()
+        self._address = _TokenSets([address_tokens(a) for a in addresses], self._vocabulary, grow=True)
+        self._name = _TokenSets(
+            [name_tokens(n) for n in providers["Name"].fillna("").astype(str).tolist()], self._vocabulary, grow=True
+        )
+        self._house = np.array([house_number(a) for a in addresses], dtype=np.int64)
+
+    def match(self, latitude, longitude, addresses, names):
+        """
+        Match facilities against the provider table.
+
+        Args:
+            latitude, longitude (array-like): Facility coordinates in degrees.
+            addresses (list): Facility addresses (Places "vicinity").
+            names (list): Facility names.
+
+        Returns:
+            MatchResult: Scored candidate pairs and the best match per facility.
+        """
+        latitude = np.asarray(latitude, dtype=np.float64)
+        facility, provider, distance = self.index.query_radius(
+            latitude, np.asarray(longitude, dtype=np.float64), self.radius_m
+        )
+        if len(facility) == 0:
+            return MatchResult(self.providers, len(latitude), facility, provider, np.zeros(0), self.threshold)
+
+        addresses = [str(a) for a in addresses]
+        facility_address = _TokenSets([address_tokens(a) for a in addresses], self._vocabulary, grow=False)
+        facility_name = _TokenSets([name_tokens(n) for n in names], self._vocabulary, grow=False)
+        facility_house = np.array([house_number(a) for a in addresses], dtype=np.int64)
+
+        vocabulary_size = len(self._vocabulary)
+        address_score = _overlap(facility_address, self._address, facility, provider, vocabulary_size)
+        houses = facility_house[facility], self._house[provider]
+        address_score *= np.where(
+            (houses[0] < 0) | (houses[1] < 0), MISSING_HOUSE_NUMBER_FACTOR, houses[0] == houses[1]
+        )
+        name_score = _overlap(facility_name, self._name, facility, provider, vocabulary_size)
+        distance_score = np.clip(1.0 - distance / self.radius_m, 0.0, 1.0)
+
+        score = (
+            self.weights["distance"] * distance_score
+            + self.weights["address"] * address_score
+            + self.weights["name"] * name_score
+        )
+        # A provider claimed by name no longer matches the other facilities of its building
+        named = name_score >= self.min_name_score
+        claimed = np.unique(provider[named & (score >= self.threshold)])
+        score = np.where(~named & np.isin(provider, claimed), 0.0, score)
+        return MatchResult(self.providers, len(latitude), facility, provider, score, self.threshold)
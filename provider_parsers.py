@@ -0,0 +1,145 @@
+import re
+
+from bs4 import BeautifulSoup
+
+# Class names used by the Healthgrades search results page
+CARD_CLASS = "D3oATTFGKHQDxyDR MUU7qPwXH8scbrT7 PQQF2bnkw2gDe8Bm"
+NAME_CLASS = "SQgRqCj5Lmsc8jAm hWXwADpiAgQW_vN2"
+SPECIALTY_CLASS = "ciXWR_F96QIbVTnf"
+ADDRESS_CLASS = "efB6RomtY4gvWNmF"
+STREET_TARGET = "location-info-address__address"
+CITY_STATE_TARGET = "location-info-address__city-state"
+
+_ZIP_PATTERN = re.compile(r"\d{5}(?:-\d{4})?")
+
+
+def _provider(zip_code, name, specialty, street_address, city_state_zip):
+    """Build a provider row, or None if its address is outside `zip_code`."""
+    if street_address is None or city_state_zip is None:
+        return None
+    full_address = f"{street_address}, {city_state_zip}"
+    zip_match = _ZIP_PATTERN.search(full_address)
+    if not zip_match or zip_match.group(0) != zip_code:
+        return None
+    specialty = specialty.replace("Specialty: ", "") if specialty else "N/A"
+    return {"ZIP": zip_code, "Name": name or "N/A", "Specialty": specialty, "Address": full_address}
+
+
+class SoupParser:
+    """
+    Reference parser using BeautifulSoup, as the original ingest script did.
+    """
+
+    name = "soup"
+
+    def __init__(self, features="html.parser"):
+        self.features = features
+
+    def parse(self, html, zip_code):
+        """
+        Extract providers located in `zip_code` from a search results page.
+
+        Returns:
+            list: Dictionaries with ZIP, Name, Specialty and Address.
+        """
+        soup = BeautifulSoup(html, self.features)
+        providers = []
+        for card in soup.find_all("div", class_=CARD_CLASS):
+            name_tag = card.find("h3", class_=NAME_CLASS)
+            specialty_tag = card.find("div", class_=SPECIALTY_CLASS)
+            address_tag = card.find("address", class_=ADDRESS_CLASS)
+            street = city_state = None
+            if address_tag:
+                street_tag = address_tag.find("span", {"data-qa-target": STREET_TARGET})
+                city_state_tag = address_tag.find("span", {"data-qa-target": CITY_STATE_TARGET})
+                street = street_tag.text.strip() if street_tag else None
+                city_state = city_state_tag.text.strip() if city_state_tag else None
+            provider = _provider(
+                zip_code,
+                name_tag.text.strip() if name_tag else None,
+                specialty_tag.text.strip() if specialty_tag else None,
+                street,
+                city_state,
+            )
+            if provider:
+                providers.append(provider)
+        return providers
+
+
+def _has_classes(classes):
+    # XPath test for an element carrying every class in `classes`
+    return " and ".join(
+        f"contains(concat(' ', normalize-space(@class), ' '), ' {cls} ')" for cls in classes.split()
+    )
+
+
+class LxmlParser:
+    """
+    Fast parser on lxml's C HTML parser with XPath expressions compiled once.
+
+    Each card is visited once and all four fields are read from it with
+    precompiled relative expressions.
+    """
+
+    name = "lxml"
+
+    def __init__(self):
+        from lxml import etree, html as lxml_html
+
+        self._fromstring = lxml_html.fromstring
+        self._cards = etree.XPath(f"//div[{_has_classes(CARD_CLASS)}]")
+        self._name = etree.XPath(f"string(.//h3[{_has_classes(NAME_CLASS)}])")
+        self._specialty = etree.XPath(f"string(.//div[{_has_classes(SPECIALTY_CLASS)}])")
+        self._address = etree.XPath(f".//address[{_has_classes(ADDRESS_CLASS)}]")
+        self._street = etree.XPath(f".//span[@data-qa-target='{STREET_TARGET}']")
+        self._city_state = etree.XPath(f".//span[@data-qa-target='{CITY_STATE_TARGET}']")
+
+    def parse(self, html, zip_code):
+        """
+        Extract providers located in `zip_code` from a search results page.
+
+        Returns:
+            list: Dictionaries with ZIP, Name, Specialty and Address.
+        """
+        if not html or not html.strip():
+            return []
+        document = self._fromstring(html)
+        providers = []
+        for card in self._cards(document):
+            street = city_state = None
+            address = self._address(card)
+            if address:
+                street_tags = self._street(address[0])
+                city_state_tags = self._city_state(address[0])
+                street = street_tags[0].text_content().strip() if street_tags else None
+                city_state = city_state_tags[0].text_content().strip() if city_state_tags else None
+            provider = _provider(
+                zip_code,
+                self._name(card).strip() or None,
+                self._specialty(card).strip() or None,
+                street,
+                city_state,
+            )
+            if provider:
+                providers.append(provider)
+        return providers
+
+
+PARSERS = {
+    SoupParser.name: SoupParser,
+    LxmlParser.name: LxmlParser,
+}
+
+
+def get_parser(name="lxml"):
+    """Return a parser instance by name ("lxml" or "soup")."""
+    return PARSERS[name]()
+
+
+def has_provider_markup(html):
+    """
+    Whether a page already contains server-rendered provider cards.
+
+    Pages without them need a JavaScript-capable fetcher.
+    """
+    return CARD_CLASS.split()[0] in html
@@ -0,0 +1,322 @@
+"""
+Provider store partitioned by state and geohash prefix.
+
+Each partition is one Parquet file, <root>/<state>/<geohash>.parquet, listed
+in a manifest with its row count and checksum. Ingest runs upsert into the
+partitions their rows fall in, deduplicating on (name, address), so adding a
+state never rewrites the others. Two small artifacts sit next to the
+partitions: a key index mapping each provider to its partition, so a provider
+whose coordinates change is removed from its old partition, and per-partition
+gazetteer totals, so the app builds its ZIP/city gazetteer without reading
+the partitions. The app loads only the partitions that overlap the search circle.
+
+Example:
+    python provider_partitions.py import providers_data_with_coordinates_threading.csv
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from geo import geohash_encode, geohashes_in_circle
+from geocoding import gazetteer_totals
+from provider_geocoding import normalize_address
+from provider_store import COORDINATE_DECIMALS, ProviderStore, file_sha256, get_provider_store
+from tracing import span
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PROVIDER_PARTITIONS_DIR = os.path.join(BASE_DIR, "provider_partitions")
+MANIFEST_NAME = "manifest.json"
+KEY_INDEX_NAME = "keys.parquet"  # Provider key -> partition
+GAZETTEER_NAME = "gazetteer.parquet"  # Gazetteer totals per partition
+GAZETTEER_COLUMNS = ["ZIP", "Address", "latitude", "longitude"]
+
+PARTITION_PRECISION = 4  # Geohash characters per partition, cells of about 39 x 20 km
+REGION_CACHE_ENTRIES = 32  # Loaded regions kept per process
+UNKNOWN_STATE = "_"
+
+_STATE = re.compile(r",\s*([A-Z]{2})\s+\d{5}(?:-\d{4})?\s*$")
+
+_partitions = {}
+_partitions_lock = threading.Lock()
+
+
+def provider_states(addresses):
+    """Two-letter state of each address ("..., City, CA 95616"), or UNKNOWN_STATE."""
+    return addresses.astype(str).str.extract(_STATE, expand=False).fillna(UNKNOWN_STATE)
+
+
+def provider_keys(providers):
+    """Deduplication key of each provider: normalized name and address."""
+    return providers["Name"].map(normalize_address) + "|" + providers["Address"].map(normalize_address)
+
+
+class PartitionedProviderStore:
+    """
+    Provider table split into state/geohash partitions with upsert semantics.
+
+    Writes are atomic per partition, and the manifest is replaced last, so
+    readers only ever see complete partitions. Partition membership follows
+    from a provider's coordinates, which are cached per address by the
+    geocoding stage, so a provider lands in the same partition on every run.
+    """
+
+    def __init__(self, root=PROVIDER_PARTITIONS_DIR, precision=PARTITION_PRECISION):
+        """
+        Args:
+            root (str): Directory holding the partitions and the manifest.
+            precision (int): Geohash characters per partition, for a new store.
+        """
+        self.root = root
+        self._lock = threading.RLock()
+        self._regions = OrderedDict()
+        self.manifest = self._read_manifest() or {"precision": precision, "partitions": {}}
+        self.precision = self.manifest["precision"]
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.root, MANIFEST_NAME)
+
+    @property
+    def checksum(self):
+        """Checksum of the manifest; changes whenever any partition does."""
+        return hashlib.sha256(json.dumps(self.manifest, sort_keys=True).encode()).hexdigest()
+
+    def __len__(self):
+        return sum(partition["rows"] for partition in self.manifest["partitions"].values())
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_manifest(self):
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _partition_path(self, key):
+        return os.path.join(self.root, f"{key}.parquet")
+
+    def _read_partition(self, key):
+        return pd.read_parquet(self._partition_path(key))
+
+    def _artifact_path(self, name):
+        return os.path.join(self.root, name)
+
+    def _write_artifact(self, name, frame):
+        path = self._artifact_path(name)
+        frame.to_parquet(f"{path}.tmp", index=False)
+        os.replace(f"{path}.tmp", path)
+        self.manifest.setdefault("artifacts", {})[name] = {"rows": len(frame), "sha256": file_sha256(path)}
+
+    def _read_artifacts(self):
+        """
+        Key index and gazetteer totals, rebuilt from the partitions for a store
+        written before they existed.
+        """
+        artifacts = self.manifest.get("artifacts", {})
+        if KEY_INDEX_NAME in artifacts and GAZETTEER_NAME in artifacts:
+            return (
+                pd.read_parquet(self._artifact_path(KEY_INDEX_NAME)),
+                pd.read_parquet(self._artifact_path(GAZETTEER_NAME)),
+            )
+        key_frames, totals_frames = [], []
+        for key in self.manifest["partitions"]:
+            rows = pd.read_parquet(self._partition_path(key), columns=["Name"] + GAZETTEER_COLUMNS)
+            key_frames.append(pd.DataFrame({"key": provider_keys(rows), "partition": key}))
+            totals_frames.append(gazetteer_totals(rows).assign(partition=key))
+        return (
+            pd.concat(key_frames, ignore_index=True) if key_frames else pd.DataFrame(columns=["key", "partition"]),
+            pd.concat(totals_frames, ignore_index=True) if totals_frames else pd.DataFrame(
+                columns=["query", "latitude", "longitude", "rows", "partition"]
+            ),
+        )
+
+    def upsert(self, providers):
+        """
+        Insert or replace providers, keyed on (name, address).
+
+        A provider already stored in another partition, e.g. after it was
+        re-geocoded, is removed from there.
+
+        Args:
+            providers (pd.DataFrame): Rows with ZIP, Name, Specialty, Address,
+                latitude and longitude. Rows without coordinates are skipped.
+
+        Returns:
+            dict: Counts of inserted, updated, moved and skipped rows and touched partitions.
+        """
+        providers = providers.copy()
+        providers["ZIP"] = providers["ZIP"].astype(str).str.zfill(5)
+        providers["latitude"] = pd.to_numeric(providers["latitude"], errors="coerce").round(COORDINATE_DECIMALS)
+        providers["longitude"] = pd.to_numeric(providers["longitude"], errors="coerce").round(COORDINATE_DECIMALS)
+
+        located = providers["latitude"].notna() & providers["longitude"].notna()
+        stats = {"inserted": 0, "updated": 0, "moved": 0, "skipped": int((~located).sum()), "partitions": 0}
+        providers = providers[located]
+        if providers.empty:
+            return stats
+
+        partition_keys = provider_states(providers["Address"]) + "/" + geohash_encode(
+            providers["latitude"].to_numpy(), providers["longitude"].to_numpy(), self.precision
+        )
+        # Within one batch the last row for a provider wins
+        providers = providers.assign(_key=provider_keys(providers), _partition=partition_keys)
+        providers = providers[~providers["_key"].duplicated(keep="last")]
+
+        with self._lock:
+            key_index, totals = self._read_artifacts()
+            previous = providers["_key"].map(key_index.set_index("key")["partition"])
+            moved = previous.notna() & (previous != providers["_partition"])
+            leaving = {key: list(keys) for key, keys in providers.loc[moved, "_key"].groupby(previous[moved])}
+
+            for key in sorted(set(providers["_partition"]) | set(leaving)):
+                rows = providers[providers["_partition"] == key].drop(columns="_partition")
+                if key in self.manifest["partitions"]:
+                    existing = self._read_partition(key)
+                    existing_keys = provider_keys(existing)
+                    updated = existing_keys.isin(rows["_key"])
+                    removed = existing_keys.isin(leaving.get(key, []))
+                    stats["updated"] += int(updated.sum())
+                    stats["inserted"] += len(rows) - int(updated.sum())
+                    stats["moved"] += int(removed.sum())
+                    keep = ~(updated | removed).to_numpy()
+                    merged = pd.concat([existing[keep], rows.drop(columns="_key")], ignore_index=True)
+                else:
+                    stats["inserted"] += len(rows)
+                    merged = rows.drop(columns="_key").reset_index(drop=True)
+
+                path = self._partition_path(key)
+                totals = totals[totals["partition"] != key]
+                if merged.empty:
+                    os.remove(path)
+                    del self.manifest["partitions"][key]
+                else:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    merged.to_parquet(f"{path}.tmp", index=False)
+                    os.replace(f"{path}.tmp", path)
+                    self.manifest["partitions"][key] = {"rows": len(merged), "sha256": file_sha256(path)}
+                    totals = pd.concat([totals, gazetteer_totals(merged).assign(partition=key)], ignore_index=True)
+                stats["partitions"] += 1
+
+            # A moved provider was counted as inserted into its new partition
+            stats["inserted"] -= stats["moved"]
+            stats["updated"] += stats["moved"]
+
+            key_index = pd.concat([
+                key_index[~key_index["key"].isin(providers["_key"])],
+                providers[["_key", "_partition"]].rename(columns={"_key": "key", "_partition": "partition"}),
+            ], ignore_index=True)
+            self._write_artifact(KEY_INDEX_NAME, key_index)
+            self._write_artifact(GAZETTEER_NAME, totals)
+            self._write_manifest()
+            self._regions.clear()
+        return stats
+
+    def partitions_for(self, latitude, longitude, radius_m):
+        """Keys of the existing partitions that may overlap a circle."""
+        cells = set(geohashes_in_circle(latitude, longitude, radius_m, self.precision))
+        return sorted(key for key in self.manifest["partitions"] if key.rsplit("/", 1)[-1] in cells)
+
+    def region(self, latitude, longitude, radius_m):
+        """
+        Provider store covering at least the given circle.
+
+        Only overlapping partitions are read; the most recently used regions
+        are kept in memory.
+
+        Returns:
+            ProviderStore: Rows and spatial index of the overlapping partitions.
+        """
+        keys = tuple(self.partitions_for(latitude, longitude, radius_m))
+        with self._lock:
+            store = self._regions.get(keys)
+            if store is not None:
+                self._regions.move_to_end(keys)
+                return store
+
+            with span("providers.region_load", partitions=len(keys)):
+                frames = [self._read_partition(key) for key in keys]
+                data = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+                    {"ZIP": [], "Name": [], "Specialty": [], "Address": [], "latitude": [], "longitude": []}
+                )
+                checksum = hashlib.sha256(
+                    "".join(self.manifest["partitions"][key]["sha256"] for key in keys).encode()
+                ).hexdigest()
+                store = ProviderStore(data, checksum, self.root)
+
+            self._regions[keys] = store
+            while len(self._regions) > REGION_CACHE_ENTRIES:
+                self._regions.popitem(last=False)
+            return store
+
+    def read_columns(self, columns):
+        """Read a few columns of every partition, e.g. to build a gazetteer."""
+        frames = [pd.read_parquet(self._partition_path(key), columns=columns) for key in self.manifest["partitions"]]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+    def gazetteer_totals(self):
+        """Coordinate sums per ZIP code and city, for `geocoding.load_gazetteer`."""
+        if GAZETTEER_NAME in self.manifest.get("artifacts", {}):
+            return pd.read_parquet(self._artifact_path(GAZETTEER_NAME), columns=["query", "latitude", "longitude", "rows"])
+        return gazetteer_totals(self.read_columns(GAZETTEER_COLUMNS))
+
+
+def has_partitions(root=PROVIDER_PARTITIONS_DIR):
+    """Whether a partitioned provider store has been built in `root`."""
+    return os.path.exists(os.path.join(root, MANIFEST_NAME))
+
+
+def get_provider_partitions(root=PROVIDER_PARTITIONS_DIR):
+    """
+    Return the process-wide partitioned store, reopening it when its manifest changes.
+    """
+    stat = os.stat(os.path.join(root, MANIFEST_NAME))
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _partitions_lock:
+        cached = _partitions.get(root)
+        if cached is None or cached[0] != signature:
+            cached = (signature, PartitionedProviderStore(root))
+            _partitions[root] = cached
+        return cached[1]
+
+
+def get_providers(root=PROVIDER_PARTITIONS_DIR):
+    """
+    Return the partitioned store if one has been built, otherwise the bundled provider dataset.
+
+    Both expose `checksum`, `region(latitude, longitude, radius_m)`, `read_columns(columns)`
+    and `gazetteer_totals()`.
+    """
+    if has_partitions(root):
+        return get_provider_partitions(root)
+    return get_provider_store()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the partitioned provider store.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import", help="Upsert a geocoded provider CSV into the store")
+    import_parser.add_argument("csv", nargs="+", help="CSV(s) with ZIP, Name, Specialty, Address, latitude, longitude")
+    import_parser.add_argument("--root", default=PROVIDER_PARTITIONS_DIR)
+    import_parser.add_argument("--precision", type=int, default=PARTITION_PRECISION)
+    args = parser.parse_args()
+
+    store = PartitionedProviderStore(args.root, precision=args.precision)
+    for path in args.csv:
+        print(path, store.upsert(pd.read_csv(path, dtype={"ZIP": str})))
+    print(f"{len(store)} providers in {len(store.manifest['partitions'])} partitions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from geocoding import gazetteer_totals
+from provider_index import ProviderIndex
+from provider_matching import ProviderMatcher
+from tracing import span
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Provider dataset bundled with the app and the directory holding its columnar snapshot
+PROVIDERS_CSV = os.path.join(BASE_DIR, "providers_data_with_coordinates_threading.csv")
+SNAPSHOT_DIR = os.path.join(BASE_DIR, ".cache", "providers")
+
+COORDINATE_DECIMALS = 5  # Precision used when comparing against Places coordinates
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def file_sha256(path):
+    """Return the hex SHA-256 digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ProviderStore:
+    """
+    Read-only provider table with typed coordinate arrays, a spatial index
+    and a Medicaid matcher.
+
+    Coordinates are rounded and names and addresses tokenized once when the
+    store is built, so searches never need to touch the shared DataFrame.
+    """
+
+    def __init__(self, data, checksum, source_path=None):
+        """
+        Args:
+            data (pd.DataFrame): Provider rows with `latitude`/`longitude` columns.
+            checksum (str): SHA-256 of the source file the rows were built from.
+            source_path (str): Path of that source file.
+        """
+        self.data = data
+        self.checksum = checksum
+        self.source_path = source_path
+
+        self.latitude = data["latitude"].to_numpy(dtype=np.float64, copy=True)
+        self.longitude = data["longitude"].to_numpy(dtype=np.float64, copy=True)
+        self.latitude.flags.writeable = False
+        self.longitude.flags.writeable = False
+
+        self.index = ProviderIndex(self.latitude, self.longitude)
+        self.matcher = ProviderMatcher(data, self.index)
+
+    def __len__(self):
+        return len(self.data)
+
+    def region(self, latitude, longitude, radius_m):
+        """The whole table is in memory, so every region is the store itself."""
+        return self
+
+    def read_columns(self, columns):
+        """Return the given columns of every provider."""
+        return self.data[columns]
+
+    def gazetteer_totals(self):
+        """Coordinate sums per ZIP code and city, for `geocoding.load_gazetteer`."""
+        return gazetteer_totals(self.data)
+
+
+def _read_source(source_path):
+    data = pd.read_csv(source_path, dtype={"ZIP": str})
+    data["latitude"] = pd.to_numeric(data["latitude"], errors="coerce").round(COORDINATE_DECIMALS)
+    data["longitude"] = pd.to_numeric(data["longitude"], errors="coerce").round(COORDINATE_DECIMALS)
+    return data
+
+
+def _snapshot_paths(snapshot_dir):
+    return os.path.join(snapshot_dir, "providers.parquet"), os.path.join(snapshot_dir, "meta.json")
+
+
+def build_snapshot(source_path=PROVIDERS_CSV, snapshot_dir=SNAPSHOT_DIR, source_checksum=None):
+    """
+    Parse the provider CSV once and write it as a Parquet snapshot.
+
+    Args:
+        source_path (str): Provider CSV to read.
+        snapshot_dir (str): Directory for the snapshot and its metadata.
+        source_checksum (str): Precomputed SHA-256 of `source_path`, if known.
+
+    Returns:
+        pd.DataFrame: The provider rows written to the snapshot.
+    """
+    source_checksum = source_checksum or file_sha256(source_path)
+    data = _read_source(source_path)
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    parquet_path, meta_path = _snapshot_paths(snapshot_dir)
+    tmp_path = f"{parquet_path}.tmp"
+    data.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, parquet_path)
+
+    meta = {
+        "source_sha256": source_checksum,
+        "snapshot_sha256": file_sha256(parquet_path),
+        "rows": len(data),
+    }
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    return data
+
+
+def load_snapshot(source_path=PROVIDERS_CSV, snapshot_dir=SNAPSHOT_DIR, source_checksum=None):
+    """
+    Load the provider snapshot, rebuilding it if it is missing, stale or corrupt.
+
+    Args:
+        source_path (str): Provider CSV the snapshot was built from.
+        snapshot_dir (str): Directory holding the snapshot.
+        source_checksum (str): Precomputed SHA-256 of `source_path`, if known.
+
+    Returns:
+        ProviderStore: Store built from the verified snapshot.
+    """
+    with span("providers.load"):
+        return _load_snapshot(source_path, snapshot_dir, source_checksum)
+
+
+def _load_snapshot(source_path, snapshot_dir, source_checksum):
+    source_checksum = source_checksum or file_sha256(source_path)
+    parquet_path, meta_path = _snapshot_paths(snapshot_dir)
+
+    data = None
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if (
+            meta.get("source_sha256") == source_checksum
+            and meta.get("snapshot_sha256") == file_sha256(parquet_path)
+        ):
+            data = pd.read_parquet(parquet_path)
+    except (OSError, ValueError) as e:
+        print(f"Provider snapshot unavailable ({e}); rebuilding from {source_path}.")
+
+    if data is None:
+        data = build_snapshot(source_path, snapshot_dir, source_checksum)
+    return ProviderStore(data, source_checksum, source_path)
+
+
+def get_provider_store(source_path=PROVIDERS_CSV, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Return the process-wide provider store, reloading only when the source changes.
+
+    The source file is stat'ed on every call; its checksum is only recomputed
+    when the size or modification time differs from the loaded copy.
+
+    Args:
+        source_path (str): Provider CSV to serve.
+        snapshot_dir (str): Directory holding the columnar snapshot.
+
+    Returns:
+        ProviderStore: The shared store.
+    """
+    stat = os.stat(source_path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    with _stores_lock:
+        cached = _stores.get(source_path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        checksum = file_sha256(source_path)
+        if cached is not None and cached[1].checksum == checksum:
+            store = cached[1]  # Touched but unchanged
+        else:
+            store = load_snapshot(source_path, snapshot_dir, checksum)
+        _stores[source_path] = (signature, store)
+        return store
@@ -0,0 +1,89 @@
+import numpy as np
+
+from geo import haversine_m
+
+RANK_BY_DISTANCE = "distance"
+RANK_BY_RATING = "rating"
+RANK_BY_SCORE = "score"
+
+# Weights of the "score" ranking; both components are scaled to 0..1
+DEFAULT_SCORE_WEIGHTS = {"rating": 0.6, "distance": 0.4}
+
+
+def add_distance(facilities, latitude, longitude):
+    """
+    Add a `distance` column (kilometers from the search center) to the facilities.
+
+    Returns:
+        pd.DataFrame: A copy of `facilities` with the distance column.
+    """
+    distance_m = haversine_m(
+        latitude, longitude, facilities["latitude"].to_numpy(), facilities["longitude"].to_numpy()
+    )
+    return facilities.assign(distance=distance_m / 1000.0)
+
+
+def filter_radius(facilities, radius_m):
+    """
+    Keep only facilities inside the requested radius.
+
+    Google Places treats the radius as a bias, so results can fall outside it.
+    Expects the `distance` column from `add_distance`.
+    """
+    return facilities[facilities["distance"].to_numpy() * 1000.0 <= radius_m].reset_index(drop=True)
+
+
+def ranking_keys(facilities, by=RANK_BY_DISTANCE, radius_m=None, weights=None):
+    """
+    Compute a sort key per facility where smaller is better.
+
+    Args:
+        facilities (pd.DataFrame): Facilities with `distance` and `rating` columns.
+        by (str): RANK_BY_DISTANCE, RANK_BY_RATING or RANK_BY_SCORE.
+        radius_m (float): Search radius used to scale distances for the score;
+            defaults to the farthest facility.
+        weights (dict): Score weights for "rating" and "distance".
+
+    Returns:
+        numpy.ndarray: Sort keys.
+    """
+    distance = facilities["distance"].to_numpy(dtype=np.float64)
+    rating = np.nan_to_num(facilities["rating"].to_numpy(dtype=np.float64, na_value=np.nan), nan=0.0)
+
+    if by == RANK_BY_DISTANCE:
+        return distance
+    if by == RANK_BY_RATING:
+        return -rating
+    if by == RANK_BY_SCORE:
+        weights = weights or DEFAULT_SCORE_WEIGHTS
+        scale_km = radius_m / 1000.0 if radius_m else max(distance.max(initial=0.0), 1e-9)
+        closeness = np.clip(1.0 - distance / scale_km, 0.0, 1.0)
+        return -(weights.get("rating", 0.0) * rating / 5.0 + weights.get("distance", 0.0) * closeness)
+    raise ValueError(f"Unknown ranking: {by}")
+
+
+def rank_facilities(facilities, by=RANK_BY_DISTANCE, k=None, radius_m=None, weights=None):
+    """
+    Order facilities by distance, rating or a weighted score, optionally keeping only the top k.
+
+    The top k are selected with a partial sort, so only they are fully ordered.
+    Ties are broken by distance.
+
+    Args:
+        facilities (pd.DataFrame): Facilities with `distance` and `rating` columns.
+        by (str): RANK_BY_DISTANCE, RANK_BY_RATING or RANK_BY_SCORE.
+        k (int): Number of facilities to keep; None keeps all of them.
+        radius_m (float): Search radius used by the score ranking.
+        weights (dict): Score weights for "rating" and "distance".
+
+    Returns:
+        pd.DataFrame: The ranked facilities.
+    """
+    keys = ranking_keys(facilities, by, radius_m, weights)
+    distance = facilities["distance"].to_numpy(dtype=np.float64)
+
+    candidates = np.arange(len(keys))
+    if k is not None and k < len(keys):
+        candidates = np.argpartition(keys, k)[:k] if k > 0 else candidates[:0]
+    order = candidates[np.lexsort((distance[candidates], keys[candidates]))]
+    return facilities.iloc[order].reset_index(drop=True)
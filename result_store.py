@@ -0,0 +1,223 @@
+"""
+Process-wide store of search results shared by every session.
+
+Sessions used to keep their own copy of each result frame in
+st.session_state, so memory grew with sessions x results and identical
+searches were held many times over. Here each distinct search is stored
+once, in a compact frame, and sessions keep only a small ResultHandle.
+Entries are reference-counted through those handles; when the store grows
+past its byte budget, the least recently used entries no session holds are
+dropped first.
+"""
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+
+from places import OPEN_NOW_TTL_S
+from tracing import count
+
+RESULT_STORE_MAX_BYTES = 256 << 20
+RESULT_TTL_S = OPEN_NOW_TTL_S  # Results are refetched after this long, as "open now" data goes stale
+
+# Column dtypes of stored facility frames; distances and coordinates do not need float64
+COMPACT_DTYPES = {
+    "latitude": "float32",
+    "longitude": "float32",
+    "rating": "float32",
+    "user_ratings_total": "int32",
+    "wheelchair_accessible_entrance": "bool",
+    "medicaid_supported": "bool",
+    "distance": "float32",
+    "medicaid_confidence": "float32",
+}
+CATEGORY_COLUMNS = ["name", "address"]  # Repeat when a facility matches several place types
+CATEGORY_MAX_UNIQUE_RATIO = 0.5  # Only worth it when values repeat this much
+
+
+def compact_facilities(facilities):
+    """
+    Copy of a facility frame with compact dtypes: float32 coordinates and
+    scores, int32 counts, bool flags and categorical text where it repeats.
+    """
+    dtypes = {column: dtype for column, dtype in COMPACT_DTYPES.items() if column in facilities}
+    compact = facilities.astype(dtypes)
+    for column in CATEGORY_COLUMNS:
+        if column in compact and compact[column].nunique() <= CATEGORY_MAX_UNIQUE_RATIO * len(compact):
+            compact[column] = compact[column].astype("category")
+    return compact.reset_index(drop=True)
+
+
+class ResultHandle:
+    """
+    A session's reference to a stored result.
+
+    The reference is released by `release()` or when the handle is garbage
+    collected, e.g. together with the session state that held it.
+    """
+
+    __slots__ = ("key", "_finalizer", "__weakref__")
+
+    def __init__(self, store, key):
+        self.key = key
+        self._finalizer = weakref.finalize(self, store._schedule_release, key)
+
+    def release(self):
+        """Release the reference; later calls do nothing."""
+        self._finalizer()
+
+
+class _Entry:
+    __slots__ = ("facilities", "errors", "created", "nbytes", "refs")
+
+    def __init__(self, facilities, errors):
+        self.facilities = facilities
+        self.errors = list(errors)
+        self.created = time.monotonic()
+        self.nbytes = int(facilities.memory_usage(deep=True).sum())
+        self.refs = 0
+
+
+class ResultStore:
+    """
+    Size-bounded, reference-counted, deduplicated store of facility frames.
+
+    Stored frames are shared between sessions, so callers must not modify
+    them in place.
+    """
+
+    def __init__(self, max_bytes=RESULT_STORE_MAX_BYTES, ttl_s=RESULT_TTL_S):
+        """
+        Args:
+            max_bytes (int): Byte budget. Entries a session holds are never
+                evicted, so only those can push the store past it.
+            ttl_s (float): Age after which an entry is no longer returned.
+        """
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Handles may be collected in any thread, even while the lock is held;
+        # their releases are queued and applied by the next store operation
+        self._released = deque()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def put(self, key, facilities, errors=()):
+        """
+        Store the result of a search and take a reference to it.
+
+        A fresh entry already stored under `key` is reused and the new frame
+        dropped, so identical searches share one copy.
+
+        Args:
+            key (hashable): Identifies the search, e.g. its parameters and provider checksum.
+            facilities (pd.DataFrame): Facilities of the search.
+            errors (list): Error messages of the search.
+
+        Returns:
+            ResultHandle: Reference for the caller to keep.
+        """
+        with self._lock:
+            self._apply_releases()
+            entry = self._entries.get(key)
+            if entry is None or self._expired(entry):
+                new_entry = _Entry(compact_facilities(facilities), errors)
+                if entry is not None:
+                    # Handles to the expired entry now see the fresh result
+                    new_entry.refs = entry.refs
+                    self.nbytes -= entry.nbytes
+                entry = self._entries[key] = new_entry
+                self.nbytes += entry.nbytes
+            entry.refs += 1
+            self._entries.move_to_end(key)
+            self._evict()
+            return ResultHandle(self, key)
+
+    def acquire(self, key):
+        """
+        Take a reference to a stored result, e.g. for a session repeating another session's search.
+
+        Returns:
+            ResultHandle: A new reference, or None if `key` is not stored or has expired.
+        """
+        with self._lock:
+            self._apply_releases()
+            entry = self._entries.get(key)
+            if entry is None or self._expired(entry):
+                count("result_store.miss")
+                return None
+            count("result_store.hit")
+            entry.refs += 1
+            self._entries.move_to_end(key)
+            return ResultHandle(self, key)
+
+    def get(self, handle):
+        """
+        Returns:
+            tuple: (facilities, errors) of the handle's result, or None once it has expired.
+        """
+        with self._lock:
+            self._apply_releases()
+            entry = self._entries.get(handle.key)
+            if entry is None or self._expired(entry):
+                return None
+            self._entries.move_to_end(handle.key)
+            return entry.facilities, entry.errors
+
+    def stats(self):
+        """
+        Returns:
+            dict: Entry count, referenced entries, references and bytes held.
+        """
+        with self._lock:
+            self._apply_releases()
+            return {
+                "entries": len(self._entries),
+                "referenced": sum(entry.refs > 0 for entry in self._entries.values()),
+                "references": sum(entry.refs for entry in self._entries.values()),
+                "bytes": self.nbytes,
+            }
+
+    def _expired(self, entry):
+        return time.monotonic() - entry.created >= self.ttl_s
+
+    def _schedule_release(self, key):
+        self._released.append(key)
+
+    def _apply_releases(self):
+        released = False
+        while self._released:
+            entry = self._entries.get(self._released.popleft())
+            if entry is not None and entry.refs > 0:
+                entry.refs -= 1
+                released = True
+        if released:
+            self._evict()
+
+    def _evict(self):
+        # Drop expired entries nobody holds, then the least recently used ones until within budget
+        for key in [key for key, entry in self._entries.items() if entry.refs == 0 and self._expired(entry)]:
+            self.nbytes -= self._entries.pop(key).nbytes
+        if self.nbytes <= self.max_bytes:
+            return
+        for key in [key for key, entry in self._entries.items() if entry.refs == 0]:
+            self.nbytes -= self._entries.pop(key).nbytes
+            count("result_store.evict")
+            if self.nbytes <= self.max_bytes:
+                return
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_result_store():
+    """Return the process-wide result store shared by every session."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ResultStore()
+        return _store
@@ -0,0 +1,333 @@
+"""
+Headless search API: the app's search engine behind a local JSON/Arrow HTTP endpoint.
+
+Endpoints:
+    GET  /health   Liveness and the checksum of the loaded provider dataset.
+    POST /search   One query object, or {"queries": [...]} for a batch.
+
+A query takes the arguments of SearchPipeline.search: location (or latitude
+and longitude), radius, care_type, issue, open_only, medicaid_only,
+wheelchair_only, sort_by and limit. Responses are JSON, or an Arrow IPC
+stream of the facilities when the request sends
+"Accept: application/vnd.apache.arrow.stream". In a batch, each query
+succeeds or fails on its own.
+
+The app is a plain ASGI callable, so any ASGI server can host it; every
+worker process builds its own pipeline, while the Places, geocoding and
+classification caches on disk are shared. API keys come from the
+GOOGLE_API_KEY and OPENAI_API_KEY environment variables.
+
+Example:
+    python search_api.py --workers 4 --port 8000
+    curl -s localhost:8000/search -d '{"location": "Davis, CA", "care_type": "Pharmacy"}'
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+from openai import Client
+
+from facilities import empty_facilities
+from search_pipeline import build_search_pipeline
+from tracing import TRACER, configure_exporters, count
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+GOOGLE_API_KEY_ENV = "GOOGLE_API_KEY"
+OPENAI_API_KEY_ENV = "OPENAI_API_KEY"
+
+JSON_CONTENT_TYPE = "application/json"
+ARROW_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+
+QUERY_FIELDS = frozenset([
+    "location", "latitude", "longitude", "radius", "care_type", "issue",
+    "open_only", "medicaid_only", "wheelchair_only", "sort_by", "limit",
+])
+TEXT_FIELDS = ("location", "care_type", "issue", "sort_by")
+NUMBER_FIELDS = ("latitude", "longitude", "radius")
+BOOLEAN_FIELDS = ("open_only", "medicaid_only", "wheelchair_only")
+BOOLEAN_STRINGS = {"true": True, "1": True, "yes": True, "false": False, "0": False, "no": False}
+MAX_BATCH_QUERIES = 100
+MAX_BODY_BYTES = 1 << 20
+SEARCH_THREADS = 16  # Searches run at once per worker; each also fans out over its place types
+
+
+class ApiError(Exception):
+    """A request error returned to the client with an HTTP status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def facility_records(facilities):
+    """Facilities as JSON-serializable records, with missing values as None."""
+    return facilities.astype(object).where(facilities.notna(), None).to_dict("records")
+
+
+def parse_query(query):
+    """
+    Check the fields of a JSON query and coerce them to the types SearchPipeline.search takes.
+
+    Booleans may also be sent as "true"/"false" (or 1/0), numbers as numeric
+    strings; null leaves a field at its default.
+
+    Returns:
+        dict: Keyword arguments for SearchPipeline.search.
+
+    Raises:
+        TypeError: The query is not an object, has unknown fields or a field of the wrong type.
+        ValueError: A number is not finite or not a valid limit.
+    """
+    if not isinstance(query, dict):
+        raise TypeError("A query must be a JSON object")
+    unknown = set(query) - QUERY_FIELDS
+    if unknown:
+        raise TypeError(f"Unknown query fields: {', '.join(sorted(unknown))}")
+
+    parsed = {}
+    for field, value in query.items():
+        if value is None:
+            continue
+        if field in TEXT_FIELDS:
+            if not isinstance(value, str):
+                raise TypeError(f"{field} must be a string")
+        elif field in BOOLEAN_FIELDS:
+            value = _parse_boolean(field, value)
+        elif field in NUMBER_FIELDS:
+            value = _parse_number(field, value)
+        elif field == "limit":
+            value = _parse_number(field, value)
+            if not value.is_integer():
+                raise ValueError("limit must be an integer")
+            value = int(value)
+        parsed[field] = value
+    return parsed
+
+
+def _parse_boolean(field, value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in BOOLEAN_STRINGS:
+        return BOOLEAN_STRINGS[value.strip().lower()]
+    raise TypeError(f"{field} must be true or false")
+
+
+def _parse_number(field, value):
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise TypeError(f"{field} must be a number")
+    try:
+        number = float(value)
+    except ValueError:
+        raise TypeError(f"{field} must be a number")
+    if not math.isfinite(number):
+        raise ValueError(f"{field} must be finite")
+    return number
+
+
+def arrow_stream(facilities, metadata):
+    """
+    Serialize facilities as an Arrow IPC stream.
+
+    Args:
+        facilities (pd.DataFrame): Rows to send.
+        metadata (dict): JSON-serializable description stored in the schema metadata.
+
+    Returns:
+        bytes: The IPC stream.
+    """
+    table = pa.Table.from_pandas(facilities, preserve_index=False)
+    table = table.replace_schema_metadata({"search": json.dumps(metadata)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def pipeline_from_environment():
+    """Build the search pipeline with the API keys from the environment."""
+    google_api_key = os.environ.get(GOOGLE_API_KEY_ENV)
+    if not google_api_key:
+        raise RuntimeError(f"Set {GOOGLE_API_KEY_ENV} to run the search API")
+    openai_api_key = os.environ.get(OPENAI_API_KEY_ENV)
+    return build_search_pipeline(
+        google_api_key, openai_client=Client(api_key=openai_api_key) if openai_api_key else None
+    )
+
+
+class SearchApi:
+    """
+    ASGI application answering searches with one SearchPipeline per process.
+
+    Searches are blocking, so they run on a thread pool; the event loop only
+    parses requests and writes responses.
+    """
+
+    def __init__(self, pipeline=None, threads=SEARCH_THREADS):
+        """
+        Args:
+            pipeline (SearchPipeline): Engine to query; built from the environment on first use if None.
+            threads (int): Searches run concurrently.
+        """
+        self._pipeline = pipeline
+        self._pipeline_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=threads)
+
+    @property
+    def pipeline(self):
+        with self._pipeline_lock:
+            if self._pipeline is None:
+                self._pipeline = pipeline_from_environment()
+            return self._pipeline
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        try:
+            status, content_type, body = await self._route(scope, receive)
+        except ApiError as e:
+            status, content_type, body = e.status, JSON_CONTENT_TYPE, json.dumps({"error": e.message}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                configure_exporters()
+                try:
+                    # Load the providers and gazetteer before taking traffic
+                    await asyncio.get_running_loop().run_in_executor(self._executor, lambda: self.pipeline)
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                TRACER.flush()
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _route(self, scope, receive):
+        path, method = scope["path"], scope["method"]
+        if path == "/health":
+            if method != "GET":
+                raise ApiError(405, "Use GET")
+            body = {"status": "ok", "providers": self.pipeline.providers.checksum}
+            return 200, JSON_CONTENT_TYPE, json.dumps(body).encode()
+        if path != "/search":
+            raise ApiError(404, f"Not found: {path}")
+        if method != "POST":
+            raise ApiError(405, "Use POST")
+
+        try:
+            request = json.loads(await _read_body(receive))
+        except ValueError:
+            raise ApiError(400, "Request body must be JSON")
+        headers = dict(scope.get("headers", []))
+        arrow = ARROW_CONTENT_TYPE in headers.get(b"accept", b"").decode("latin-1")
+
+        if isinstance(request, dict) and "queries" in request:
+            queries = request["queries"]
+            if not isinstance(queries, list) or not queries:
+                raise ApiError(400, "queries must be a non-empty list")
+            if len(queries) > MAX_BATCH_QUERIES:
+                raise ApiError(413, f"At most {MAX_BATCH_QUERIES} queries per batch")
+            outcomes = await asyncio.gather(*(self._run(query) for query in queries), return_exceptions=True)
+            return self._batch_response(outcomes, arrow)
+
+        try:
+            result = await self._run(request)
+        except (ValueError, TypeError) as e:
+            raise ApiError(400, str(e))
+        if arrow:
+            return 200, ARROW_CONTENT_TYPE, arrow_stream(result.facilities, result.summary())
+        body = {**result.summary(), "facilities": facility_records(result.facilities)}
+        return 200, JSON_CONTENT_TYPE, json.dumps(body).encode()
+
+    async def _run(self, query):
+        query = parse_query(query)
+        count("api.search")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, lambda: self.pipeline.search(**query))
+
+    def _batch_response(self, outcomes, arrow):
+        # A failed query becomes an error entry, so the rest of the batch is still answered
+        summaries = []
+        frames = []
+        for i, outcome in enumerate(outcomes):
+            if isinstance(outcome, (ValueError, TypeError)):
+                summaries.append({"error": str(outcome), "status": 400})
+            elif isinstance(outcome, BaseException):
+                print(f"Error in batch query {i}: {outcome!r}")
+                summaries.append({"error": f"Search failed: {outcome}", "status": 500})
+            else:
+                summaries.append(outcome.summary())
+                frames.append(outcome.facilities.assign(query=i))
+
+        if arrow:
+            # One table for the whole batch; the query column points back into "results"
+            if frames:
+                facilities = pd.concat(frames, ignore_index=True)
+            else:
+                facilities = empty_facilities().assign(query=pd.Series(dtype="int64"))
+            return 200, ARROW_CONTENT_TYPE, arrow_stream(facilities, {"results": summaries})
+
+        results = []
+        facilities = iter(frames)
+        for summary in summaries:
+            if "error" in summary:
+                results.append(summary)
+            else:
+                results.append({**summary, "facilities": facility_records(next(facilities).drop(columns="query"))})
+        return 200, JSON_CONTENT_TYPE, json.dumps({"results": results}).encode()
+
+
+async def _read_body(receive):
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise ApiError(413, f"Request body larger than {MAX_BODY_BYTES} bytes")
+        chunks.append(chunk)
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+app = SearchApi()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the facility search as a JSON/Arrow HTTP API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes")
+    args = parser.parse_args()
+
+    # Only needed to serve the API, not by the app
+    import uvicorn
+
+    uvicorn.run("search_api:app", host=args.host, port=args.port, workers=args.workers, app_dir=BASE_DIR)
+
+
+if __name__ == "__main__":
+    main()
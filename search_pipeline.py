@@ -0,0 +1,407 @@
+import os
+from contextlib import closing
+
+from classifier import CLASSIFICATION_CACHE_PATH, IssueClassifier, openai_completion
+from facilities import normalize_places_results
+from facility_catalog import FACILITY_CATALOG_PATH, FacilityCatalog, TilePrefetcher
+from geocoding import GEOCODE_CACHE_PATH, LocationResolver, geocode_google, load_gazetteer
+from places import OPEN_NOW_TTL_S, PLACES_CACHE_PATH, PLACES_TTL_S, fetch_places, stream_places
+from provider_matching import MATCH_RADIUS_M
+from provider_partitions import get_providers
+from ranking import RANK_BY_DISTANCE, RANK_BY_RATING, RANK_BY_SCORE, add_distance, filter_radius, rank_facilities
+from tracing import span
+from ttl_cache import TTLCache
+
+CARE_TYPES = {
+    "All Healthcare": ["hospital", "pharmacy", "doctor", "dentist", "veterinary_care", "physiotherapist"],
+    "Pharmacy": "pharmacy",
+    "Hospital": "hospital",
+    "Doctor": "doctor",
+    "Dentist": "dentist",
+    "Veterinary": "veterinary_care",
+    "Physiotherapist": "physiotherapist",
+}
+DEFAULT_PLACE_TYPE = "hospital"  # Searched when neither a care type nor an issue is given
+UNCLASSIFIED_CARE_TYPE = "All Healthcare"  # Searched when an issue cannot be classified
+RANKINGS = (RANK_BY_SCORE, RANK_BY_RATING, RANK_BY_DISTANCE)
+DEFAULT_RADIUS_M = 20000
+MAX_RADIUS_M = 50000  # Largest radius Places nearby search accepts
+DEFAULT_LIMIT = 100
+
+
+def place_types_for(care_type):
+    """
+    Places types to query for a care type label ("Pharmacy") or a Places type ("pharmacy").
+
+    Raises:
+        ValueError: The care type is unknown.
+    """
+    if not care_type:
+        return [DEFAULT_PLACE_TYPE]
+    if care_type in CARE_TYPES:
+        place_types = CARE_TYPES[care_type]
+        return place_types if isinstance(place_types, list) else [place_types]
+    if care_type in CARE_TYPES[UNCLASSIFIED_CARE_TYPE]:
+        return [care_type]
+    raise ValueError(f"Unknown care type: {care_type}")
+
+
+class SearchResult:
+    """
+    Outcome of one end-to-end search.
+
+    Attributes:
+        facilities (pd.DataFrame): Ranked facilities with distances and Medicaid flags.
+        errors (list): Messages of the Places requests that failed.
+        latitude (float): Resolved search center latitude.
+        longitude (float): Resolved search center longitude.
+        radius (float): Search radius in meters.
+        care_type (str): Care type searched, as given or inferred from the issue.
+        place_types (list): Places types queried.
+    """
+
+    def __init__(self, facilities, errors, latitude, longitude, radius, care_type, place_types):
+        self.facilities = facilities
+        self.errors = errors
+        self.latitude = latitude
+        self.longitude = longitude
+        self.radius = radius
+        self.care_type = care_type
+        self.place_types = place_types
+
+    def summary(self):
+        """Everything but the facilities, as a JSON-serializable dict."""
+        return {
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "radius": self.radius,
+            "care_type": self.care_type,
+            "place_types": self.place_types,
+            "count": len(self.facilities),
+            "errors": self.errors,
+        }
+
+
+class SearchPipeline:
+    """
+    The facility search split into independent stages.
+
+    Each stage is a plain method of its own inputs, so callers can memoize
+    them separately: resolve location -> classify issue -> fetch places ->
+    Medicaid match. Display filters and rendering work on the fetched frame
+    and never touch the network.
+    """
+
+    def __init__(self, api_key, providers, places_cache=None, location_resolver=None, classify=None, catalog=None,
+                 prefetcher=None):
+        """
+        Args:
+            api_key (str): Google API key for Places requests.
+            providers: Medicaid provider store with `region(latitude, longitude, radius_m)`,
+                e.g. a ProviderStore or a PartitionedProviderStore.
+            places_cache (TTLCache): Optional cache of Places results.
+            location_resolver (LocationResolver): Resolver for free-text locations.
+            classify (callable): Maps an issue description to a care type label.
+            catalog (FacilityCatalog): Optional local catalog; searches it fully
+                covers are answered without Places, and complete live searches are recorded in it.
+            prefetcher (TilePrefetcher): Optional background filler of the
+                catalog tiles around each search.
+        """
+        self.api_key = api_key
+        self.providers = providers
+        self.places_cache = places_cache
+        self.location_resolver = location_resolver
+        self.classify = classify
+        self.catalog = catalog
+        self.prefetcher = prefetcher
+
+    def resolve_location(self, query):
+        """
+        Returns:
+            tuple: (latitude, longitude), or (None, None) if the query is not found.
+        """
+        if self.location_resolver is None:
+            return None, None
+        lat, lon, _ = self.location_resolver.resolve(query)
+        return lat, lon
+
+    def classify_issue(self, description):
+        """Return the care type label for an issue description, or None."""
+        if self.classify is None or not description:
+            return None
+        return self.classify(description)
+
+    def fetch_places(self, latitude, longitude, radius, place_types, open_only=False):
+        """
+        Fetch raw Places results for every place type.
+
+        Searches the catalog fully covers are answered from it, without the
+        Places result cap; otherwise Places is queried.
+
+        Returns:
+            tuple: (results, errors) with the merged raw results and any error messages.
+        """
+        results = self.catalog_results(latitude, longitude, radius, place_types, open_only)
+        if results is not None:
+            self.prefetch(latitude, longitude, radius, place_types)
+            return results, []
+
+        results = []
+        errors = []
+        with span("places.fetch", place_types=len(place_types)):
+            # Place types are fetched concurrently; merge each one as soon as it completes
+            for _, type_results, error in fetch_places(
+                latitude, longitude, radius, place_types, self.api_key, open_only=open_only, cache=self.places_cache,
+                on_fetched=self.record_places,
+            ):
+                if error:
+                    errors.append(error)
+                results.extend(type_results)
+        self.prefetch(latitude, longitude, radius, place_types)
+        return results, errors
+
+    def catalog_results(self, latitude, longitude, radius, place_types, open_only=False):
+        """
+        Raw Places results from the catalog, if it holds every tile of the search and they are fresh.
+
+        Returns:
+            list: The results, or None when the search has to go to Places.
+        """
+        if self.catalog is None:
+            return None
+        # "Open now" needs results as recent as the Places cache would accept
+        max_age_s = OPEN_NOW_TTL_S if open_only else PLACES_TTL_S
+        return self.catalog.lookup(latitude, longitude, radius, place_types, max_age_s=max_age_s)
+
+    def record_places(self, latitude, longitude, radius, place_type, results):
+        """
+        Record one place type's complete results of a live search in the catalog.
+
+        Only results that just arrived from Places are recorded, never cached
+        ones, as the catalog dates every tile from the moment it is stored.
+        """
+        if self.catalog is not None:
+            self.catalog.store_search(latitude, longitude, radius, place_type, results)
+
+    def prefetch(self, latitude, longitude, radius, place_types):
+        """Fill the missing and stale catalog tiles next to the search in the background."""
+        if self.prefetcher is not None:
+            self.prefetcher.schedule(latitude, longitude, radius, place_types)
+
+    def match_medicaid(self, facilities, latitude, longitude, radius):
+        """
+        Mark facilities that match a Medicaid provider on location, address and name.
+
+        Only providers in the region around the search circle are loaded.
+        Adds `medicaid_confidence`, the best match confidence of each facility;
+        only facilities in a valid category can be Medicaid-supported.
+        """
+        if facilities.empty:
+            return facilities.assign(medicaid_confidence=0.0)
+        providers = self.providers.region(latitude, longitude, radius + MATCH_RADIUS_M)
+        with span("medicaid.match", facilities=len(facilities)):
+            result = providers.matcher.match(
+                facilities["latitude"].to_numpy(),
+                facilities["longitude"].to_numpy(),
+                facilities["address"].tolist(),
+                facilities["name"].tolist(),
+            )
+        return facilities.assign(
+            medicaid_supported=facilities["medicaid_supported"].to_numpy() & result.matched,
+            medicaid_confidence=result.confidence,
+        )
+
+    def assemble_facilities(self, results, latitude, longitude, radius, open_only=False):
+        """
+        Turn raw Places results into facilities inside the radius, with distances and Medicaid flags.
+        """
+        with span("facilities.assemble", results=len(results)):
+            facilities = normalize_places_results(results, open_only=open_only)
+
+            # Places treats the radius as a bias; enforce the exact radius using true distances
+            facilities = filter_radius(add_distance(facilities, latitude, longitude), radius)
+        return self.match_medicaid(facilities, latitude, longitude, radius)
+
+    def fetch_facilities(self, latitude, longitude, radius, place_types, open_only=False):
+        """
+        Run the fetch and match stages for one search.
+
+        Args:
+            latitude (float): Search center latitude.
+            longitude (float): Search center longitude.
+            radius (float): Search radius in meters.
+            place_types (list or str): Google Places type(s) to query.
+            open_only (bool): Keep only facilities that are open now.
+
+        Returns:
+            tuple: (facilities, errors) where `facilities` holds every facility
+            inside the radius with Medicaid flags and distances.
+        """
+        if not isinstance(place_types, list):
+            place_types = [place_types]
+
+        results, errors = self.fetch_places(latitude, longitude, radius, place_types, open_only)
+        return self.assemble_facilities(results, latitude, longitude, radius, open_only), errors
+
+    def stream_facilities(self, latitude, longitude, radius, place_types, open_only=False):
+        """
+        Run the fetch and match stages for one search, one Places page at a time.
+
+        The first batch is ready after a single Places round trip, however many
+        pages and types are still pending. Closing the generator cancels the
+        requests that have not been sent yet. A search the catalog fully
+        covers is a single batch. Takes the same arguments as `fetch_facilities`.
+
+        Yields:
+            tuple: (facilities, error) per page: that page's facilities, assembled
+            as in `fetch_facilities`, and an error message or None.
+        """
+        if not isinstance(place_types, list):
+            place_types = [place_types]
+
+        results = self.catalog_results(latitude, longitude, radius, place_types, open_only)
+        if results is not None:
+            # The consumer may stop after the only batch, so schedule the prefetch first
+            self.prefetch(latitude, longitude, radius, place_types)
+            yield self.assemble_facilities(results, latitude, longitude, radius, open_only), None
+            return
+
+        pages = stream_places(
+            latitude, longitude, radius, place_types, self.api_key, open_only=open_only, cache=self.places_cache,
+            on_fetched=self.record_places,
+        )
+        with closing(pages):
+            for _, results, error, _ in pages:
+                if results or error:
+                    yield self.assemble_facilities(results, latitude, longitude, radius, open_only), error
+        self.prefetch(latitude, longitude, radius, place_types)
+
+    def search(self, location=None, latitude=None, longitude=None, radius=DEFAULT_RADIUS_M, care_type=None,
+               issue=None, open_only=False, medicaid_only=False, wheelchair_only=False, sort_by=RANK_BY_SCORE,
+               limit=DEFAULT_LIMIT):
+        """
+        Run one search end to end: resolve location -> classify issue -> fetch
+        places -> Medicaid match -> display filters -> rank.
+
+        Args:
+            location (str): Free-text location; takes precedence over coordinates.
+            latitude (float): Search center latitude, when no location is given.
+            longitude (float): Search center longitude, when no location is given.
+            radius (float): Search radius in meters, at most MAX_RADIUS_M.
+            care_type (str): Care type label or Places type; inferred from `issue` if empty.
+            issue (str): Description of the health issue.
+            open_only (bool): Keep only facilities that are open now.
+            medicaid_only (bool): Keep only Medicaid-supported facilities.
+            wheelchair_only (bool): Keep only facilities with a wheelchair accessible entrance.
+            sort_by (str): One of RANKINGS.
+            limit (int): Maximum number of facilities returned, or None for all.
+
+        Returns:
+            SearchResult: The ranked facilities and how the query was interpreted.
+
+        Raises:
+            ValueError: The query is invalid or its location cannot be found.
+        """
+        radius = float(radius)
+        if not 0 < radius <= MAX_RADIUS_M:
+            raise ValueError(f"radius must be positive and at most {MAX_RADIUS_M} m")
+        if sort_by not in RANKINGS:
+            raise ValueError(f"sort_by must be one of {', '.join(RANKINGS)}")
+        if limit is not None and int(limit) < 1:
+            raise ValueError("limit must be at least 1")
+
+        if location:
+            latitude, longitude = self.resolve_location(location)
+            if latitude is None:
+                raise ValueError(f"Location not found: {location}")
+        elif latitude is None or longitude is None:
+            raise ValueError("Either a location or latitude and longitude are required")
+        latitude, longitude = float(latitude), float(longitude)
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValueError("latitude or longitude out of range")
+
+        if not care_type and issue:
+            care_type = self.classify_issue(issue)
+            if care_type not in CARE_TYPES:
+                care_type = UNCLASSIFIED_CARE_TYPE
+        place_types = place_types_for(care_type)
+
+        with span("search", place_types=len(place_types)):
+            facilities, errors = self.fetch_facilities(latitude, longitude, radius, place_types, open_only)
+            facilities = apply_display_filters(facilities, medicaid_only=medicaid_only, wheelchair_only=wheelchair_only)
+            facilities = rank_facilities(
+                facilities, by=sort_by, k=None if limit is None else int(limit), radius_m=radius
+            )
+        return SearchResult(facilities, errors, latitude, longitude, radius, care_type or DEFAULT_PLACE_TYPE, place_types)
+
+
+def _cache_path(default_path, cache_dir):
+    return default_path if cache_dir is None else os.path.join(cache_dir, os.path.basename(default_path))
+
+
+def build_issue_classifier(openai_client=None, cache_dir=None):
+    """
+    Issue classifier over CARE_TYPES with the persistent classification cache.
+
+    Args:
+        openai_client (openai.Client): Client for the remote model; keyword-only without one.
+        cache_dir (str): Directory of the cache; the app's cache directory if None.
+    """
+    return IssueClassifier(
+        list(CARE_TYPES.keys()),
+        cache=TTLCache(_cache_path(CLASSIFICATION_CACHE_PATH, cache_dir)),
+        complete=openai_completion(openai_client) if openai_client is not None else None,
+    )
+
+
+def build_search_pipeline(google_api_key, providers=None, classify=None, openai_client=None, cache_dir=None,
+                          prefetch=True):
+    """
+    Search pipeline with the persistent Places and geocoding caches and the
+    facility catalog, as used by the app and the API.
+
+    Args:
+        google_api_key (str): Google API key for Places and geocoding requests.
+        providers: Medicaid provider store; the partitioned or bundled one if None.
+        classify (callable): Maps an issue description to a care type label;
+            defaults to an issue classifier using `openai_client`.
+        openai_client (openai.Client): Client for the remote issue classifier.
+        cache_dir (str): Directory of the Places, geocoding and classification
+            caches and the facility catalog; the app's cache directory if None.
+        prefetch (bool): Fill the catalog around each search in the background.
+    """
+    providers = get_providers() if providers is None else providers
+    if classify is None:
+        classify = build_issue_classifier(openai_client, cache_dir).classify
+    catalog = FacilityCatalog(_cache_path(FACILITY_CATALOG_PATH, cache_dir))
+    return SearchPipeline(
+        api_key=google_api_key,
+        providers=providers,
+        places_cache=TTLCache(_cache_path(PLACES_CACHE_PATH, cache_dir)),
+        location_resolver=LocationResolver(
+            gazetteer=load_gazetteer(providers),
+            cache=TTLCache(_cache_path(GEOCODE_CACHE_PATH, cache_dir)),
+            geocode=lambda query: geocode_google(query, google_api_key),
+        ),
+        classify=classify,
+        catalog=catalog,
+        prefetcher=TilePrefetcher(catalog, google_api_key) if prefetch else None,
+    )
+
+
+def apply_display_filters(facilities, medicaid_only=False, wheelchair_only=False):
+    """
+    Apply the display-only filters to fetched facilities.
+
+    Returns:
+        pd.DataFrame: The facilities that pass every enabled filter.
+    """
+    keep = None
+    if medicaid_only and "medicaid_supported" in facilities:
+        keep = facilities["medicaid_supported"].to_numpy(dtype=bool)
+    if wheelchair_only and "wheelchair_accessible_entrance" in facilities:
+        wheelchair = facilities["wheelchair_accessible_entrance"].to_numpy(dtype=bool)
+        keep = wheelchair if keep is None else keep & wheelchair
+    if keep is None:
+        return facilities
+    return facilities[keep].reset_index(drop=True)
@@ -0,0 +1,63 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classifier import ERROR_LABEL, IssueClassifier, KeywordClassifier  # noqa: E402
+from ttl_cache import TTLCache  # noqa: E402
+
+CATEGORIES = ["Pharmacy", "Hospital", "Doctor", "Dentist", "Veterinary", "Physiotherapist"]
+
+
+class StubCompletion:
+    """Remote model stand-in that answers every request with the same label."""
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.prompts = []
+
+    def __call__(self, model, messages, max_tokens, timeout):
+        self.prompts.append(messages[-1]["content"])
+        return self.answer
+
+
+def make_classifier(answer="Hospital", cache=None):
+    complete = StubCompletion(answer)
+    return IssueClassifier(CATEGORIES, cache=cache, complete=complete, fallback_model=None), complete
+
+
+def test_single_keyword_goes_to_remote_model():
+    for description in ["I got shot in the leg", "I was bitten by a dog",
+                        "my cat scratched me and the wound is infected"]:
+        classifier, complete = make_classifier("Hospital")
+        assert classifier.classify(description) == "Hospital", description
+        assert len(complete.prompts) == 1
+
+
+def test_several_keywords_answer_locally():
+    classifier, complete = make_classifier("Hospital")
+    assert classifier.classify("I need a refill of my prescription medication") == "Pharmacy"
+    assert classifier.classify("my tooth hurts and my gums are bleeding") == "Dentist"
+    assert complete.prompts == []
+
+
+def test_keyword_classifier_requires_several_hits():
+    keywords = KeywordClassifier()
+    assert keywords.classify("i was bitten by a dog") is None
+    assert keywords.classify("i need a refill of my prescription") == "Pharmacy"
+
+
+def test_only_remote_answers_are_cached():
+    cache = TTLCache(":memory:")
+    classifier, complete = make_classifier("Hospital", cache)
+    classifier.classify_batch(["I got shot in the leg", "I need a refill of my prescription medication"])
+    assert len(cache) == 1
+
+    classifier.classify("I got shot in the leg")
+    assert len(complete.prompts) == 1
+
+
+def test_offline_falls_back_to_best_keyword_guess():
+    classifier = IssueClassifier(CATEGORIES)
+    assert classifier.classify("I was bitten by a dog") == "Veterinary"
+    assert classifier.classify("something vague") == ERROR_LABEL
@@ -0,0 +1,56 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geocoding import Gazetteer, LocationResolver  # noqa: E402
+from ttl_cache import TTLCache  # noqa: E402
+
+SACRAMENTO = (38.5816, -121.4944)
+# Two providers near the edge of town: their mean is kilometers off the city center
+PROVIDERS = pd.DataFrame({
+    "ZIP": ["95825", "95825"],
+    "Address": ["1 Howe Ave, Sacramento, CA 95825", "2 Howe Ave, Sacramento, CA 95825"],
+    "latitude": [38.585, 38.595],
+    "longitude": [-121.41, -121.42],
+})
+
+
+class StubGeocoder:
+    def __init__(self, location):
+        self.location = location
+        self.queries = []
+
+    def __call__(self, query):
+        self.queries.append(query)
+        return self.location
+
+
+def test_remote_geocoder_beats_provider_centroids():
+    geocode = StubGeocoder(SACRAMENTO)
+    resolver = LocationResolver(Gazetteer.from_providers(PROVIDERS), cache=TTLCache(":memory:"), geocode=geocode)
+    assert resolver.resolve("Sacramento, CA") == (*SACRAMENTO, "remote")
+    assert resolver.resolve("sacramento ca") == (*SACRAMENTO, "cache")
+    assert geocode.queries == ["Sacramento, CA"]
+
+
+def test_provider_centroids_back_up_a_failed_remote_call():
+    cache = TTLCache(":memory:")
+    resolver = LocationResolver(Gazetteer.from_providers(PROVIDERS), cache=cache, geocode=StubGeocoder(None))
+    latitude, longitude, source = resolver.resolve("95825")
+    assert (round(latitude, 3), round(longitude, 3), source) == (38.59, -121.415, "gazetteer")
+    assert len(cache) == 0
+
+
+def test_exact_entries_skip_the_remote_geocoder():
+    geocode = StubGeocoder(SACRAMENTO)
+    assert LocationResolver(Gazetteer.from_providers(PROVIDERS), geocode=geocode).resolve("Davis, CA")[2] == "gazetteer"
+    assert LocationResolver(Gazetteer({"95825": SACRAMENTO}), geocode=geocode).resolve("95825")[2] == "gazetteer"
+    assert geocode.queries == []
+
+
+def test_offline_resolver_uses_provider_centroids():
+    resolver = LocationResolver(Gazetteer.from_providers(PROVIDERS))
+    assert resolver.resolve("Sacramento, CA")[2] == "gazetteer"
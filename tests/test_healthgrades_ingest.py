@@ -0,0 +1,96 @@
+import csv
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from healthgrades_ingest import Checkpoint, CsvProviderWriter, HttpFetcher, run_ingest  # noqa: E402
+from http_client import HostLimiter, HttpClient  # noqa: E402
+
+FIXTURE_DIR = os.path.join(ROOT, "benchmarks", "fixtures")
+# Recorded search pages; any other ZIP gets a 404
+FIXTURE_ZIPS = ["90003", "95616"]
+
+
+@pytest.fixture(scope="module")
+def server():
+    pages = {}
+    for zip_code in FIXTURE_ZIPS:
+        with open(os.path.join(FIXTURE_DIR, f"healthgrades_{zip_code}.html"), encoding="utf-8") as f:
+            pages[zip_code] = f.read().encode()
+    requested = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            zip_code = parse_qs(urlsplit(self.path).query).get("where", [""])[0]
+            requested.append(zip_code)
+            body = pages.get(zip_code)
+            self.send_response(200 if body else 404)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body or b"")))
+            self.end_headers()
+            self.wfile.write(body or b"")
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    host, port = httpd.server_address
+    yield f"http://{host}:{port}/usearch?what=medicaid&where={{zip_code}}", requested
+    httpd.shutdown()
+
+
+def ingest(server, tmp_path, zip_codes):
+    search_url, _ = server
+    return run_ingest(
+        zip_codes,
+        CsvProviderWriter(str(tmp_path / "providers.csv")),
+        Checkpoint(str(tmp_path / "providers.done")),
+        lambda: HttpFetcher(client=HttpClient(max_retries=0)),
+        workers=2,
+        limiter=HostLimiter(min_interval_s=0),
+        search_url=search_url,
+    )
+
+
+def read_providers(tmp_path):
+    with open(tmp_path / "providers.csv", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def test_ingest_parses_fixture_pages(server, tmp_path):
+    stats = ingest(server, tmp_path, FIXTURE_ZIPS)
+    assert stats == {"scraped": 2, "skipped": 0, "failed": 0, "providers": 51}
+
+    providers = read_providers(tmp_path)
+    assert len(providers) == 51
+    assert {
+        "ZIP": "90003", "Name": "Dr. Alex Smith, PT", "Specialty": "Physical Therapy",
+        "Address": "2902 Anderson Rd Ste 326, Los Angeles, CA 90003",
+    } in providers
+    assert all(provider["Address"].endswith(provider["ZIP"]) for provider in providers)
+
+
+def test_resume_skips_completed_zips(server, tmp_path):
+    _, requested = server
+    ingest(server, tmp_path, ["90003"])
+    del requested[:]
+
+    stats = ingest(server, tmp_path, FIXTURE_ZIPS)
+    assert stats["skipped"] == 1 and stats["scraped"] == 1
+    assert requested == ["95616"]
+    assert len(read_providers(tmp_path)) == 51
+
+
+def test_missing_page_counts_as_failed(server, tmp_path):
+    stats = ingest(server, tmp_path, ["95616", "00000"])
+    assert stats["scraped"] == 1 and stats["failed"] == 1
+    # A failed ZIP is not checkpointed, so the next run retries it
+    assert Checkpoint(str(tmp_path / "providers.done")).completed == {"95616"}
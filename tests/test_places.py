@@ -0,0 +1,74 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import places  # noqa: E402
+from geo import haversine_m  # noqa: E402
+from places import PLACES_MAX_RESULTS, fetch_places  # noqa: E402
+from stub_api import StubApi  # noqa: E402
+from ttl_cache import TTLCache  # noqa: E402
+
+DAVIS = (38.5449, -121.7405)
+
+
+def stub_api(monkeypatch, results_per_search):
+    stub = StubApi(results_per_search=results_per_search, spread_m=3000.0).start()
+    monkeypatch.setattr(places, "PLACES_NEARBY_URL", stub.places_url)
+    monkeypatch.setattr(places, "PAGE_TOKEN_FIRST_POLL_S", 0)
+    return stub
+
+
+def search(cache, latitude, longitude, radius):
+    [(_, results, error)] = fetch_places(latitude, longitude, radius, ["pharmacy"], "test-key", cache=cache)
+    assert error is None
+    return results
+
+
+@pytest.fixture
+def sparse(monkeypatch):
+    stub = stub_api(monkeypatch, results_per_search=30)
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture
+def dense(monkeypatch):
+    stub = stub_api(monkeypatch, results_per_search=PLACES_MAX_RESULTS)
+    yield stub
+    stub.stop()
+
+
+def test_repeated_search_is_cached(dense):
+    cache = TTLCache(":memory:")
+    first = search(cache, *DAVIS, 5000)
+    assert search(cache, *DAVIS, 5000) == first
+    assert dense.requests["places"] == 3
+
+
+def test_complete_search_answers_circles_inside_it(sparse):
+    cache = TTLCache(":memory:")
+    search(cache, *DAVIS, 5000)
+    # 100 m away with a smaller radius: inside the cached circle
+    results = search(cache, DAVIS[0] + 0.0009, DAVIS[1], 2000)
+    assert sparse.requests["places"] == 2
+    distances = [
+        haversine_m(DAVIS[0] + 0.0009, DAVIS[1], r["geometry"]["location"]["lat"], r["geometry"]["location"]["lng"])
+        for r in results
+    ]
+    assert max(distances) <= 2000
+
+    # A larger circle is not covered, so it goes to Places
+    search(cache, DAVIS[0] + 0.0009, DAVIS[1], 6000)
+    assert sparse.requests["places"] == 4
+
+
+def test_capped_search_only_answers_itself(dense):
+    cache = TTLCache(":memory:")
+    search(cache, *DAVIS, 5000)
+    search(cache, DAVIS[0] + 0.0009, DAVIS[1], 2000)
+    assert dense.requests["places"] == 6
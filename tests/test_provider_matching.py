@@ -0,0 +1,63 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from provider_index import ProviderIndex  # noqa: E402
+from provider_matching import ProviderMatcher  # noqa: E402
+
+BUILDING = (33.9883999, -118.273401)
+# Rows as they appear in the provider table: individual clinicians at their practice address
+CLINICIANS = [
+    ("Dr. Zaw Lwin, MD", "5850 S Main St, Los Angeles, CA 90003", *BUILDING),
+    ("Dr. Daniel Raine, MD", "5850 S Main St, Los Angeles, CA 90003", *BUILDING),
+]
+
+
+def make_matcher(rows):
+    providers = pd.DataFrame(rows, columns=["Name", "Address", "latitude", "longitude"])
+    return ProviderMatcher(providers, ProviderIndex.from_frame(providers))
+
+
+def match(matcher, facilities):
+    names, addresses, latitudes, longitudes = zip(*facilities)
+    return matcher.match(list(latitudes), list(longitudes), list(addresses), list(names))
+
+
+def test_facility_matches_clinicians_of_its_building():
+    matcher = make_matcher(CLINICIANS)
+    for name in ["South Central Family Health Center", "CVS Pharmacy", "Kaiser Permanente Medical Center"]:
+        result = match(matcher, [(name, "5850 South Main Street, Los Angeles", *BUILDING)])
+        assert result.matched[0], name
+
+
+def test_other_house_number_does_not_match():
+    matcher = make_matcher(CLINICIANS)
+    result = match(matcher, [("CVS Pharmacy", "5900 S Main St, Los Angeles", BUILDING[0] + 0.0005, BUILDING[1])])
+    assert not result.matched[0]
+
+
+def test_drifted_geocode_still_matches_on_address():
+    matcher = make_matcher(CLINICIANS)
+    # About 100 m north of the providers' geocode
+    result = match(matcher, [("Family Medical Clinic", "5850 S Main St", BUILDING[0] + 0.0009, BUILDING[1])])
+    assert result.matched[0]
+
+
+def test_name_match_claims_provider_from_other_facilities_in_building():
+    matcher = make_matcher(CLINICIANS[:1])
+    result = match(matcher, [
+        ("Zaw Lwin MD", "5850 S Main St, Los Angeles", *BUILDING),
+        ("CVS Pharmacy", "5850 S Main St, Los Angeles", *BUILDING),
+    ])
+    assert result.matched[0]
+    assert not result.matched[1]
+
+
+def test_name_picks_best_provider_at_shared_address():
+    matcher = make_matcher(CLINICIANS)
+    result = match(matcher, [("Daniel Raine MD", "5850 S Main St, Los Angeles", *BUILDING)])
+    assert result.matched[0]
+    assert result.best[0] == 1
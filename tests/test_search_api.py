@@ -0,0 +1,128 @@
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import geocoding  # noqa: E402
+import places  # noqa: E402
+from geocoding import Gazetteer, LocationResolver, geocode_google  # noqa: E402
+from provider_store import get_provider_store  # noqa: E402
+from search_api import SearchApi  # noqa: E402
+from search_pipeline import SearchPipeline  # noqa: E402
+from stub_api import StubApi  # noqa: E402
+
+DAVIS = {"latitude": 38.5449, "longitude": -121.7405}
+
+
+@pytest.fixture(scope="module")
+def stub():
+    with StubApi() as stub:
+        yield stub
+
+
+@pytest.fixture
+def api(stub, monkeypatch):
+    monkeypatch.setattr(places, "PLACES_NEARBY_URL", stub.places_url)
+    monkeypatch.setattr(places, "PAGE_TOKEN_FIRST_POLL_S", 0)
+    monkeypatch.setattr(geocoding, "GEOCODE_URL", stub.geocode_url)
+
+    def classify(description):
+        if "fail" in description:
+            raise RuntimeError("classifier unavailable")
+        return "Dentist"
+
+    pipeline = SearchPipeline(
+        "test-key",
+        get_provider_store(),
+        location_resolver=LocationResolver(Gazetteer(), geocode=lambda query: geocode_google(query, "test-key")),
+        classify=classify,
+    )
+    return SearchApi(pipeline, threads=4)
+
+
+def request(app, method, path, body=None):
+    """Send one request straight to the ASGI app; returns (status, decoded JSON body)."""
+    message = {"type": "http.request", "body": json.dumps(body).encode() if body is not None else b""}
+    response = {}
+
+    async def receive():
+        return message
+
+    async def send(event):
+        if event["type"] == "http.response.start":
+            response["status"] = event["status"]
+        else:
+            response["body"] = event["body"]
+
+    scope = {"type": "http", "method": method, "path": path, "headers": []}
+    asyncio.run(app(scope, receive, send))
+    return response["status"], json.loads(response["body"])
+
+
+def test_search_by_location(api):
+    status, body = request(api, "POST", "/search", {"location": "Davis, CA", "care_type": "Pharmacy", "limit": 5})
+    assert status == 200
+    assert body["care_type"] == "Pharmacy"
+    assert body["count"] == len(body["facilities"]) == 5
+    assert {"name", "distance", "medicaid_supported"} <= set(body["facilities"][0])
+
+
+def test_issue_is_classified(api):
+    status, body = request(api, "POST", "/search", {**DAVIS, "issue": "my tooth hurts", "limit": 1})
+    assert status == 200
+    assert body["care_type"] == "Dentist"
+
+
+def test_boolean_strings_are_coerced(api):
+    counts = {}
+    for open_only in [None, "false", False, "true", True]:
+        status, body = request(api, "POST", "/search", {**DAVIS, "open_only": open_only, "limit": None})
+        assert status == 200
+        counts[open_only] = body["count"]
+    assert counts["false"] == counts[False] == counts[None]
+    assert counts["true"] == counts[True] < counts[False]
+
+
+@pytest.mark.parametrize("query", [
+    {**DAVIS, "open_only": "maybe"},
+    {**DAVIS, "open_only": [True]},
+    {**DAVIS, "radius": "far"},
+    {**DAVIS, "radius": 1e9},
+    {**DAVIS, "radius": 0},
+    {**DAVIS, "limit": 2.5},
+    {"latitude": 95, "longitude": 0},
+    {**DAVIS, "care_type": 3},
+    {**DAVIS, "bogus": 1},
+    {"care_type": "Pharmacy"},
+])
+def test_invalid_queries_are_rejected(api, query):
+    status, body = request(api, "POST", "/search", query)
+    assert status == 400
+    assert body["error"]
+
+
+def test_batch_reports_errors_per_query(api):
+    status, body = request(api, "POST", "/search", {"queries": [
+        {**DAVIS, "limit": 2},
+        {**DAVIS, "radius": 1e9},
+        {**DAVIS, "issue": "please fail"},
+    ]})
+    assert status == 200
+    ok, invalid, failed = body["results"]
+    assert ok["count"] == 2
+    assert invalid["status"] == 400
+    assert failed["status"] == 500 and "classifier unavailable" in failed["error"]
+
+
+def test_routing_errors(api):
+    assert request(api, "GET", "/search")[0] == 405
+    assert request(api, "POST", "/nope")[0] == 404
+    assert request(api, "POST", "/search", {"queries": []})[0] == 400
+    status, body = request(api, "GET", "/health")
+    assert status == 200 and body["status"] == "ok"
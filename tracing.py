@@ -0,0 +1,298 @@
+"""
+Lightweight tracing for the search path: timed spans, counters and exporters.
+
+Spans nest through context variables, so a span opened while another is
+active becomes its child, and work handed to a thread pool through
+`in_current_context` stays attached to the request that started it. Every
+finished span is kept in a bounded per-name latency window for p50/p95, and
+is passed to the configured exporters.
+
+Set HEALTHCARE_APP_TRACE_DIR to write spans to spans.jsonl and the latency
+summaries and counters to metrics.prom (Prometheus text format) there.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+TRACE_DIR_ENV = "HEALTHCARE_APP_TRACE_DIR"
+RECENT_SPANS = 2000  # Finished spans kept in memory
+LATENCY_WINDOW = 1000  # Durations kept per span name for percentiles
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start", "duration_ms", "attrs", "error")
+
+    def __init__(self, name, trace_id, parent_id, attrs):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.duration_ms = None
+        self.attrs = attrs
+        self.error = None
+
+    def to_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+class Trace:
+    """Spans and counters recorded while handling one request (one script run)."""
+
+    def __init__(self, name):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex
+        self.spans = []
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._token = None
+
+    def add_span(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def add_count(self, name, value):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+
+class Tracer:
+    """
+    Process-wide recorder of finished spans and counters.
+    """
+
+    def __init__(self):
+        self.recent = deque(maxlen=RECENT_SPANS)
+        self.exporters = []
+        self._durations = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def record(self, span):
+        with self._lock:
+            self.recent.append(span)
+            self._durations.setdefault(span.name, deque(maxlen=LATENCY_WINDOW)).append(span.duration_ms)
+        for exporter in self.exporters:
+            exporter.export_span(span)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def counters(self):
+        """Return a snapshot of every counter."""
+        with self._lock:
+            return dict(self._counters)
+
+    def latency_summary(self):
+        """
+        Returns:
+            dict: Span name -> {count, p50, p95, max} in milliseconds over the latency window.
+        """
+        with self._lock:
+            windows = {name: sorted(durations) for name, durations in self._durations.items()}
+        return {
+            name: {
+                "count": len(durations),
+                "p50": _percentile(durations, 0.5),
+                "p95": _percentile(durations, 0.95),
+                "max": durations[-1],
+            }
+            for name, durations in windows.items()
+        }
+
+    def flush(self):
+        for exporter in self.exporters:
+            exporter.flush(self)
+
+
+TRACER = Tracer()
+
+
+def _percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def start_trace(name):
+    """
+    Start a trace in the current context; spans opened afterwards belong to it.
+
+    Returns:
+        Trace: The new trace, to be passed to `finish_trace`.
+    """
+    trace = Trace(name)
+    trace._token = _current_trace.set(trace)
+    return trace
+
+
+def finish_trace(trace):
+    """Detach a trace from the current context and flush the exporters."""
+    if trace._token is not None:
+        try:
+            _current_trace.reset(trace._token)
+        except ValueError:
+            pass  # Finished from another context
+        trace._token = None
+    TRACER.flush()
+
+
+def current_trace():
+    """Return the trace of the current context, or None."""
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Time a block as a span of the current trace.
+
+    Yields:
+        Span: The open span; attributes can be added to `span.attrs`.
+    """
+    trace = _current_trace.get()
+    parent = _current_span.get()
+    current = Span(name, trace.trace_id if trace else None, parent.span_id if parent else None, attrs)
+    token = _current_span.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        current.duration_ms = (time.perf_counter() - start) * 1000
+        _current_span.reset(token)
+        TRACER.record(current)
+        if trace is not None:
+            trace.add_span(current)
+
+
+def count(name, value=1):
+    """Increment a counter, e.g. "external.google_places" or "cache.places.hit"."""
+    TRACER.count(name, value)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_count(name, value)
+
+
+def in_current_context(fn):
+    """
+    Wrap `fn` to run in a copy of the current context, so spans it opens in a
+    worker thread are attached to the calling request.
+    """
+    return _ContextCall(fn)
+
+
+class _ContextCall:
+    # A context can only be entered by one thread at a time, so copy it per wrapper
+    def __init__(self, fn):
+        self.fn = fn
+        self.context = contextvars.copy_context()
+
+    def __call__(self, *args, **kwargs):
+        return self.context.run(self.fn, *args, **kwargs)
+
+
+def hit_ratios(counters):
+    """
+    Hit ratio of every "<name>.hit"/"<name>.miss" counter pair; a
+    "<name>.lookup" counter stands in for hits + misses when there is no hit counter.
+
+    Returns:
+        dict: name -> (hits, lookups, ratio).
+    """
+    names = {key.rsplit(".", 1)[0] for key in counters if key.endswith((".hit", ".miss", ".lookup"))}
+    ratios = {}
+    for name in sorted(names):
+        misses = counters.get(f"{name}.miss", 0)
+        if f"{name}.hit" in counters:
+            hits = counters[f"{name}.hit"]
+        else:
+            hits = max(counters.get(f"{name}.lookup", 0) - misses, 0)
+        lookups = hits + misses
+        ratios[name] = (hits, lookups, hits / lookups if lookups else 0.0)
+    return ratios
+
+
+class JsonlExporter:
+    """Appends every finished span to a JSON Lines file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def export_span(self, span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+
+    def flush(self, tracer):
+        pass
+
+
+class PrometheusExporter:
+    """Rewrites a Prometheus text-format file with span latencies and counters on every flush."""
+
+    def __init__(self, path, prefix="healthcare_app"):
+        self.path = path
+        self.prefix = prefix
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def export_span(self, span):
+        pass
+
+    def flush(self, tracer):
+        lines = [
+            f"# HELP {self.prefix}_span_duration_ms Span duration over the recent window.",
+            f"# TYPE {self.prefix}_span_duration_ms summary",
+        ]
+        for name, summary in sorted(tracer.latency_summary().items()):
+            for quantile in ("p50", "p95"):
+                lines.append(
+                    f'{self.prefix}_span_duration_ms{{span="{name}",quantile="0.{quantile[1:]}"}} {summary[quantile]:.3f}'
+                )
+            lines.append(f'{self.prefix}_span_duration_ms_count{{span="{name}"}} {summary["count"]}')
+        lines += [
+            f"# HELP {self.prefix}_events_total Counted events (external calls, cache lookups).",
+            f"# TYPE {self.prefix}_events_total counter",
+        ]
+        for name, value in sorted(tracer.counters().items()):
+            lines.append(f'{self.prefix}_events_total{{event="{name}"}} {value}')
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.path)
+
+
+_configure_lock = threading.Lock()
+
+
+def configure_exporters(directory=None):
+    """
+    Attach the JSONL and Prometheus exporters once per process.
+
+    Args:
+        directory (str): Output directory; defaults to $HEALTHCARE_APP_TRACE_DIR.
+            Nothing is exported when neither is set.
+    """
+    directory = directory or os.environ.get(TRACE_DIR_ENV)
+    with _configure_lock:
+        if not directory or TRACER.exporters:
+            return
+        TRACER.exporters = [
+            JsonlExporter(os.path.join(directory, "spans.jsonl")),
+            PrometheusExporter(os.path.join(directory, "metrics.prom")),
+        ]
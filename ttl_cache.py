@@ -0,0 +1,130 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from tracing import count
+
+DEFAULT_MAX_ENTRIES = 5000
+EVICTION_INTERVAL = 64  # Writes between eviction passes
+
+
+class TTLCache:
+    """
+    Small persistent key/value cache backed by SQLite.
+
+    Entries expire after a per-entry TTL and the least recently used entries
+    are evicted once the cache grows past `max_entries` (checked every
+    EVICTION_INTERVAL writes, so it can briefly overshoot). Values must be
+    JSON serializable. Hit and miss counts are kept for the lifetime of the object.
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            path (str): SQLite file to use; ":memory:" keeps the cache in memory.
+            max_entries (int): Number of entries kept before LRU eviction starts.
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        # Counter prefix for tracing, e.g. "cache.places" for places.sqlite
+        self.name = "memory" if path == ":memory:" else os.path.splitext(os.path.basename(path))[0]
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_last_access ON cache (last_access)")
+        self._conn.commit()
+
+    def get(self, key, default=None):
+        """
+        Return the cached value for `key`, or `default` when missing or expired.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None or (row[1] is not None and row[1] <= now):
+                if row is not None:
+                    self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                count(f"cache.{self.name}.miss")
+                return default
+            self._conn.execute("UPDATE cache SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        count(f"cache.{self.name}.hit")
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl_s=None):
+        """
+        Store `value` under `key`.
+
+        Args:
+            key (str): Cache key.
+            value: JSON-serializable value.
+            ttl_s (float): Seconds until the entry expires; None never expires.
+        """
+        now = time.time()
+        expires_at = now + ttl_s if ttl_s is not None else None
+        payload = json.dumps(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, payload, expires_at, now),
+            )
+            self._writes += 1
+            if self._writes % EVICTION_INTERVAL == 0:
+                self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY last_access LIMIT ?)",
+                (excess,),
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def clear(self):
+        """Remove every entry and reset the counters."""
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Returns:
+            dict: Entry count, hits, misses and hit ratio.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }